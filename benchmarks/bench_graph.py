@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+""" Graph size and build time benchmark.
+
+Builds the graph of one composite (`bap.Bap.build_composite_best`, no
+request is sent to Earth Engine) for several combinations of scores and
+year ranges, and reports the client time to build it and the size of the
+serialized graph. Runs offline: Earth Engine is initialized with the
+algorithm signatures that ship with the API (`ee/tests/algorithms.json`)
+and without credentials, and requests are not allowed, so a graph that
+needs one (a `getInfo`) makes the benchmark fail. Without the Earth Engine
+API the benchmark is skipped.
+
+Usage::
+
+    python -m benchmarks.bench_graph [--repeat 5] [--year 2018]
+"""
+from __future__ import print_function
+import argparse
+import contextlib
+import gc
+import time
+
+from .bench_setup import make_site
+
+COMBOS = ('pixel', 'image', 'kernel', 'collection')
+YEAR_RANGES = (0, 1, 2)
+
+
+def make_scores(combo, seas):
+    """ Scores of a combination: none, scores of single images, scores with
+    kernels, or scores over the collection """
+    from geebap import scores
+    if combo == 'image':
+        return (scores.Satellite(), scores.AtmosOpacity(),
+                scores.MaskPercent(), scores.Index(),
+                scores.Doy('01-15', seas))
+    if combo == 'kernel':
+        return scores.CloudDist(), scores.MaskPercentKernel()
+    if combo == 'collection':
+        return scores.Outliers(('ndvi',)), scores.Medoid()
+    return ()
+
+
+def _no_requests(*args, **kwargs):
+    raise RuntimeError('the graph makes a request to Earth Engine')
+
+
+@contextlib.contextmanager
+def offline():
+    """ Initialize Earth Engine without credentials nor requests, and
+    restore it on exit """
+    import ee
+    from ee import apitestcase
+    patched = {'_install_cloud_api_resource': lambda: None,
+               'getAlgorithms': apitestcase.GetAlgorithms,
+               'computeValue': _no_requests}
+    saved = dict((name, getattr(ee.data, name)) for name in patched)
+    for name, value in patched.items():
+        setattr(ee.data, name, value)
+    try:
+        ee.Reset()
+        ee.Initialize(None, '', project='benchmark')
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(ee.data, name, value)
+        ee.Reset()
+
+
+def make_bap(combo, year_range):
+    from geebap import bap, season, masks, filters
+    seas = season.Season('11-15', '03-15')
+    return bap.Bap(season=seas, range=(year_range, year_range),
+                   scores=make_scores(combo, seas),
+                   masks=(masks.Mask(),),
+                   filters=(filters.CloudCover(),))
+
+
+def measure(combo, year_range, year, site, repeat=5):
+    """ Build the graph of a composite. The garbage collector is disabled
+    while timing (as `timeit` does)
+
+    :return: best build time (seconds) and size of the graph (bytes)
+    :rtype: tuple
+    """
+    objbap = make_bap(combo, year_range)
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.time()
+            composite = objbap.build_composite_best(year, site,
+                                                    indices=('ndvi',))
+            elapsed = time.time() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(composite.serialize())
+
+
+def run(repeat=5, year=2018, combos=None, year_ranges=YEAR_RANGES):
+    """ Run the benchmark
+
+    :return: dict of metric name -> value. Empty if the Earth Engine API
+        is not available
+    :rtype: dict
+    """
+    try:
+        from ee import apitestcase
+    except ImportError:
+        return {}
+    result = {}
+    with offline():
+        site = make_site()
+        for combo in combos or COMBOS:
+            for year_range in year_ranges:
+                elapsed, size = measure(combo, year_range, year, site, repeat)
+                key = 'graph_{}_range{}'.format(combo, year_range)
+                result[key + '_build_time'] = elapsed
+                result[key + '_bytes'] = size
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--year', type=int, default=2018)
+    args = parser.parse_args()
+
+    result = run(args.repeat, args.year)
+    if not result:
+        print('the Earth Engine API is not available, skipped')
+        return
+    for key in sorted(result):
+        print('{}: {}'.format(key, result[key]))
+
+
+if __name__ == '__main__':
+    main()
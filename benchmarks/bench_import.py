@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+""" Import time benchmark.
+
+Imports geebap in a fresh interpreter several times and reports the best
+time and the geebap submodules that were loaded by a bare `import geebap`.
+
+Usage::
+
+    python -m benchmarks.bench_import [--repeat 10] [--max 0.05]
+"""
+from __future__ import print_function
+import argparse
+import json
+import subprocess
+import sys
+
+SNIPPET = """
+import json, sys, time
+start = time.time()
+import geebap
+elapsed = time.time() - start
+loaded = sorted(m for m in sys.modules if m.startswith('geebap.'))
+print(json.dumps({'elapsed': elapsed, 'loaded': loaded}))
+"""
+
+
+def import_time():
+    """ Time `import geebap` in a new interpreter
+
+    :return: elapsed seconds and the list of loaded submodules
+    :rtype: tuple
+    """
+    output = subprocess.check_output([sys.executable, '-c', SNIPPET])
+    result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    return result['elapsed'], result['loaded']
+
+
+def run(repeat=10):
+    """ Run the benchmark
+
+    :return: dict of metric name -> value
+    :rtype: dict
+    """
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        elapsed, loaded = import_time()
+        times.append(elapsed)
+
+    return {'import_time': min(times),
+            'import_submodules': len(loaded)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--max', type=float, default=None,
+                        help='fail if the import takes longer (seconds)')
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    print('import geebap: {:.4f} s ({} submodules loaded)'.format(
+        result['import_time'], result['import_submodules']))
+
+    if args.max is not None and result['import_time'] > args.max:
+        print('import time over the limit of {} s'.format(args.max))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
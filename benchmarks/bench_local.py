@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+""" Local engine throughput benchmark.
+
+Runs the scores and compositors of the local (NumPy) engine over synthetic
+images and reports the images processed per second and the peak memory
+(traced by `tracemalloc`) of each one. Runs offline.
+
+Usage::
+
+    python -m benchmarks.bench_local [--images 20] [--size 256]
+"""
+from __future__ import print_function
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+BANDS = ('blue', 'green', 'red', 'nir', 'swir1', 'swir2')
+SCORES = ('score-a', 'score-b', 'score-c')
+
+
+def make_images(count, size, seed=0):
+    """ Synthetic images (dicts of band -> array) with 10% masked pixels """
+    rand = np.random.RandomState(seed)
+    images = []
+    for _ in range(count):
+        masked = rand.rand(size, size) < 0.1
+        image = {}
+        for band in BANDS:
+            values = rand.rand(size, size).astype(np.float32)
+            values[masked] = np.nan
+            image[band] = values
+        images.append(image)
+    return images
+
+
+def make_layers(count, size, seed=0):
+    """ Synthetic score layers (score name -> array (images, rows, cols)) """
+    rand = np.random.RandomState(seed)
+    return dict((name, rand.rand(count, size, size).astype(np.float32))
+                for name in SCORES)
+
+
+def _outliers(images, layers):
+    from geebap import local
+    for _ in local.outliers(images, ['red', 'nir']):
+        pass
+
+
+def _outliers_median(images, layers):
+    from geebap import local
+    for _ in local.outliers(images, ['red', 'nir'], reducer='median'):
+        pass
+
+
+def _medoid(images, layers):
+    from geebap import local
+    local.medoid(images, ['red', 'nir', 'swir1'])
+
+
+def _best(images, layers):
+    from geebap import local
+    score = local.recomposite(layers, {'score-a': 2})
+    local.pick(images, local.best_index(score))
+
+
+def _fixed_point(images, layers):
+    from geebap import local
+    resolution = local.fixed_point_resolution(1)
+    total = local.fixed_point_sum(
+        [local.quantize(layer, resolution) for layer in layers.values()])
+    local.pick(images, local.best_index(total))
+
+
+def _weight_sweep(images, layers):
+    from geebap import local
+    weights = np.random.RandomState(0).rand(16, len(SCORES))
+    local.weight_sweep(layers, weights, SCORES)
+
+
+# name -> function(images, layers)
+CASES = {'outliers': _outliers,
+         'outliers_median': _outliers_median,
+         'medoid': _medoid,
+         'best': _best,
+         'fixed_point': _fixed_point,
+         'weight_sweep': _weight_sweep}
+
+
+def measure(function, images, layers, repeat=3):
+    """ Run a case
+
+    :return: best images per second and peak memory (bytes)
+    :rtype: tuple
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        function(images, layers)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        function(images, layers)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return len(images) / best, peak
+
+
+def run(images=20, size=256, repeat=3, cases=None):
+    """ Run the benchmark
+
+    :return: dict of metric name -> value
+    :rtype: dict
+    """
+    image_list = make_images(images, size)
+    layers = make_layers(images, size)
+    result = {}
+    for name in cases or sorted(CASES):
+        per_sec, peak = measure(CASES[name], image_list, layers, repeat)
+        result['local_{}_images_per_sec'.format(name)] = per_sec
+        result['local_{}_peak_bytes'.format(name)] = peak
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--size', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    result = run(args.images, args.size, args.repeat)
+    for name in sorted(CASES):
+        print('{}: {:.1f} images/s, {:.1f} MB peak'.format(
+            name, result['local_{}_images_per_sec'.format(name)],
+            result['local_{}_peak_bytes'.format(name)] / 1024.0**2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+""" Setup time benchmark.
+
+Measures the client side time to build the graph of one composite (no
+request is sent to Earth Engine) with cold and warm caches of collections,
+collection groups and common bands, and the size of the serialized graph.
+Needs Earth Engine credentials (`ee.Initialize()`).
+
+Usage::
+
+    python -m benchmarks.bench_setup [--repeat 10] [--year 2018 --range 1]
+"""
+from __future__ import print_function
+import argparse
+import time
+
+
+def make_bap(year_range=(0, 0)):
+    """ Bap with a usual set of scores """
+    from geebap import bap, season, scores, masks, filters
+    seas = season.Season('11-15', '03-15')
+    score_list = (scores.Satellite(), scores.AtmosOpacity(),
+                  scores.MaskPercent(), scores.CloudDist(),
+                  scores.Index(), scores.Doy('01-15', seas))
+    return bap.Bap(season=seas, range=year_range, scores=score_list,
+                   masks=(masks.Hollstein(),), filters=(filters.CloudCover(),))
+
+
+def make_site():
+    import ee
+    return ee.Geometry.Rectangle([-71.78, -42.89, -71.57, -42.79])
+
+
+def clear_caches():
+    from geebap import bap, priority
+    priority.clear_cache()
+    bap.season_colgroups.cache_clear()
+
+
+def build_time(objbap, year, site):
+    """ Time to build the graph of one composite
+
+    :return: elapsed seconds and the composite
+    :rtype: tuple
+    """
+    start = time.time()
+    composite = objbap.build_composite_best(year, site)
+    return time.time() - start, composite
+
+
+def run(repeat=10, year=2018, year_range=(0, 0)):
+    """ Run the benchmark
+
+    :return: dict of metric name -> value
+    :rtype: dict
+    """
+    import ee
+    ee.Initialize()
+
+    objbap = make_bap(year_range)
+    site = make_site()
+
+    cold = []
+    warm = []
+    for _ in range(repeat):
+        clear_caches()
+        elapsed, composite = build_time(objbap, year, site)
+        cold.append(elapsed)
+        elapsed, composite = build_time(objbap, year, site)
+        warm.append(elapsed)
+
+    return {'setup_time_cold': min(cold),
+            'setup_time_warm': min(warm),
+            'graph_bytes': len(composite.serialize())}
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--year', type=int, default=2018)
+    parser.add_argument('--range', type=int, default=0,
+                        help='years before and after the target year')
+    args = parser.parse_args()
+
+    result = run(args.repeat, args.year, (args.range, args.range))
+    print('setup per composite: {:.4f} s cold, {:.4f} s warm '
+          '({} bytes graph)'.format(result['setup_time_cold'],
+                                    result['setup_time_warm'],
+                                    result['graph_bytes']))
+
+
+if __name__ == '__main__':
+    main()
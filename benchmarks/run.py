@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+""" Run the benchmarks and compare them against a stored baseline.
+
+Runs the `run` function of each benchmark module and compares every metric
+with the baseline (a JSON file of metric name -> value). Metrics that end
+with `_per_sec` are better when higher, the others (times, bytes) when
+lower. A metric is a regression if it is worse than the baseline by more
+than the tolerance. Metrics missing on either side are not compared (for
+example the graph benchmarks when Earth Engine is not available).
+
+Timing metrics (`_per_sec` and the ones with `_time` in their name) are
+compared and stored relative to the time of a fixed reference workload
+measured in the same run, so the baseline does not depend on the speed of
+the machine that saved it. Sizes (bytes, counts) are stored as they are.
+Timings are noisier than sizes, so they have their own tolerance.
+
+Usage::
+
+    python -m benchmarks.run [--baseline benchmarks/baseline.json]
+                             [--tolerance 0.25] [--time-tolerance 0.5]
+                             [--save] [--output out.json]
+"""
+from __future__ import print_function
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+BENCHMARKS = ('bench_import', 'bench_local', 'bench_graph', 'bench_setup')
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_sec')
+
+
+def is_timing(metric):
+    return metric.endswith('_per_sec') or '_time' in metric
+
+
+def reference_time(repeat=5, size=1000000):
+    """ Best time of a fixed workload (a loop of integer arithmetic) used
+    as the unit of the timing metrics
+
+    :rtype: float
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        total = 0
+        for i in range(size):
+            total += i * i % 7
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def normalize(result, reference):
+    """ Express the timing metrics in units of the reference time: times
+    are divided by it and rates multiplied by it
+
+    :param result: dict of metric name -> value
+    :type result: dict
+    :param reference: seconds of the reference workload (see
+        `reference_time`)
+    :type reference: float
+    :return: dict of metric name -> value
+    :rtype: dict
+    """
+    normalized = {}
+    for metric, value in result.items():
+        if metric.endswith('_per_sec'):
+            value = value * reference
+        elif is_timing(metric):
+            value = value / reference
+        normalized[metric] = value
+    return normalized
+
+
+def compare(result, baseline, tolerance=0.25, time_tolerance=None):
+    """ Compare the metrics of a run with the baseline
+
+    :param result: dict of metric name -> value
+    :type result: dict
+    :param baseline: dict of metric name -> value
+    :type baseline: dict
+    :param tolerance: allowed relative change for the worse
+    :type tolerance: float
+    :param time_tolerance: allowed relative change for the worse of the
+        timing metrics. Defaults to `tolerance`
+    :type time_tolerance: float
+    :return: the regressions, a dict of metric name -> (baseline value,
+        value, relative change)
+    :rtype: dict
+    """
+    regressions = {}
+    for metric in sorted(set(result) & set(baseline)):
+        before = baseline[metric]
+        value = result[metric]
+        if not before:
+            continue
+        change = (value - before) / float(before)
+        worse = -change if higher_is_better(metric) else change
+        limit = tolerance
+        if is_timing(metric) and time_tolerance is not None:
+            limit = time_tolerance
+        if worse > limit:
+            regressions[metric] = (before, value, change)
+    return regressions
+
+
+def run(benchmarks=BENCHMARKS):
+    """ Run the benchmarks. A benchmark that fails (for example one that
+    needs Earth Engine credentials) is reported and skipped
+
+    :return: dict of metric name -> value
+    :rtype: dict
+    """
+    result = {}
+    for name in benchmarks:
+        module = importlib.import_module('benchmarks.{}'.format(name))
+        try:
+            metrics = module.run()
+        except Exception as e:
+            print('{} skipped: {!r}'.format(name, e), file=sys.stderr)
+            continue
+        result.update(metrics)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--time-tolerance', type=float, default=0.5)
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--output', help='write the results (in seconds) to '
+                                         'a JSON file')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS,
+                        help='benchmarks to run')
+    args = parser.parse_args()
+
+    reference = reference_time()
+    result = run(args.only or BENCHMARKS)
+    for metric in sorted(result):
+        print('{}: {:.6g}'.format(metric, result[metric]))
+    print('reference time: {:.6g}'.format(reference))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=1, sort_keys=True)
+
+    result = normalize(result, reference)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(result)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print('baseline saved to {}'.format(args.baseline))
+        return
+
+    if not os.path.exists(args.baseline):
+        print('no baseline at {}'.format(args.baseline))
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(result, baseline, args.tolerance,
+                          args.time_tolerance)
+    for metric, (before, value, change) in sorted(regressions.items()):
+        print('REGRESSION {}: {:.6g} -> {:.6g} ({:+.0%})'.format(
+            metric, before, value, change))
+    if regressions:
+        sys.exit(1)
+    print('no regressions over {:.0%} ({:.0%} for timings)'.format(
+        args.tolerance, args.time_tolerance))
+
+
+if __name__ == '__main__':
+    main()
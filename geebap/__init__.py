@@ -4,6 +4,7 @@ Package to generate a "Best Available Pixel" image in Google Earth Engine
 """
 
 from __future__ import absolute_import, division, print_function
+import sys
 from ._version import __version__
 
 __all__ = (
@@ -20,12 +21,43 @@ __email__ = "rprincipe@ciefap.org.ar"
 __license__ = "GNU GENERAL PUBLIC LICENSE, Version 3"
 __copyright__ = "Rodrigo E. Principe"
 
-try:
-    from . import bap, date, expgen, expressions, filters, functions,\
-        ipytools, masks, regdec, scores, season, sites
+# Submodules and objects are imported on first access (PEP 562), so
+# importing geebap is fast and does not need `ee.Initialize()`
+_SUBMODULES = ("bap", "cache", "date", "evaluation", "expgen", "export",
+               "expressions", "filters", "functions", "instrument", "ipytools",
+               "jobqueue", "local", "masks", "priority", "regdec", "scorecache",
+               "scores", "season", "sites", "spec", "template", "tiling",
+               "utils", "worker")
 
-    from .bap import Bap
-    from .priority import SeasonPriority
-    from .season import Season
-except ImportError:
-    pass
\ No newline at end of file
+_OBJECTS = {"Bap": "bap",
+            "SeasonPriority": "priority",
+            "Season": "season"}
+
+
+def __getattr__(name):
+    import importlib
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name in _OBJECTS:
+        module = importlib.import_module('.' + _OBJECTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_SUBMODULES) +
+                  list(_OBJECTS.keys()))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ before python 3.7: import eagerly
+    import importlib
+    for _name in _SUBMODULES:
+        try:
+            globals()[_name] = importlib.import_module('.' + _name, __name__)
+        except ImportError:
+            pass
+    for _name, _module in _OBJECTS.items():
+        if _module in globals():
+            globals()[_name] = getattr(globals()[_module], _name)
@@ -2,9 +2,15 @@
 """ Main module holding the Bap Class and its methods """
 
 from geetools import collection, tools
-from . import scores, priority, functions, utils, __version__
+from . import scores, priority, functions, utils, sites, scorecache, \
+    local, instrument, __version__
+from collections import OrderedDict
 import ee
 
+# Bands (renamed) read by the harmonization of geetools (Roy et al. 2016
+# coefficients)
+HARMONIZE_BANDS = ('blue', 'green', 'red', 'nir', 'swir', 'swir2')
+
 
 class Bap(object):
     def __init__(self, season, range=(0, 0), colgroup=None, scores=None,
@@ -26,8 +32,21 @@ class Bap(object):
         self.score_name = kwargs.get('score_name', 'score')
 
         # Band names in case user needs different names
-        self.bandname_col_id = kwargs.get('bandname_col_id', 'col_id')
-        self.bandname_date = kwargs.get('bandname_date', 'date')
+        self.bandname_col_id = kwargs.get('bandname_col_id',
+                                          functions.BANDNAME_COL_ID)
+        self.bandname_date = kwargs.get('bandname_date',
+                                        functions.BANDNAME_DATE)
+        self.bandname_provenance = kwargs.get('bandname_provenance',
+                                              functions.BANDNAME_PROVENANCE)
+
+        # Pack col_id and date in one band (see functions.encode_provenance)
+        self.provenance = kwargs.get('provenance', False)
+
+        # Fixed point scores: 'uint8' or 'uint16' (see local.quantize)
+        self.fixed_point = kwargs.get('fixed_point', None)
+
+        # Output bands. If None, the bands common to all collections
+        self.bands = kwargs.get('bands', None)
 
     @property
     def score_names(self):
@@ -45,6 +64,33 @@ class Bap(object):
             maxpunt += score.max
         return maxpunt
 
+    @property
+    def fixed_point_resolution(self):
+        """ Size of a step of the fixed point scores (None if the scores are
+        not fixed point). All the scores use the same step so their weights
+        (`range_out`) are kept, and the final score resolution is the same """
+        if not self.fixed_point:
+            return None
+        if any(score.min < 0 for score in self.scores or []):
+            raise ValueError('fixed point scores can not be negative')
+        maximum = max([score.max for score in self.scores or []] or [1])
+        return local.fixed_point_resolution(maximum, self.fixed_point)
+
+    def _quantize(self, name):
+        """ Function to convert a score band to fixed point """
+        resolution = self.fixed_point_resolution
+        levels = local.FIXED_POINT_LEVELS[self.fixed_point]
+
+        def wrap(img):
+            band = img.select(name).divide(resolution).round() \
+                .clamp(0, levels)
+            if self.fixed_point == 'uint8':
+                band = band.toUint8()
+            else:
+                band = band.toUint16()
+            return img.addBands(band, overwrite=True)
+        return wrap
+
     def year_range(self, year):
         try:
             i = year - abs(self.range[0])
@@ -81,38 +127,212 @@ class Bap(object):
                                                    proxy_col))
 
 
-    def compute_scores(self, year, site, indices=None, **kwargs):
-        """ Add scores and merge collections
+    @property
+    def global_stats(self):
+        """ True if any score computes its statistics over the merged
+        collection of all slices (`global_stats` param of the score) """
+        if not self.scores:
+            return False
+        return any(getattr(score, 'global_stats', False)
+                   for score in self.scores)
+
+    def _filter(self, col_ee, col, year):
+        """ Filter the collection by the season of the given year, apply
+        the 'CloudCover' filter and the BRDF correction """
+        daterange = self.season.add_year(year)
+
+        # filter date
+        col_ee = col_ee.filterDate(daterange.start(), daterange.end())
+
+        # some filters
+        if self.filters:
+            for filt in self.filters:
+                if filt.name in ['CloudCover']:
+                    col_ee = filt.apply(col_ee, col=col)
+
+        # BRDF
+        if self.brdf:
+            if 'brdf' in col.algorithms.keys():
+                col_ee = col_ee.map(lambda img: col.brdf(img))
+
+        return col_ee
+
+    def required_bands(self, col, bands, indices=None):
+        """ Bands of the collection needed for the output and to compute the
+        scores. The others can be dropped as soon as the masks are applied
+        and the indices are computed
+
+        :param col: the collection
+        :type col: geetools.collection.Collection
+        :param bands: the output bands
+        :type bands: list
+        :return: the required bands or None if a score needs all the bands
+        :rtype: list
+        """
+        names = [band.name for band in col.bands]
+        required = set(bands)
 
-        :param add_individual_scores: adds the individual scores to the images
-        :type add_individual_scores: bool
-        :param buffer: make a buffer before cutting to the given site
+        # the harmonized bands that are not required are filled in before
+        # harmonizing (see `_harmonize`)
+
+        # many scores use the mask of the first band
+        required.add(names[0])
+
+        for score in self.scores or []:
+            inputs = score.inputs(col)
+            if inputs is None:
+                return None
+            required.update(inputs)
+
+        indices = list(indices or [])
+        return [name for name in names if name in required] + indices
+
+    def _prepare(self, col_ee, col, year, indices=None, bands=None):
+        """ Catch SLC off, apply masks, rename, rescale, add indices and drop
+        the bands that are not required (see `required_bands`).
+
+        :param bands: the output bands. If None, no band is dropped
+        :type bands: list
+
+        :return: the prepared collection and whether the collection has the
+            SLC off
+        :rtype: tuple
+        """
+        # Catch SLC off
+        slcoff = False
+        if col.spacecraft == 'LANDSAT' and col.number == 7:
+            if year in priority.SeasonPriority.l7_slc_off:
+                # Convert masked values to zero
+                col_ee = col_ee.map(lambda img: img.unmask())
+                slcoff = True
+
+        # Apply masks
+        if self.masks:
+            for mask in self.masks:
+                col_ee = mask.map(col_ee, col=col)
+
+        # Rename
+        col_ee = col_ee.map(lambda img: col.rename(img))
+
+        # Rescale
+        col_ee = col_ee.map(
+            lambda img: collection.rescale(
+                img, col, self.target_collection, renamed=True))
+
+        # Indices
+        if indices:
+            for i in indices:
+                f = getattr(col, i)
+                def addindex(img):
+                    ind = f(img, renamed=True)
+                    return img.addBands(ind)
+                col_ee = col_ee.map(addindex)
+
+        # Drop bands not needed
+        if bands is not None:
+            required = self.required_bands(col, bands, indices)
+            if required is not None:
+                col_ee = col_ee.map(lambda img: img.select(required))
+
+        return col_ee, slcoff
+
+    @instrument.stage()
+    def reference_collection(self, colgroup, years, site, indices=None,
+                             bands=None):
+        """ Merge every (collection, year) slice into one harmonized
+        collection, ready to compute collection statistics. Scores created
+        with `global_stats=True` use it instead of the slice they are mapped
+        over, so the statistics are computed once and do not depend on how
+        many sensors are present in each slice.
+
+        :param colgroup: the collection group
+        :type colgroup: geetools.collection.group.CollectionGroup
+        :param years: the years of the slices
+        :type years: list
+        :param site: the site to filter the collections
+        :type site: ee.Geometry
+        :param bands: the output bands (see `_prepare`)
+        :type bands: list
+        :rtype: ee.ImageCollection
+        """
+        images = ee.List([])
+        for col in colgroup.collections:
+            col_ee_bounds = col.collection.filterBounds(site)
+            for year in years:
+                col_ee = self._filter(col_ee_bounds, col, year)
+                col_ee, _ = self._prepare(col_ee, col, year, indices, bands)
+                col_ee = self._harmonize(col_ee, col, bands, indices)
+
+                images = images.add(col_ee.toList(col_ee.size())).flatten()
+
+        return ee.ImageCollection.fromImages(images)
+
+
+    def prepare_site(self, site, buffer=None, scale=None):
+        """ Buffer the site once and make a simplified version of it to
+        filter the images. Images are not clipped: the exact site is used by
+        the scores that depend on the region (like `MaskPercent`) and to clip
+        the final composite once.
+
+        :param site: the site
+        :type site: ee.Geometry or ee.Feature
+        :param buffer: distance (meters) of the buffer
         :type buffer: float
+        :param scale: tolerance (meters) for the buffer and the
+            simplification. Defaults to the finest scale of the target
+            collection
+        :type scale: float
+        :return: the exact (buffered) site and the simplified site
+        :rtype: tuple
         """
-        add_individual_scores = kwargs.get('add_individual_scores', False)
-        buffer = kwargs.get('buffer', None)
+        if isinstance(site, ee.Feature): site = site.geometry()
+        site = ee.Geometry(site)
 
-        all_collections = ee.List([])
+        if scale is None:
+            scale = min([band.scale for band in self.target_collection.bands])
 
-        # TODO: get common bands for col of all years
+        if buffer is not None:
+            site = site.buffer(buffer, scale)
+
+        return site, site.simplify(scale)
+
+    def _colgroups(self, year):
+        """ Get the collection group for the given year and the list of all
+        collections of the year range
+
+        :rtype: tuple
+        """
         if self.colgroup is None:
-            colgroup = priority.SeasonPriority(year).colgroup
-            all_col = []
-            for year in self.year_range(year):
-                _colgroup = priority.SeasonPriority(year).colgroup
-                for col in _colgroup.collections:
-                    all_col.append(col)
+            colgroup, all_col = season_colgroups(
+                year, tuple(self.year_range(year)))
+            all_col = list(all_col)
         else:
             all_col = self.colgroup.collections
             colgroup = self.colgroup
 
-        common_bands = collection.getCommonBands(*all_col, match='name')
+        return colgroup, all_col
 
-        # add col_id to common bands
-        common_bands.append(self.bandname_col_id)
+    def _output_bands(self, all_col):
+        """ Output bands (without scores, col_id, date and indices) """
+        if self.bands is not None:
+            return list(self.bands)
+        return list(priority.get_common_bands(
+            tuple(col.id for col in all_col)))
 
-        # add date band to common bands
-        common_bands.append(self.bandname_date)
+    def _common_bands(self, all_col, indices=None,
+                      add_individual_scores=False):
+        """ Bands of the final images """
+        common_bands = self._output_bands(all_col)
+
+        if self.provenance:
+            # add provenance band to common bands
+            common_bands.append(self.bandname_provenance)
+        else:
+            # add col_id to common bands
+            common_bands.append(self.bandname_col_id)
+
+            # add date band to common bands
+            common_bands.append(self.bandname_date)
 
         # add score names if 'add_individual_scores'
         if add_individual_scores:
@@ -127,169 +347,215 @@ class Bap(object):
         # add score band to common bands
         common_bands.append(self.score_name)
 
+        return common_bands
+
+    @instrument.stage('slice')
+    def _slice(self, col_ee_bounds, col, year, site, indices=None,
+               score_list=None, reference=None, exclude=None, bands=None,
+               tile_scale=1):
+        """ Process the images of one collection in the season of one year:
+        filter, prepare, score and add the col_id and date bands.
+
+        :param col_ee_bounds: the collection filtered by bounds
+        :type col_ee_bounds: ee.ImageCollection
+        :param col: the collection
+        :type col: geetools.collection.Collection
+        :param site: the exact site, for the scores that depend on the region.
+            The images are not clipped
+        :type site: ee.Geometry
+        :param score_list: the scores to apply. Defaults to all scores
+        :type score_list: list
+        :param reference: reference collection for the scores with
+            `global_stats`. Those scores are computed over the harmonized
+            images, to compare them with the harmonized reference. The other
+            scores are computed before harmonizing
+        :type reference: ee.ImageCollection
+        :param exclude: images to leave out, as in BAP_USED_IMAGES
+            ('collection id/image id')
+        :type exclude: ee.List
+        :param bands: the output bands (see `_prepare`)
+        :type bands: list
+        :param tile_scale: `tileScale` of the reductions of the scores
+        :type tile_scale: float
+        :return: the processed collection and the list of used images
+        :rtype: tuple
+        """
+        if score_list is None:
+            score_list = self.scores
+
+        col_ee = self._filter(col_ee_bounds, col, year)
+
+        # Image id as in BAP_USED_IMAGES
+        col_ee = col_ee.map(lambda img: img.set(
+            'BAP_IMAGE_ID', ee.String(col.id).cat('/').cat(img.id())))
+
+        # Leave out images already used
+        if exclude is not None:
+            col_ee = col_ee.filter(
+                ee.Filter.inList('BAP_IMAGE_ID', exclude).Not())
+
+        # Proxy in case size == 0
+        col_ee = self.make_proxy(col.collection.first(), col_ee, year)
+
+        # store used images
+        imlist = ee.List(col_ee.toList(col_ee.size()).map(
+            lambda img:
+            ee.String(col.id).cat('/').cat(ee.Image(img).id())))
+
+        # Add year as a property (YEAR_BAP)
+        col_ee = col_ee.map(lambda img: img.set('YEAR_BAP', year))
+
+        # SLC off, masks, rename, rescale and indices
+        col_ee, slcoff = self._prepare(col_ee, col, year, indices, bands)
+
+        # Apply scores
+        if score_list:
+            for score in score_list:
+                zero = False if slcoff and isinstance(score, (scores.MaskPercent, scores.MaskPercentKernel)) else True
+                # The scores with global stats compare the images with the
+                # harmonized reference
+                harmonized = reference is not None and \
+                    getattr(score, 'global_stats', False)
+                source = col_ee
+                if harmonized:
+                    source = self._harmonize(col_ee, col, bands, indices)
+                scored = score._map(
+                    source,
+                    col=col,
+                    year=year,
+                    colEE=source,
+                    geom=site,
+                    include_zero=zero,
+                    reference=reference,
+                    tile_scale=tile_scale)
+                if harmonized:
+                    scored = _add_score_band(col_ee, scored, score.name)
+                col_ee = scored
+                if self.fixed_point:
+                    col_ee = col_ee.map(self._quantize(score.name))
+
+        # Mask all bands with mask
+        col_ee = col_ee.map(lambda img: img.updateMask(img.select([0]).mask()))
+
+        # Get an image before the filter to catch all bands for proxy image
+        col_ee_image = col_ee.first()
+
+        # Filter Mask Cover
+        if self.filters:
+            for filt in self.filters:
+                if filt.name in ['MaskCover']:
+                    col_ee = filt.apply(col_ee)
+
+        # col_ee = self.make_proxy(col, col_ee, year, True)
+        col_ee = self.make_proxy(col_ee_image, col_ee, year)
+
+        if self.provenance:
+            # Add provenance band and col_id as a property
+            def addProvenance(img):
+                col_id = functions.get_col_id(col)
+                provenance = functions.get_provenance_image(
+                    col, img, self.bandname_provenance)
+                return img.addBands(provenance).set(
+                    self.bandname_col_id.upper(),
+                    col_id)
+            col_ee = col_ee.map(addProvenance)
+        else:
+            # Add col_id band
+            # Add col_id to the image as a property
+            def addBandID(img):
+                col_id = functions.get_col_id(col)
+                col_id_img = functions.get_col_id_image(col)
+                return img.addBands(col_id_img).set(
+                    self.bandname_col_id.upper(),
+                    col_id)
+            col_ee = col_ee.map(addBandID)
+
+            # Add date band
+            def addDateBand(img):
+                date = img.date()
+                year = date.get('year').format()
+
+                # Month
+                month = date.get('month')
+                month_str = month.format()
+                month = ee.String(ee.Algorithms.If(
+                    month.gte(10),
+                    month_str,
+                    ee.String('0').cat(month_str)))
+
+                # Day
+                day = date.get('day')
+                day_str = day.format()
+                day = ee.String(ee.Algorithms.If(
+                    day.gte(10),
+                    day_str,
+                    ee.String('0').cat(day_str)))
+
+                date_str = year.cat(month).cat(day)
+                newdate = ee.Number.parse(date_str)
+                newdate_img = ee.Image.constant(newdate) \
+                    .rename(self.bandname_date).toUint32()
+                return img.addBands(newdate_img)
+            col_ee = col_ee.map(addDateBand)
+
+        # Harmonize
+        col_ee = self._harmonize(col_ee, col, bands, indices)
+
+        return col_ee, imlist
+
+    def _harmonize(self, col_ee, col, bands=None, indices=None):
+        """ Harmonize the images of the collection (if `harmonize`). The
+        harmonization reads all the `HARMONIZE_BANDS`: the ones dropped by
+        `_prepare` are filled with zeros to harmonize and removed after
+
+        :param bands: the output bands (see `_prepare`)
+        :type bands: list
+        """
+        if not self.harmonize or 'harmonize' not in col.algorithms.keys():
+            return col_ee
+
+        required = None
+        if bands is not None:
+            required = self.required_bands(col, bands, indices)
+        names = [band.name for band in col.bands]
+        missing = [name for name in HARMONIZE_BANDS
+                   if name in names and required is not None and
+                   name not in required]
+        if not missing:
+            return col_ee.map(lambda img: col.harmonize(img, renamed=True))
+
+        filler = ee.Image.constant([0] * len(missing)).rename(missing)
+
+        def harmonize(img):
+            original = img.bandNames()
+            harmonized = col.harmonize(img.addBands(filler), renamed=True)
+            return ee.Image(harmonized).select(original)
+
+        return col_ee.map(harmonize)
+
+    @instrument.stage('merge')
+    def _merge(self, all_collection, used_images, common_bands):
+        """ Compute the final score, select the common bands and set the used
+        images to the merged collection """
         # create an empty score band in case no score is parsed
         empty_score = ee.Image.constant(0).rename(self.score_name).toUint8()
 
-        # List to store all used images
-        used_images = []
-
-        for col in colgroup.collections:
-            col_ee_bounds = col.collection
-
-            # Filter bounds
-            if isinstance(site, ee.Feature): site = site.geometry()
-            col_ee_bounds = col_ee_bounds.filterBounds(site)
-
-            for year in self.year_range(year):
-                daterange = self.season.add_year(year)
-
-                # filter date
-                col_ee = col_ee_bounds.filterDate(daterange.start(),
-                                                  daterange.end())
-
-                # some filters
-                if self.filters:
-                    for filt in self.filters:
-                        if filt.name in ['CloudCover']:
-                            col_ee = filt.apply(col_ee, col=col)
-
-                # BRDF
-                if self.brdf:
-                    if 'brdf' in col.algorithms.keys():
-                        col_ee = col_ee.map(lambda img: col.brdf(img))
-
-                # Proxy in case size == 0
-                col_ee = self.make_proxy(col.collection.first(), col_ee, year)
-
-                # store used images
-                imlist = ee.List(col_ee.toList(col_ee.size()).map(
-                    lambda img:
-                    ee.String(col.id).cat('/').cat(ee.Image(img).id())))
-                used_images.append(imlist)
-
-                # clip with site
-                if buffer is not None:
-                    site = site.buffer(buffer)
-                col_ee = col_ee.map(lambda img: img.clip(site))
-
-                # Add year as a property (YEAR_BAP)
-                col_ee = col_ee.map(lambda img: img.set('YEAR_BAP', year))
-
-                # Catch SLC off
-                slcoff = False
-                if col.spacecraft == 'LANDSAT' and col.number == 7:
-                    if year in priority.SeasonPriority.l7_slc_off:
-                        # Convert masked values to zero
-                        col_ee = col_ee.map(lambda img: img.unmask())
-                        slcoff = True
-
-                # Apply masks
-                if self.masks:
-                    for mask in self.masks:
-                        col_ee = mask.map(col_ee, col=col)
-
-                # Rename
-                col_ee = col_ee.map(lambda img: col.rename(img))
-
-                # Rescale
-                col_ee = col_ee.map(
-                    lambda img: collection.rescale(
-                        img, col, self.target_collection, renamed=True))
-
-                # Indices
-                if indices:
-                    for i in indices:
-                        f = getattr(col, i)
-                        def addindex(img):
-                            ind = f(img, renamed=True)
-                            return img.addBands(ind)
-                        col_ee = col_ee.map(addindex)
-
-                # Apply scores
-                if self.scores:
-                    for score in self.scores:
-                        zero = False if slcoff and isinstance(score, (scores.MaskPercent, scores.MaskPercentKernel)) else True
-                        col_ee = score._map(
-                            col_ee,
-                            col=col,
-                            year=year,
-                            colEE=col_ee,
-                            geom=site,
-                            include_zero=zero)
-
-                # Mask all bands with mask
-                col_ee = col_ee.map(lambda img: img.updateMask(img.select([0]).mask()))
-
-                # Get an image before the filter to catch all bands for proxy image
-                col_ee_image = col_ee.first()
-
-                # Filter Mask Cover
-                if self.filters:
-                    for filt in self.filters:
-                        if filt.name in ['MaskCover']:
-                            col_ee = filt.apply(col_ee)
-
-                # col_ee = self.make_proxy(col, col_ee, year, True)
-                col_ee = self.make_proxy(col_ee_image, col_ee, year)
-
-                # Add col_id band
-                # Add col_id to the image as a property
-                def addBandID(img):
-                    col_id = functions.get_col_id(col)
-                    col_id_img = functions.get_col_id_image(col)
-                    return img.addBands(col_id_img).set(
-                        self.bandname_col_id.upper(),
-                        col_id)
-                col_ee = col_ee.map(addBandID)
-
-                # Add date band
-                def addDateBand(img):
-                    date = img.date()
-                    year = date.get('year').format()
-
-                    # Month
-                    month = date.get('month')
-                    month_str = month.format()
-                    month = ee.String(ee.Algorithms.If(
-                        month.gte(10),
-                        month_str,
-                        ee.String('0').cat(month_str)))
-
-                    # Day
-                    day = date.get('day')
-                    day_str = day.format()
-                    day = ee.String(ee.Algorithms.If(
-                        day.gte(10),
-                        day_str,
-                        ee.String('0').cat(day_str)))
-
-                    date_str = year.cat(month).cat(day)
-                    newdate = ee.Number.parse(date_str)
-                    newdate_img = ee.Image.constant(newdate) \
-                        .rename(self.bandname_date).toUint32()
-                    return img.addBands(newdate_img)
-                col_ee = col_ee.map(addDateBand)
-
-                # Harmonize
-                if self.harmonize:
-                    # get max value for the needed bands
-
-                    if 'harmonize' in col.algorithms.keys():
-                        col_ee = col_ee.map(
-                            lambda img: col.harmonize(img, renamed=True))
-
-                col_ee_list = col_ee.toList(col_ee.size())
-
-                all_collections = all_collections.add(col_ee_list).flatten()
-
-        all_collection = ee.ImageCollection.fromImages(all_collections)
-
         # get all used images
         used_images = ee.List(used_images).flatten()
 
         # Compute final score
         # ftotal = tools.image.sumBands("score", scores)
-        if self.scores:
+        if self.scores and self.fixed_point:
+            # integer sum
+            levels = local.FIXED_POINT_LEVELS[self.fixed_point]
+            wide = levels * len(self.scores) > 2**16 - 1
+
+            def compute_score(img):
+                score = img.select(self.score_names).reduce('sum') \
+                    .rename('score')
+                score = score.toUint32() if wide else score.toUint16()
+                return img.addBands(score)
+        elif self.scores:
             def compute_score(img):
                 score = img.select(self.score_names).reduce('sum') \
                     .rename('score').toFloat()
@@ -310,6 +576,162 @@ class Bap(object):
 
         return final_collection
 
+    @instrument.stage()
+    def compute_scores(self, year, site, indices=None, **kwargs):
+        """ Add scores and merge collections. The images are filtered by the
+        bounds of the site but not clipped (see `prepare_site`)
+
+        :param add_individual_scores: adds the individual scores to the images
+        :type add_individual_scores: bool
+        :param buffer: make a buffer before cutting to the given site
+        :type buffer: float
+        :param exclude: images to leave out, as in BAP_USED_IMAGES
+        :type exclude: ee.List
+        :param tileScale: `tileScale` of the reductions of the scores (like
+            `MaskPercent`). Raise it if the computation runs out of memory
+        :type tileScale: float
+        """
+        add_individual_scores = kwargs.get('add_individual_scores', False)
+        buffer = kwargs.get('buffer', None)
+        exclude = kwargs.get('exclude', None)
+        tile_scale = kwargs.get('tileScale', 1)
+
+        all_collections = ee.List([])
+
+        years = self.year_range(year)
+
+        colgroup, all_col = self._colgroups(year)
+
+        common_bands = self._common_bands(all_col, indices,
+                                          add_individual_scores)
+        output_bands = self._output_bands(all_col)
+
+        # List to store all used images
+        used_images = []
+
+        site, region = self.prepare_site(site, buffer)
+
+        # Collection statistics computed once over all slices
+        reference = None
+        if self.global_stats:
+            reference = self.reference_collection(colgroup, years, region,
+                                                  indices, output_bands)
+
+        for col in colgroup.collections:
+            col_ee_bounds = col.collection
+
+            # Filter bounds
+            col_ee_bounds = col_ee_bounds.filterBounds(region)
+
+            for year in years:
+                col_ee, imlist = self._slice(col_ee_bounds, col, year, site,
+                                             indices, reference=reference,
+                                             exclude=exclude,
+                                             bands=output_bands,
+                                             tile_scale=tile_scale)
+                used_images.append(imlist)
+
+                col_ee_list = col_ee.toList(col_ee.size())
+
+                all_collections = all_collections.add(col_ee_list).flatten()
+
+        all_collection = ee.ImageCollection.fromImages(all_collections)
+
+        return self._merge(all_collection, used_images, common_bands)
+
+    @instrument.stage()
+    def build_series(self, years, site, indices=None, **kwargs):
+        """ Build the composites of many years sharing the work. Each
+        collection is filtered once over the whole period and each
+        (collection, year) slice is scored once, even if it is part of the
+        range of many years. Scores that depend on the target year
+        (`Score.year_dependent`, like `MultiYear`) and scores with
+        `global_stats` are applied to each year's merged collection.
+
+        :param years: the years of the series
+        :type years: list
+        :param site: the site
+        :type site: ee.Geometry or ee.Feature
+        :param add_individual_scores: adds the individual scores to the images
+        :type add_individual_scores: bool
+        :param buffer: make a buffer before cutting to the given site
+        :type buffer: float
+        :return: the composite of each year
+        :rtype: collections.OrderedDict
+        """
+        add_individual_scores = kwargs.get('add_individual_scores', False)
+        buffer = kwargs.get('buffer', None)
+
+        site, region = self.prepare_site(site, buffer)
+
+        score_list = self.scores or []
+        year_scores = [score for score in score_list
+                       if score.year_dependent or
+                       getattr(score, 'global_stats', False)]
+        slice_scores = [score for score in score_list
+                        if score not in year_scores]
+
+        # whole period
+        years = sorted(years)
+        all_years = sorted(set(y for year in years
+                               for y in self.year_range(year)))
+        start = self.season.add_year(all_years[0]).start()
+        end = self.season.add_year(all_years[-1]).end()
+
+        # same bands for all the composites of the series
+        series_col = []
+        for year in years:
+            series_col.extend(self._colgroups(year)[1])
+        common_bands = self._common_bands(series_col, indices,
+                                          add_individual_scores)
+        output_bands = self._output_bands(series_col)
+
+        filtered = {}
+        slices = {}
+        composites = OrderedDict()
+        for year in years:
+            colgroup, all_col = self._colgroups(year)
+            all_collections = ee.List([])
+            used_images = []
+            for col in colgroup.collections:
+                if col.id not in filtered:
+                    filtered[col.id] = col.collection.filterBounds(region) \
+                        .filterDate(start, end)
+
+                for y in self.year_range(year):
+                    key = (col.id, y)
+                    if key not in slices:
+                        slices[key] = self._slice(filtered[col.id], col, y,
+                                                  site, indices, slice_scores,
+                                                  bands=output_bands)
+                    col_ee, imlist = slices[key]
+                    used_images.append(imlist)
+                    all_collections = all_collections.add(
+                        col_ee.toList(col_ee.size())).flatten()
+
+            all_collection = ee.ImageCollection.fromImages(all_collections)
+
+            # per year scores
+            reference = None
+            if self.global_stats:
+                reference = self.reference_collection(
+                    colgroup, self.year_range(year), region, indices,
+                    output_bands)
+            for score in year_scores:
+                all_collection = score.for_year(year)._map(
+                    all_collection, year=year, colEE=all_collection,
+                    geom=site, reference=reference)
+                if self.fixed_point:
+                    all_collection = all_collection.map(
+                        self._quantize(score.name))
+
+            col = self._merge(all_collection, used_images, common_bands)
+            mosaic = col.qualityMosaic(self.score_name).clip(site)
+            composites[year] = self.set_properties(mosaic, year, col, site)
+
+        return composites
+
+    @instrument.stage()
     def build_composite_best(self, year, site, indices=None, **kwargs):
         """ Build the a composite with best score
 
@@ -320,10 +742,190 @@ class Bap(object):
         """
         # TODO: pass properties
         col = self.compute_scores(year, site, indices, **kwargs)
-        mosaic = col.qualityMosaic(self.score_name)
+        site, _ = self.prepare_site(site, kwargs.get('buffer', None))
+        mosaic = col.qualityMosaic(self.score_name).clip(site)
 
-        return self.set_properties(mosaic, year, col)
+        return self.set_properties(mosaic, year, col, site)
 
+    @property
+    def collection_scores(self):
+        """ Scores that depend on the whole collection (see
+        `Score.collection_score`) """
+        return [score for score in self.scores or []
+                if score.collection_score]
+
+    def _check_incremental(self, what):
+        """ Raise a ValueError if some scores can not be computed over only
+        a part of the collection """
+        collection_scores = self.collection_scores
+        if collection_scores:
+            names = [score.name for score in collection_scores]
+            msg = "scores {} depend on the whole collection, the {} " \
+                  "needs a full rebuild".format(names, what)
+            raise ValueError(msg)
+
+    @instrument.stage()
+    def update_composite(self, composite, year, site, indices=None,
+                         **kwargs):
+        """ Update a composite made with `build_composite_best` with the
+        images that arrived after it was made. Only the new images are
+        scored, and the composite keeps, for each pixel, the image with the
+        highest score. The composite must have been made by this Bap with the
+        same parameters (its bands hold the state: score, col_id and date,
+        and the property BAP_USED_IMAGES the images already used).
+
+        Scores that depend on the whole collection (like `Outliers` or `Doy`)
+        change when new images arrive, so a composite that uses them must be
+        rebuilt.
+
+        :param composite: the composite to update
+        :type composite: ee.Image
+        :param add_individual_scores: adds the individual scores to the images
+        :type add_individual_scores: bool
+        :param buffer: make a buffer before cutting to the given site
+        :type buffer: float
+        :param exclude: other images to leave out (besides the ones already
+            used), as in BAP_USED_IMAGES
+        :type exclude: ee.List
+        :return: the updated composite
+        :rtype: ee.Image
+        """
+        self._check_incremental('composite')
+
+        composite = ee.Image(composite)
+        used = ee.List(composite.get('BAP_USED_IMAGES'))
+
+        exclude = kwargs.pop('exclude', None)
+        exclude = used if exclude is None else used.cat(ee.List(exclude))
+
+        col = self.compute_scores(year, site, indices, exclude=exclude,
+                                  **kwargs)
+        site, _ = self.prepare_site(site, kwargs.get('buffer', None))
+        new = col.qualityMosaic(self.score_name).clip(site)
+        new = new.select(composite.bandNames())
+
+        # keep only the pixels that beat the composite
+        old_score = composite.select(self.score_name)
+        new_score = new.select(self.score_name)
+        better = new_score.gt(old_score).Or(old_score.mask().Not())
+        new = new.updateMask(better)
+
+        mosaic = ee.ImageCollection.fromImages([composite, new]) \
+            .qualityMosaic(self.score_name)
+
+        mosaic = self.set_properties(mosaic, year, col)
+
+        all_used = used.cat(ee.List(col.get('BAP_USED_IMAGES'))).distinct()
+
+        return mosaic.set('BAP_USED_IMAGES', all_used,
+                          'system:footprint',
+                          composite.get('system:footprint'))
+
+    @instrument.stage()
+    def score_layers(self, year, site, indices=None, cached=None, **kwargs):
+        """ Collection with the individual score bands of each image, to
+        cache them (for example exporting the images to an asset) and make
+        new composites with `recomposite`. Each image has the properties
+        BAP_IMAGE_ID and BAP_SCORE_KEYS (see `scorecache.score_keys`).
+
+        :param cached: layers already cached. Its images computed with the
+            same scores are not computed again. Not allowed with scores that
+            depend on the whole collection (ValueError)
+        :type cached: ee.ImageCollection
+        :param buffer: make a buffer before cutting to the given site
+        :type buffer: float
+        :rtype: ee.ImageCollection
+        """
+        keys = scorecache.score_keys(self.scores)
+        kwargs['add_individual_scores'] = True
+
+        if cached is not None:
+            self._check_incremental('score layers')
+            cached = cached.filter(ee.Filter.eq('BAP_SCORE_KEYS', keys))
+            kwargs['exclude'] = cached.aggregate_array('BAP_IMAGE_ID')
+
+        col = self.compute_scores(year, site, indices, **kwargs)
+        col = col.map(lambda img: img.set('BAP_SCORE_KEYS', keys))
+
+        if cached is not None:
+            col = cached.merge(col)
+
+        return col
+
+    @instrument.stage()
+    def recomposite(self, layers, year, weights=None, range_out=None):
+        """ Make the composite with best score from cached score layers (see
+        `score_layers`) with new weights or new `range_out` for the scores,
+        without computing the scores again
+
+        :param layers: the score layers
+        :type layers: ee.ImageCollection
+        :param weights: dict of score name -> weight
+        :type weights: dict
+        :param range_out: dict of score name -> new range_out
+        :type range_out: dict
+        :rtype: ee.Image
+        """
+        ranges = scorecache.ranges(self.scores)
+        if self.fixed_point:
+            # from fixed point back to the score ranges
+            resolution = self.fixed_point_resolution
+            range_out = dict(ranges, **(range_out or {}))
+            ranges = dict((name, (low / resolution, high / resolution))
+                          for name, (low, high) in ranges.items())
+        mosaic = scorecache.recomposite(layers, weights, ranges,
+                                        range_out, self.score_name)
+        mosaic = self.set_properties(mosaic, year, layers)
+        return mosaic.set('BAP_USED_IMAGES',
+                          layers.aggregate_array('BAP_IMAGE_ID'))
+
+    @instrument.stage()
+    def build_composite_batch(self, year, site_list, indices=None,
+                              distance=0.1, max_extent=2, **kwargs):
+        """ Build the composites with best score for many sites. The sites
+        are grouped by proximity (see `sites.group_by_proximity`) and, for
+        each group, the filtering and scoring of the images is done once over
+        the bounds of the group. Then each site gets its own composite.
+
+        Scores that depend on the geometry (like `MaskPercent`) are computed
+        over the bounds of the group.
+
+        :param site_list: the sites
+        :type site_list: ee.FeatureCollection or list
+        :param distance: maximum distance (in degrees) between the bounds of
+            the sites of a group
+        :type distance: float
+        :param max_extent: maximum width and height (in degrees) of the
+            bounds of a group
+        :type max_extent: float
+        :param add_individual_scores: adds the individual scores to the images
+        :type add_individual_scores: bool
+        :param buffer: make a buffer before cutting to the given site
+        :type buffer: float
+        :return: the composites, in the same order as the sites
+        :rtype: list
+        """
+        site_list = sites.to_list(site_list)
+        bounds = sites.get_bounds(site_list)
+        groups = sites.group_by_proximity(bounds, distance, max_extent)
+
+        composites = [None] * len(site_list)
+        for group in groups:
+            xmin, ymin, xmax, ymax = sites.union_bounds(
+                [bounds[i] for i in group])
+            region = ee.Geometry.Rectangle([xmin, ymin, xmax, ymax])
+            col = self.compute_scores(year, region, indices, **kwargs)
+            mosaic = col.qualityMosaic(self.score_name)
+            mosaic = self.set_properties(mosaic, year, col)
+            for i in group:
+                site, _ = self.prepare_site(site_list[i],
+                                            kwargs.get('buffer', None))
+                composites[i] = mosaic.clip(site).set(
+                    'system:footprint', site)
+
+        return composites
+
+    @instrument.stage()
     def build_composite_reduced(self, year, site, indices=None, **kwargs):
         """ Build the composite where
 
@@ -336,12 +938,20 @@ class Bap(object):
         nimages = kwargs.get('set', 5)
         reducer = kwargs.get('reducer', 'interval_mean')
         col = self.compute_scores(year, site, indices, **kwargs)
+        site, _ = self.prepare_site(site, kwargs.get('buffer', None))
         mosaic = reduce_collection(col, nimages, reducer, self.score_name)
+        mosaic = mosaic.clip(site)
 
-        return self.set_properties(mosaic, year)
+        return self.set_properties(mosaic, year, col, site)
 
-    def set_properties(self, mosaic, year, col):
-        """ Set some BAP common properties to the given mosaic """
+    def set_properties(self, mosaic, year, col, site=None):
+        """ Set some BAP common properties to the given mosaic
+
+        :param site: the site the mosaic is clipped to, used as its
+            footprint. If None, the footprint is the union of the footprints
+            of the images of the collection
+        :type site: ee.Geometry
+        """
         # USED IMAGES
         used_images = col.get('BAP_USED_IMAGES')
         mosaic = mosaic.set('BAP_USED_IMAGES', used_images)
@@ -360,8 +970,15 @@ class Bap(object):
         mosaic = mosaic.set('BAP_PARAMETERS', bap_params)
 
         # FOOTPRINT
-        geom = tools.imagecollection.mergeGeometries(col)
-        mosaic = mosaic.set('system:footprint', geom)
+        if site is None:
+            site = tools.imagecollection.mergeGeometries(col)
+        mosaic = mosaic.set('system:footprint', site)
+
+        # Band names (for the inspector, see ipytools)
+        mosaic = mosaic.set('BAP_BANDNAMES', {
+            'col_id': self.bandname_col_id,
+            'date': self.bandname_date,
+            'provenance': self.bandname_provenance})
 
         # Seasons
         for year in self.year_range(year):
@@ -376,6 +993,41 @@ class Bap(object):
         return mosaic
 
 
+@utils.memoize(priority.CACHE_SIZE)
+def season_colgroups(year, years):
+    """ Collection group of the given year and all the collections of the
+    given years (cached)
+
+    :type year: int
+    :type years: tuple
+    :rtype: tuple
+    """
+    colgroup = priority.SeasonPriority(year).colgroup
+    all_col = []
+    for y in years:
+        all_col.extend(priority.SeasonPriority(y).colgroup.collections)
+    return colgroup, tuple(all_col)
+
+
+def _add_score_band(collection, scored, name):
+    """ Add the score band of the images of `scored` to the same images
+    (matched by system:index) of `collection`
+
+    :type collection: ee.ImageCollection
+    :param scored: the images of the collection with the score band
+    :type scored: ee.ImageCollection
+    :param name: name of the score band
+    :type name: str
+    :rtype: ee.ImageCollection
+    """
+    same = ee.Filter.equals(leftField='system:index',
+                            rightField='system:index')
+    pairs = ee.Join.inner().apply(collection, scored, same)
+    return ee.ImageCollection(pairs.map(
+        lambda pair: ee.Image(pair.get('primary')).addBands(
+            ee.Image(pair.get('secondary')).select([name]))))
+
+
 def reduce_collection(collection, set=5, reducer='mean',
                       scoreband='score'):
     """ Reduce the collection and get a statistic from a set of pixels
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+""" Persistent cache for the results of client side evaluations.
+
+The results are stored on disk, one JSON file per result, named by the hash
+of the serialized Earth Engine graph, so identical graphs resolve from disk
+instead of making another request. The total size of the cache is bounded
+(least recently used results are evicted first) and the results can expire
+after a time to live.
+
+:Usage:
+
+.. code:: python
+
+    from geebap import cache, evaluation
+
+    evaluation.set_cache(cache.DiskCache('~/.cache/geebap', ttl=86400))
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def serialize(obj):
+    """ Serialize an object to use as a key. Earth Engine objects are
+    serialized with their `serialize` method, the rest as JSON
+
+    :rtype: str
+    """
+    method = getattr(obj, 'serialize', None)
+    if callable(method):
+        return method()
+    return json.dumps(obj, sort_keys=True)
+
+
+class DiskCache(object):
+    """ Content addressed, size bounded cache on disk
+
+    :param path: the directory that holds the cache
+    :type path: str
+    :param max_size: maximum size of the cache in bytes
+    :type max_size: int
+    :param ttl: time to live of the results in seconds. If None, results do
+        not expire
+    :type ttl: float
+    :param key_function: function that serializes an object to a string
+        (defaults to `serialize`)
+    :type key_function: function
+    """
+    def __init__(self, path, max_size=256*1024**2, ttl=None,
+                 key_function=None):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key_function = key_function or serialize
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        self._size = sum(os.path.getsize(f) for f in self._files())
+
+    def _files(self):
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith('.json'):
+                    yield os.path.join(root, name)
+
+    def _filename(self, key):
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    @property
+    def size(self):
+        """ Total size of the cache in bytes """
+        return self._size
+
+    def key(self, obj):
+        """ Hash of the serialized object
+
+        :rtype: str
+        """
+        serialized = self.key_function(obj)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Get a result from the cache
+
+        :param key: the key (see `key`)
+        :type key: str
+        :return: whether the key was found and the value
+        :rtype: tuple
+        """
+        filename = self._filename(key)
+        try:
+            with open(filename) as f:
+                content = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False, None
+
+        age = time.time() - content['created']
+        if self.ttl is not None and age > self.ttl:
+            self._remove(filename)
+            return False, None
+
+        # mark as recently used
+        try:
+            os.utime(filename, None)
+        except OSError:
+            pass
+
+        return True, content['value']
+
+    def set(self, key, value):
+        """ Store a result in the cache
+
+        :param key: the key (see `key`)
+        :type key: str
+        :param value: a JSON serializable value
+        """
+        filename = self._filename(key)
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                pass  # created by another thread
+
+        content = json.dumps({'created': time.time(), 'value': value})
+        # unique among the threads and processes that share the directory
+        fd, temp = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+
+        with self._lock:
+            if os.path.exists(filename):
+                self._size -= os.path.getsize(filename)
+            os.replace(temp, filename)
+            self._size += len(content)
+
+        if self._size > self.max_size:
+            self.evict()
+
+    def _remove(self, filename):
+        with self._lock:
+            try:
+                size = os.path.getsize(filename)
+                os.remove(filename)
+            except OSError:
+                return
+            self._size -= size
+
+    def evict(self):
+        """ Remove the least recently used results until the size of the
+        cache is under the limit """
+        files = []
+        for filename in self._files():
+            try:
+                files.append((os.path.getmtime(filename), filename))
+            except OSError:
+                continue
+
+        for _, filename in sorted(files):
+            if self._size <= self.max_size:
+                break
+            self._remove(filename)
+
+    def clear(self):
+        """ Remove all results """
+        for filename in list(self._files()):
+            self._remove(filename)
+
+    def __call__(self, obj, compute):
+        """ Get the result of an object from the cache or compute it (and
+        store it)
+
+        :param obj: the object
+        :param compute: function that takes the object and returns its value
+        :type compute: function
+        """
+        key = self.key(obj)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute(obj)
+        self.set(key, value)
+        return value
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 """ Date module for Gee Bap """
 import ee
+from .utils import lazy_class_attribute
+from . import evaluation
 
 
 class Date(object):
@@ -16,7 +18,10 @@ class Date(object):
     :mapfecha: estatico para utilizar con ee.ImageCollection.map()
     """
     oneday_local = 86400000  # milisegundos
-    oneday = ee.Number(oneday_local)
+
+    @lazy_class_attribute
+    def oneday(cls):
+        return ee.Number(cls.oneday_local)
 
     def __init__(self):
         ''' This Class doesn't initialize '''
@@ -50,7 +55,7 @@ class Date(object):
         :rtype: float
         """
         d = ee.Date(date)
-        mili = d.millis().getInfo()
+        mili = evaluation.evaluate(d.millis())
         return float(mili / Date.oneday_local)
 
     @staticmethod
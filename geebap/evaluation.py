@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+""" Client side evaluation of Earth Engine objects.
+
+Evaluates many computed objects (sizes, dictionaries, values) concurrently
+with a bounded thread pool. Rate limit errors (for example 'Too many
+concurrent aggregations') are retried with jittered exponential backoff, and
+the number of requests in flight is limited globally for all the evaluators.
+
+:Usage:
+
+.. code:: python
+
+    from geebap import evaluation
+
+    sizes = evaluation.evaluate_many([col.size() for col in collections])
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import instrument
+
+# Pieces of the error messages that mean 'try again later'
+RATE_LIMIT_MESSAGES = ('too many concurrent aggregations',
+                       'too many requests',
+                       'rate limit',
+                       'quota exceeded',
+                       '429')
+
+IN_FLIGHT_LIMIT = 10
+_in_flight = threading.BoundedSemaphore(IN_FLIGHT_LIMIT)
+
+
+def set_in_flight_limit(limit):
+    """ Set the global limit of requests in flight (shared by all the
+    evaluators that do not have their own limit). Do not call it while there
+    are evaluations running
+
+    :param limit: maximum number of concurrent requests
+    :type limit: int
+    """
+    global _in_flight, IN_FLIGHT_LIMIT
+    IN_FLIGHT_LIMIT = limit
+    _in_flight = threading.BoundedSemaphore(limit)
+
+
+def is_rate_limit(error):
+    """ Check if the error is a rate limit error
+
+    :rtype: bool
+    """
+    message = str(error).lower()
+    return any(m in message for m in RATE_LIMIT_MESSAGES)
+
+
+def get_info(obj):
+    """ Default backend: `getInfo` of the computed object """
+    return obj.getInfo()
+
+
+class Evaluator(object):
+    """ Evaluate computed objects concurrently
+
+    :param workers: number of threads
+    :type workers: int
+    :param max_in_flight: limit of requests in flight for this evaluator. It
+        is applied on top of the global limit (see `set_in_flight_limit`),
+        never instead of it
+    :type max_in_flight: int
+    :param retries: how many times to retry a rate limited request
+    :type retries: int
+    :param base_delay: delay (seconds) for the first retry. It is doubled
+        for each retry
+    :type base_delay: float
+    :param max_delay: maximum delay (seconds) between retries
+    :type max_delay: float
+    :param backend: function that takes a computed object and returns its
+        value. Defaults to `get_info`
+    :type backend: function
+    :param sleep: function used to wait between retries
+    :type sleep: function
+    :param cache: cache for the results (see `cache.DiskCache`)
+    :type cache: cache.DiskCache
+    """
+    def __init__(self, workers=8, max_in_flight=None, retries=8,
+                 base_delay=1, max_delay=60, backend=None, sleep=time.sleep,
+                 cache=None):
+        self.workers = workers
+        self.cache = cache
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.backend = backend or get_info
+        self.sleep = sleep
+        if max_in_flight is None:
+            self._semaphore = None
+        else:
+            self._semaphore = threading.BoundedSemaphore(max_in_flight)
+
+    @property
+    def semaphores(self):
+        """ Semaphores acquired for each request: the limit of the evaluator
+        (if any) and the global limit """
+        if self._semaphore is None:
+            return (_in_flight,)
+        return (self._semaphore, _in_flight)
+
+    def delay(self, attempt):
+        """ Time to wait before the given retry (full jitter) """
+        cap = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(0, cap)
+
+    def evaluate(self, obj):
+        """ Evaluate one object, retrying if it is rate limited. If the
+        evaluator has a cache, identical objects are resolved from it
+
+        :param obj: the computed object
+        :return: the value of the object
+        """
+        if self.cache is not None:
+            return self.cache(obj, self._evaluate)
+        return self._evaluate(obj)
+
+    def _evaluate(self, obj):
+        attempt = 0
+        while True:
+            semaphores = self.semaphores
+            for semaphore in semaphores:
+                semaphore.acquire()
+            try:
+                return instrument.call('getinfo', self.backend, obj)
+            except Exception as e:
+                if not is_rate_limit(e) or attempt >= self.retries:
+                    raise
+            finally:
+                for semaphore in reversed(semaphores):
+                    semaphore.release()
+            self.sleep(self.delay(attempt))
+            attempt += 1
+
+    def evaluate_many(self, objects):
+        """ Evaluate many objects concurrently
+
+        :param objects: a list of computed objects or a dict in which the
+            values are computed objects
+        :type objects: list or dict
+        :return: the values, in a list or in a dict with the same keys
+        :rtype: list or dict
+        """
+        if isinstance(objects, dict):
+            keys = list(objects.keys())
+            values = self.evaluate_many([objects[k] for k in keys])
+            return dict(zip(keys, values))
+
+        objects = list(objects)
+        if len(objects) <= 1:
+            return [self.evaluate(obj) for obj in objects]
+
+        workers = min(self.workers, len(objects))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.evaluate, objects))
+
+
+_default = Evaluator()
+
+
+def set_default(evaluator):
+    """ Set the evaluator used by `evaluate` and `evaluate_many`
+
+    :type evaluator: Evaluator
+    """
+    global _default
+    _default = evaluator
+
+
+def get_default():
+    """ Get the evaluator used by `evaluate` and `evaluate_many`
+
+    :rtype: Evaluator
+    """
+    return _default
+
+
+def set_cache(cache):
+    """ Set the cache of the default evaluator. All the client side
+    evaluations of geebap go through it
+
+    :type cache: cache.DiskCache
+    """
+    _default.cache = cache
+
+
+def evaluate(obj):
+    """ Evaluate one object with the default evaluator """
+    return _default.evaluate(obj)
+
+
+def evaluate_many(objects):
+    """ Evaluate many objects with the default evaluator """
+    return _default.evaluate_many(objects)
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 """ Generate expression compatible with Google Earth Engine """
 import simpleeval as sval
+import numpy as np
 import ast
 import math
+import sys
 
 
 class ExpGen(object):
@@ -98,4 +100,131 @@ class SvalEE(sval.SimpleEval):
 
         self.operators = DEFAULT_OPERATORS
         self.functions = DEFAULT_FUNCTIONS
-        self.names = DEFAULT_NAMES
\ No newline at end of file
+        self.names = DEFAULT_NAMES
+
+
+# NUMPY
+NUMPY_FUNCTIONS = {"max": np.maximum,
+                   "min": np.minimum,
+                   "exp": np.exp,
+                   "sqrt": np.sqrt}
+NUMPY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv,
+                   ast.Pow, ast.Mod, ast.UAdd, ast.USub, ast.Eq, ast.NotEq,
+                   ast.Gt, ast.Lt, ast.GtE, ast.LtE)
+
+# numbers are parsed as ast.Num before python 3.8
+if sys.version_info < (3, 8):
+    NUMBER_NODES = (ast.Num,)
+else:
+    NUMBER_NODES = (ast.Constant,)
+
+
+def _number(node):
+    """ Value of a number node """
+    return node.n if sys.version_info < (3, 8) else node.value
+
+
+class CompiledExpression(object):
+    """ An expression parsed once into an AST that can be turned into an
+    Earth Engine expression (`ee`) or evaluated over NumPy arrays (calling
+    the object). It admits the same operators, names and functions of
+    `SvalEE`.
+
+    :Usage:
+
+    .. code:: python
+
+        compiled = CompiledExpression("exp(var*2)+pi")
+        compiled.ee  # '(exp((var*2))+3.141592653589793)'
+        compiled(np.arange(10))  # array with 10 results
+
+    :param expression: the expression using python syntax
+    :type expression: str
+    :param variable: the name of the variable in the expression
+    :type variable: str
+    """
+    def __init__(self, expression, variable='var'):
+        self.expression = expression
+        self.variable = variable
+        self.tree = ast.parse(expression.strip(), mode='eval')
+        self._check(self.tree.body)
+        self._code = compile(self.tree, '<expression>', 'eval')
+        self._ee = None
+
+    def _check(self, node):
+        """ Only allow the operators, names and functions of the
+        expressions """
+        if isinstance(node, ast.BinOp):
+            self._check_op(node.op)
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp):
+            self._check_op(node.op)
+            self._check(node.operand)
+        elif isinstance(node, ast.Compare):
+            if len(node.ops) > 1:
+                raise ValueError('Chained comparisons are not allowed')
+            self._check_op(node.ops[0])
+            self._check(node.left)
+            self._check(node.comparators[0])
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or \
+                    node.func.id not in NUMPY_FUNCTIONS or node.keywords:
+                raise ValueError('Function not allowed in expression: '
+                                 '{}'.format(ast.dump(node.func)))
+            for arg in node.args:
+                self._check(arg)
+        elif isinstance(node, ast.Name):
+            if node.id not in DEFAULT_NAMES and node.id != self.variable:
+                raise ValueError('Name {} not defined'.format(node.id))
+        elif isinstance(node, NUMBER_NODES):
+            value = _number(node)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise ValueError('Constant {} not allowed'.format(value))
+        else:
+            raise ValueError('{} not allowed in expression'.format(
+                node.__class__.__name__))
+
+    @staticmethod
+    def _check_op(op):
+        if not isinstance(op, NUMPY_OPERATORS):
+            raise ValueError('Operator {} not allowed'.format(
+                op.__class__.__name__))
+
+    def _to_ee(self, node):
+        """ Generate the EE expression of a node (same output of `SvalEE`) """
+        if isinstance(node, ast.BinOp):
+            return DEFAULT_OPERATORS[type(node.op)](self._to_ee(node.left),
+                                                    self._to_ee(node.right))
+        elif isinstance(node, ast.UnaryOp):
+            return DEFAULT_OPERATORS[type(node.op)](self._to_ee(node.operand))
+        elif isinstance(node, ast.Compare):
+            return DEFAULT_OPERATORS[type(node.ops[0])](
+                self._to_ee(node.left), self._to_ee(node.comparators[0]))
+        elif isinstance(node, ast.Call):
+            args = [self._to_ee(arg) for arg in node.args]
+            return DEFAULT_FUNCTIONS[node.func.id](*args)
+        elif isinstance(node, ast.Name):
+            if node.id == self.variable:
+                return node.id
+            return DEFAULT_NAMES[node.id]
+        else:
+            return _number(node)
+
+    @property
+    def ee(self):
+        """ The expression ready to use in `ee.Image.expression` """
+        if self._ee is None:
+            self._ee = "{}".format(self._to_ee(self.tree.body))
+        return self._ee
+
+    def __call__(self, var):
+        """ Evaluate the expression over a value or an array of values
+
+        :param var: the value of the variable
+        :type var: float or numpy.ndarray
+        """
+        names = dict(DEFAULT_NAMES)
+        names.update(NUMPY_FUNCTIONS)
+        names[self.variable] = var
+        return eval(self._code, {'__builtins__': {}}, names)
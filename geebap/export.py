@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+""" Run many exports (per tile, per year) unattended.
+
+The manager keeps at most N tasks running, polls their status with backoff,
+retries failed tasks with a bigger `tileScale` and then with smaller tiles,
+and records the progress in a JSON state file, so an interrupted run resumes
+where it stopped.
+
+The tasks are handled by a backend with two methods:
+
+- `start(job_id, params)`: start the task for the job and return its id
+- `status(task_id)`: return a tuple (state, error message) where state is
+  one of 'RUNNING', 'COMPLETED' or 'FAILED'
+
+`EEBackend` runs Earth Engine tasks built by a function that takes the job
+params (for example `year` and `tile`) and returns an `ee.batch.Task`.
+
+:Usage:
+
+.. code:: python
+
+    from geebap import export, tiling
+
+    def build(job_id, params):
+        tile = tiling.Tile.from_dict(params['tile'])
+        image = bap.build_composite_best(params['year'], tile.geometry(crs),
+                                         tileScale=params['tileScale'])
+        return ee.batch.Export.image.toAsset(
+            image.clip(tile.geometry(crs, halo=False)),
+            assetId='users/me/bap/' + job_id,
+            region=tile.geometry(crs, halo=False), scale=30, crs=crs,
+            maxPixels=1e13)
+
+    manager = export.ExportManager(export.EEBackend(build), 'state.json',
+                                   max_running=10)
+    manager.add_plan(plan, years=[2018, 2019])
+    manager.run()
+"""
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from . import instrument, tiling
+
+PENDING = 'PENDING'
+RUNNING = 'RUNNING'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+SPLIT = 'SPLIT'
+
+MAX_TILE_SCALE = 16
+
+
+class EEBackend(object):
+    """ Earth Engine tasks
+
+    :param build: function that takes the job id and its params and returns
+        an (unstarted) `ee.batch.Task`
+    :type build: function
+    """
+    STATES = {'UNSUBMITTED': RUNNING, 'READY': RUNNING, 'RUNNING': RUNNING,
+              'COMPLETED': COMPLETED, 'FAILED': FAILED,
+              'CANCEL_REQUESTED': FAILED, 'CANCELLED': FAILED}
+
+    def __init__(self, build):
+        self.build = build
+
+    def start(self, job_id, params):
+        task = self.build(job_id, params)
+        instrument.call('exports', task.start)
+        return task.id
+
+    def status(self, task_id):
+        import ee
+        status = ee.data.getTaskStatus(task_id)[0]
+        state = self.STATES.get(status.get('state'), FAILED)
+        return state, status.get('error_message')
+
+
+def split_tile(params):
+    """ Split the tile of a job in four. Returns the params of the new jobs
+    or an empty list if the job has no tile """
+    if 'tile' not in params:
+        return []
+    tile = tiling.Tile.from_dict(params['tile'])
+    if tile.height < 2 and tile.width < 2:
+        return []
+    splitted = []
+    for subtile in tile.split():
+        new = dict(params)
+        new['tile'] = subtile.to_dict()
+        splitted.append(new)
+    return splitted
+
+
+class ExportManager(object):
+    """ Export manager
+
+    :param backend: the task service (see module docs)
+    :param path: path of the JSON state file. If None, the state is not saved
+    :type path: str
+    :param max_running: maximum number of tasks running at the same time
+    :type max_running: int
+    :param retries: how many times a job is retried increasing its
+        `tileScale` before splitting it
+    :type retries: int
+    :param poll: first poll interval in seconds. It is doubled each time
+        nothing changes, up to `max_poll`
+    :type poll: float
+    :param max_poll: maximum poll interval in seconds
+    :type max_poll: float
+    :param split: function that takes the params of a failed job and
+        returns the params of the smaller jobs that replace it
+    :type split: function
+    :param sleep: function used to wait
+    :type sleep: function
+    """
+    def __init__(self, backend, path=None, max_running=5, retries=3,
+                 poll=10, max_poll=300, split=split_tile, sleep=time.sleep):
+        self.backend = backend
+        self.path = path
+        self.max_running = max_running
+        self.retries = retries
+        self.poll = poll
+        self.max_poll = max_poll
+        self.split = split
+        self.sleep = sleep
+        self.jobs = OrderedDict()
+        self.load()
+
+    def load(self):
+        """ Load the state file (if exists) """
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                jobs = json.load(f, object_pairs_hook=OrderedDict)
+            self.jobs.update(jobs)
+
+    def save(self):
+        """ Write the state file """
+        if not self.path:
+            return
+        temp = self.path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(self.jobs, f, indent=1)
+        os.replace(temp, self.path)
+
+    def add(self, job_id, **params):
+        """ Add a job. Jobs already in the state are not added again
+
+        :param job_id: unique id of the job
+        :type job_id: str
+        :param params: JSON serializable params for the backend
+        """
+        if job_id in self.jobs:
+            return
+        params.setdefault('tileScale', 1)
+        self.jobs[job_id] = dict(params=params, state=PENDING, task=None,
+                                 attempts=0, error=None)
+        self.save()
+
+    def add_plan(self, plan, years=None, **params):
+        """ Add a job for each tile of the plan (and each year)
+
+        :type plan: tiling.Plan
+        :param years: list of years. If None, a job per tile
+        :type years: list
+        """
+        for tile in plan:
+            if years is None:
+                self.add(tile.id, tile=tile.to_dict(), **params)
+                continue
+            for year in years:
+                self.add('{}-{}'.format(year, tile.id), year=year,
+                         tile=tile.to_dict(), **params)
+
+    def count(self, state):
+        return sum(1 for job in self.jobs.values() if job['state'] == state)
+
+    @property
+    def done(self):
+        return all(job['state'] in (COMPLETED, FAILED, SPLIT)
+                   for job in self.jobs.values())
+
+    def _start(self, job_id):
+        job = self.jobs[job_id]
+        job['task'] = self.backend.start(job_id, job['params'])
+        job['state'] = RUNNING
+        job['attempts'] += 1
+
+    def _failed(self, job_id, error):
+        job = self.jobs[job_id]
+        job['error'] = error
+        params = job['params']
+        tile_scale = params.get('tileScale', 1)
+
+        if job['attempts'] <= self.retries and tile_scale < MAX_TILE_SCALE:
+            params['tileScale'] = min(tile_scale * 2, MAX_TILE_SCALE)
+            job['state'] = PENDING
+            return
+
+        splitted = self.split(params) if self.split else []
+        if not splitted:
+            job['state'] = FAILED
+            return
+
+        job['state'] = SPLIT
+        for n, new in enumerate(splitted):
+            new = dict(new)
+            new['tileScale'] = 1
+            self.add('{}.{}'.format(job_id, n), **new)
+
+    def update(self):
+        """ Poll the running tasks and start pending ones
+
+        :return: whether any job changed its state
+        :rtype: bool
+        """
+        changed = False
+        for job_id, job in list(self.jobs.items()):
+            if job['state'] != RUNNING:
+                continue
+            state, error = self.backend.status(job['task'])
+            if state == COMPLETED:
+                job['state'] = COMPLETED
+                changed = True
+            elif state == FAILED:
+                self._failed(job_id, error)
+                changed = True
+
+        running = self.count(RUNNING)
+        for job_id, job in list(self.jobs.items()):
+            if running >= self.max_running:
+                break
+            if job['state'] == PENDING:
+                self._start(job_id)
+                # save each started task, so a crash does not lose its id
+                self.save()
+                running += 1
+                changed = True
+
+        if changed:
+            self.save()
+        return changed
+
+    def run(self):
+        """ Run until all the jobs are completed or failed
+
+        :return: the ids of the failed jobs
+        :rtype: list
+        """
+        delay = self.poll
+        while True:
+            changed = self.update()
+            if self.done:
+                break
+            if changed:
+                delay = self.poll
+            else:
+                delay = min(delay * 2, self.max_poll)
+            self.sleep(random.uniform(delay / 2, delay))
+
+        return [job_id for job_id, job in self.jobs.items()
+                if job['state'] == FAILED]
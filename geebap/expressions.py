@@ -20,6 +20,23 @@ CUSTOM_NAMES = {"pi": math.pi}
 sval.DEFAULT_FUNCTIONS.update(CUSTOM_FUNCTIONS)
 sval.DEFAULT_NAMES.update(CUSTOM_NAMES)
 
+EXPONENTIAL = "1.0-(1.0/(exp(((min({var}, {max})-{mean})*(1/{max}*{a})))+1.0))"
+NORMAL = "exp(((({var}-{mean})/{std})**2)*{ratio})/(sqrt(2*pi)*{std})"
+
+
+def range_grid(ini, end):
+    """ Limits of the grid used for the statistics of the range. It is the
+    same grid of `drange(ini, end+1, places=1)` without creating it: values
+    from `first` to `last` every 0.1
+
+    :return: first value, last value and number of values
+    :rtype: tuple
+    """
+    first = int(ini * 10)
+    stop = int((end + 1) * 10 - 10 + 1)
+    length = max(stop - first, 0)
+    return first / 10.0, (stop - 1) / 10.0, length
+
 
 class Expression(object):
     # TODO: Limitante: si hay mas de una variable
@@ -108,6 +125,21 @@ class Expression(object):
         self._std = kwargs.get("std")
         self._mean = kwargs.get("mean")
         self.name = name
+        self._compiled = {}
+        self._cache = {}
+        self._cache_key = None
+
+    def _cached(self, name, compute):
+        """ Memoize the value of `compute()` while the expression, the range
+        and the params do not change """
+        key = (self.expression, self.range, self._max, self._min,
+               repr(sorted(self.params.items())))
+        if key != self._cache_key:
+            self._cache = {}
+            self._cache_key = key
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
 
     def format_local(self):
         """ Reemplaza las variables de la expression por los valores asignados
@@ -126,18 +158,21 @@ class Expression(object):
     def format_ee(self):
         """ Reemplaza las variables de la expression por los valores asignados
         al objeto y genera la expression lista para usar en Earth Engine """
-        # reemplaza las variables estadisticas
-        params = copy.deepcopy(self.params)
-        params["max"] = self.max
-        params["min"] = self.min
-        params["mean"] = self.mean
-        params["std"] = self.std
-
-        expr = self.expression.format(var="'var'", **params)
+        return self.compile().ee
 
-        return expgen.ExpGen.parse(expr)
+    def compile(self):
+        """ Parse the expression (with the values of the statistics
+        replaced) into a `expgen.CompiledExpression`. The result is cached
+        while the expression, the range and the params do not change.
 
-        # return sval.simple_eval("")
+        :rtype: expgen.CompiledExpression
+        """
+        expr = self.format_local().format(var="var")
+        compiled = self._compiled.get(expr)
+        if compiled is None:
+            compiled = expgen.CompiledExpression(expr)
+            self._compiled = {expr: compiled}
+        return compiled
 
     @staticmethod
     def adjust(name, valor):
@@ -178,8 +213,7 @@ class Expression(object):
     @property
     def mean(self):
         if type(self.range) is tuple:
-            r = drange(self.range[0], self.range[1] + 1, places=1)
-            return np.mean(r)
+            return self._cached('mean', self._range_mean)
         elif self._mean:
             return self._mean
         else:
@@ -189,14 +223,28 @@ class Expression(object):
     @property
     def std(self):
         if type(self.range) is tuple:
-            r = drange(self.range[0], self.range[1] + 1, places=1)
-            return np.std(r)
+            return self._cached('std', self._range_std)
         elif self._std:
             return self._std
         else:
             raise ValueError("To determine the std the 'range' param must be "
                              "a tuple")
 
+    def _range_mean(self):
+        """ Mean of the range grid (closed form of an arithmetic series) """
+        first, last, length = range_grid(*self.range)
+        if not length:
+            return float('nan')
+        return (first + last) / 2.0
+
+    def _range_std(self):
+        """ Standard deviation of the range grid (closed form of a uniform
+        discrete distribution with step 0.1) """
+        first, last, length = range_grid(*self.range)
+        if not length:
+            return float('nan')
+        return math.sqrt((length**2 - 1) / 12.0) * 0.1
+
     @property
     def max_result(self):
         """ Determinar el max_result resultado posible. Aplicando la expression
@@ -212,10 +260,24 @@ class Expression(object):
             raise ValueError("To determine the max result the 'range' param "
                              "must be a tuple")
 
-        r = drange(rango[0], rango[1]+1, places=1)
-        lista_result = [self.eval(var) for var in r]
-        maximo = max(lista_result)
-        return maximo
+        return self._cached('max_result', lambda: self._max_result(rango))
+
+    def _max_result(self, rango):
+        """ Evaluate the expression over the grid of the range. For the
+        Exponential (monotonic) and Normal (maximum at the mean) formulas only
+        the candidates to the maximum are evaluated """
+        first, last, length = range_grid(*rango)
+        if self.expression == EXPONENTIAL:
+            r = np.array([first, last])
+        elif self.expression == NORMAL:
+            k = int(math.floor(self.mean * 10 + 1e-9))
+            r = np.array([k / 10.0, (k + 1) / 10.0])
+            r = r[(r >= first) & (r <= last)]
+            if not r.size:
+                r = np.array([first, last])
+        else:
+            r = np.array(drange(rango[0], rango[1]+1, places=1))
+        return float(np.max(self.eval(r)))
 
     @property
     def max(self):
@@ -232,28 +294,23 @@ class Expression(object):
     def eval(self, var):
         """ Metodo para aplicar la funcion localmente con un valor dado
 
-        :param var: Valor que se usara como variable
+        :param var: Valor que se usara como variable. Puede ser un
+            numpy.ndarray, en ese caso se evalua toda la matriz de una vez
         :return: el resultado de evaluar la expression con un valor dado
-        :rtype: float
+        :rtype: float or numpy.ndarray
         """
-        expr = self.format_local()
-        expr = expr.format(var=var)
-        result = sval.simple_eval(expr)
-        return result
+        return self.compile()(var)
 
     def eval_normalized(self, var):
         """ Metodo para aplicar la funcion normalizada (resultado entre 0 y 1)
         localmente con un valor dado. No influye el parametro 'normalize'
 
-        :param var: Valor que se usara como variable
+        :param var: Valor que se usara como variable. Puede ser un
+            numpy.ndarray
         :return: el resultado de evaluar la expression con un valor dado
-        :rtype: float
+        :rtype: float or numpy.ndarray
         """
-        e = self.format_local()
-        expr = "({e})/{maximo}".format(e=e, maximo=self.max_result)
-        expr = expr.format(var=var)
-        result = sval.simple_eval(expr)
-        return result
+        return self.compile()(var) / self.max_result
 
     def map(self, name="expression", band=None, prop=None, eval=None,
             map=None, **kwargs):
@@ -371,9 +428,8 @@ class Expression(object):
             al final de la serie.
         """
         # DETERMINO LOS PARAMETROS SEGUN EL RANGO DADO SI EXISTIERA
-        exp = "1.0-(1.0/(exp(((min({var}, {max})-{mean})*(1/{max}*{a})))+1.0))"
-        return cls(expression=exp, a=a, range=range, name="Exponential",
-                   **kwargs)
+        return cls(expression=EXPONENTIAL, a=a, range=range,
+                   name="Exponential", **kwargs)
 
     @classmethod
     def Normal(cls, range=(0, 100), ratio=-0.5, **kwargs):
@@ -394,6 +450,5 @@ class Expression(object):
         if not isinstance(range, tuple):
             raise ValueError("el range debe ser una tupla")
 
-        exp = "exp(((({var}-{mean})/{std})**2)*{ratio})/(sqrt(2*pi)*{std})"
-        return cls(expression=exp, range=range, ratio=ratio,
+        return cls(expression=NORMAL, range=range, ratio=ratio,
                    name="Normal", **kwargs)
\ No newline at end of file
@@ -1,9 +1,7 @@
 # -*- coding: utf-8 -*-
 import ee
 from geetools import collection
-import time
-import sys
-import traceback
+from . import evaluation
 
 
 def get_id_col(id):
@@ -16,14 +14,70 @@ def get_id_col(id):
         return col
 
 
+# Default names of the bands that tell where each pixel comes from
+BANDNAME_COL_ID = 'col_id'
+BANDNAME_DATE = 'date'
+BANDNAME_PROVENANCE = 'provenance'
+
+
 def get_col_id(col):
     return collection.IDS.index(col.id)
 
 
-def get_col_id_image(col, name='col_id'):
+def get_col_id_image(col, name=BANDNAME_COL_ID):
     return ee.Image.constant(get_col_id(col)).rename(name).toUint8()
 
 
+# Provenance band: collection index in the 8 high bits and days since
+# 1970-01-01 in the 24 low bits of a uint32
+PROVENANCE_DAY_BITS = 24
+PROVENANCE_DAY_MASK = 2**PROVENANCE_DAY_BITS - 1
+
+
+def encode_provenance(col_id, days):
+    """ Pack a collection index and a number of days since 1970-01-01 in one
+    integer
+
+    :type col_id: int
+    :type days: int
+    :rtype: int
+    """
+    if not 0 <= col_id < 256:
+        raise ValueError('col_id must be between 0 and 255')
+    if not 0 <= days <= PROVENANCE_DAY_MASK:
+        raise ValueError('days out of range')
+    return (int(col_id) << PROVENANCE_DAY_BITS) | int(days)
+
+
+def decode_provenance(value):
+    """ Unpack a provenance value (see `encode_provenance`)
+
+    :return: the collection index and the days since 1970-01-01
+    :rtype: tuple
+    """
+    value = int(value)
+    return value >> PROVENANCE_DAY_BITS, value & PROVENANCE_DAY_MASK
+
+
+def get_provenance_image(col, img, name=BANDNAME_PROVENANCE):
+    """ Make a uint32 band with the collection index of `col` and the date
+    of `img` (see `encode_provenance`) """
+    days = img.date().difference(ee.Date(0), 'day').floor()
+    value = ee.Number(get_col_id(col)).multiply(2**PROVENANCE_DAY_BITS) \
+        .add(days)
+    return ee.Image.constant(value).rename(name).toUint32()
+
+
+def decode_provenance_image(img, band=BANDNAME_PROVENANCE,
+                            col_id=BANDNAME_COL_ID, days='days'):
+    """ Unpack a provenance band in two bands: the collection index and the
+    days since 1970-01-01 """
+    provenance = img.select(band)
+    col = provenance.rightShift(PROVENANCE_DAY_BITS).rename(col_id)
+    day = provenance.bitwiseAnd(PROVENANCE_DAY_MASK).rename(days)
+    return col.toUint8().addBands(day.toUint32())
+
+
 def pass_prop(imgcon, imgsin, prop):
     p = imgcon.get(prop)
     return imgsin.set(prop, p)
@@ -242,35 +296,40 @@ def replace_duplicate(list, separator="_"):
 RETRY_LIMIT = 100
 def get_size(col, sleep=0, step=5, limit=RETRY_LIMIT):
     """ Obtain locally the size of a collection. If an error of 'too many
-    concurrent aggregations' occurs, it will retry adding a step of time each
-    time
+    concurrent aggregations' occurs, it will retry with a jittered
+    exponential backoff (see `evaluation.Evaluator`)
 
     :param col: collection to get the size of
     :type col: ee.ImageCollection
-    :param sleep: time to sleep each time (seconds)
+    :param sleep: not used, kept for compatibility
     :type sleep: int
-    :param step: time to add each new iteration (seconds)
+    :param step: delay for the first retry (seconds)
     :type step: int
-    :param limit: limit of time in wich it will raise the error
+    :param limit: maximum delay between retries (seconds)
     :type limit: int
     :return: size of the collection
     :rtype: int
     """
-    try:
-        s = col.size().getInfo()
-        return s
-    except Exception as e:
-        print(str(e))
-        # cond = str(e) in "Too many concurrent aggregations."
-        # if cond and sleep<limit:
-        if sleep<limit:
-            print("esperando {} segundos".format(sleep))
-            for r in range(sleep+1):
-                sys.stdout.write(str(r+1)+".")
-                time.sleep(1)
-            return get_size(col, sleep+step)
-        else:
-            raise e
+    default = evaluation.get_default()
+    evaluator = evaluation.Evaluator(base_delay=step, max_delay=limit,
+                                     backend=default.backend,
+                                     cache=default.cache)
+    return evaluator.evaluate(col.size())
+
+
+def get_sizes(collections):
+    """ Obtain locally the size of many collections concurrently
+
+    :param collections: the collections
+    :type collections: list or dict
+    :return: the sizes, in a list or in a dict with the same keys
+    :rtype: list or dict
+    """
+    if isinstance(collections, dict):
+        sizes = dict((k, col.size()) for k, col in collections.items())
+    else:
+        sizes = [col.size() for col in collections]
+    return evaluation.evaluate_many(sizes)
 
 
 def select_match(col):
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+""" Timing and request counting hooks.
+
+The main stages of `bap.Bap` (and the map of each score) are wrapped with
+`stage`. When a hook is registered, each stage sends an `Event` with:
+
+- stage: the name of the stage (for example 'compute_scores' or 'score')
+- name: the name of the object that runs it (the score name), or None
+- elapsed: client seconds spent in the stage (Python graph construction
+  plus the requests made inside it)
+- graph_bytes: bytes the stage added to the graph: the size of the
+  serialized graph of the result minus the size of the graph of its Earth
+  Engine arguments (the collection, composite or site it takes). None if
+  the hook does not ask for it (see `add_hook`) or if the graphs can not be
+  serialized
+- serialize_time: seconds spent serializing those graphs
+- getinfo: number of `getInfo` requests made in the stage (the ones made by
+  geebap, see `evaluation`)
+- exports: number of export tasks started in the stage
+- request_time: seconds waiting for those requests
+
+Stages can be nested (for example 'score' inside 'compute_scores') and the
+counts of a stage include its nested stages. Counts are global, so stages
+that run at the same time in other threads add to each other.
+
+When there are no hooks, a stage only checks an empty list, so it adds no
+measurable overhead.
+
+:Usage:
+
+.. code:: python
+
+    from geebap import instrument
+
+    with instrument.record(graph=True) as events:
+        bap.build_composite_best(2018, site)
+
+    for event in events:
+        print(event.stage, event.name, event.elapsed, event.graph_bytes)
+"""
+import functools
+import threading
+import time
+from collections import namedtuple
+
+Event = namedtuple('Event', ['stage', 'name', 'elapsed', 'graph_bytes',
+                             'serialize_time', 'getinfo', 'exports',
+                             'request_time'])
+
+# list of (hook, graph)
+_hooks = []
+_lock = threading.Lock()
+_counts = {'getinfo': 0, 'exports': 0, 'request_time': 0.0}
+
+
+def enabled():
+    """ Whether there are hooks registered
+
+    :rtype: bool
+    """
+    return bool(_hooks)
+
+
+def add_hook(hook, graph=False):
+    """ Register a function that receives the events
+
+    :param hook: function that takes an `Event`
+    :type hook: function
+    :param graph: serialize the arguments and the result of each stage to
+        get the size of the graph it adds. The serialization time is
+        reported apart from `elapsed`
+    :type graph: bool
+    """
+    _hooks.append((hook, graph))
+
+
+def remove_hook(hook):
+    """ Unregister a hook """
+    _hooks[:] = [(h, g) for h, g in _hooks if h != hook]
+
+
+class record(object):
+    """ Context manager that collects the events in a list
+
+    :param graph: see `add_hook`
+    :type graph: bool
+    """
+    def __init__(self, graph=False):
+        self.graph = graph
+        self.events = []
+
+    def __enter__(self):
+        add_hook(self.events.append, self.graph)
+        return self.events
+
+    def __exit__(self, exc_type, exc, tb):
+        remove_hook(self.events.append)
+
+
+def graph_bytes(obj):
+    """ Size of the serialized graph of an Earth Engine object (or a list
+    of them). None if it can not be serialized
+
+    :rtype: int
+    """
+    import ee
+    try:
+        return len(ee.serializer.toJSON(obj))
+    except Exception:
+        return None
+
+
+def _inputs(args, kwargs):
+    """ Earth Engine objects in the arguments of a stage (and in the lists
+    of its arguments) """
+    import ee
+    inputs = []
+    for arg in list(args) + list(kwargs.values()):
+        items = arg if isinstance(arg, (list, tuple)) else [arg]
+        inputs.extend(item for item in items
+                      if isinstance(item, ee.ComputedObject))
+    return inputs
+
+
+def _added_bytes(result, args, kwargs):
+    """ Size of the graph of the result minus the size of the graph of the
+    arguments """
+    size = graph_bytes(result)
+    inputs = _inputs(args, kwargs)
+    if size is None or not inputs:
+        return size
+    before = graph_bytes(inputs)
+    return None if before is None else size - before
+
+
+def call(kind, func, *args, **kwargs):
+    """ Make a request counting it ('getinfo' or 'exports') """
+    if not _hooks:
+        return func(*args, **kwargs)
+    start = time.time()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        with _lock:
+            _counts[kind] += 1
+            _counts['request_time'] += time.time() - start
+
+
+def _snapshot():
+    with _lock:
+        return dict(_counts)
+
+
+def _emit(stage_name, obj, result, start, before, args=(), kwargs=None):
+    elapsed = time.time() - start
+    after = _snapshot()
+    size = None
+    serialize_time = 0.0
+    if any(graph for _, graph in _hooks):
+        begin = time.time()
+        size = _added_bytes(result, args, kwargs or {})
+        serialize_time = time.time() - begin
+    name = getattr(obj, 'name', None)
+    event = Event(stage_name, name if isinstance(name, str) else None,
+                  elapsed, size, serialize_time,
+                  after['getinfo'] - before['getinfo'],
+                  after['exports'] - before['exports'],
+                  after['request_time'] - before['request_time'])
+    for hook, graph in list(_hooks):
+        hook(event if graph else event._replace(graph_bytes=None,
+                                                serialize_time=0.0))
+
+
+def stage(name=None):
+    """ Decorator for the methods that make a stage
+
+    :param name: name of the stage. Defaults to the name of the method
+    :type name: str
+    """
+    def decorator(method):
+        stage_name = name or method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not _hooks:
+                return method(self, *args, **kwargs)
+            before = _snapshot()
+            start = time.time()
+            result = method(self, *args, **kwargs)
+            _emit(stage_name, self, result, start, before, args, kwargs)
+            return result
+        return wrapper
+    return decorator
@@ -3,7 +3,7 @@
 
 import ee
 from geetools import tools
-from . import date, functions
+from . import date, functions, evaluation
 
 try:
     from ipywidgets import HTML, Accordion
@@ -62,22 +62,39 @@ def info_handler(**kwargs):
             if obj['type'] == 'Image':
                 # Get the image's values
                 image = obj['object']
-                properties = image.propertyNames().getInfo()
+                properties = evaluation.evaluate(image.propertyNames())
 
-                if 'BAP_version' in properties:  # Check if it's a BAP composite
+                # Check if it's a BAP composite
+                if 'BAP_version' in properties or 'BAP_VERSION' in properties:
                     try:
-                        values = tools.image.getValue(image, point, 10, 'client')
-                        values = tools.dictionary.sort(values)
-                        col_id = int(values['col_id'])
-                        thedate = int(values['date'])
+                        values = tools.image.getValue(image, point, 10,
+                                                      'server')
+                        values = evaluation.evaluate(
+                            tools.dictionary.sort(values))
+                        bandnames = dict(
+                            col_id=functions.BANDNAME_COL_ID,
+                            date=functions.BANDNAME_DATE,
+                            provenance=functions.BANDNAME_PROVENANCE)
+                        if 'BAP_BANDNAMES' in properties:
+                            bandnames.update(evaluation.evaluate(
+                                image.get('BAP_BANDNAMES')))
+                        if bandnames['provenance'] in values:
+                            col_id, thedate = functions.decode_provenance(
+                                values[bandnames['provenance']])
+                        else:
+                            col_id = int(values[bandnames['col_id']])
+                            thedate = int(values[bandnames['date']])
                         collection = functions.get_id_col(col_id)
-                        realdate = date.Date.get(thedate).format().getInfo()
+                        realdate = evaluation.evaluate(
+                            date.Date.get(thedate).format())
 
                         # Get properties of the composite
-                        inidate = int(image.get('ini_date').getInfo())
-                        inidate = date.Date.get(inidate).format().getInfo()
-                        enddate = int(image.get('end_date').getInfo())
-                        enddate = date.Date.get(enddate).format().getInfo()
+                        inidate = int(evaluation.evaluate(image.get('ini_date')))
+                        inidate = evaluation.evaluate(
+                            date.Date.get(inidate).format())
+                        enddate = int(evaluation.evaluate(image.get('end_date')))
+                        enddate = evaluation.evaluate(
+                            date.Date.get(enddate).format())
 
                         # Create the content
                         img_html = '''
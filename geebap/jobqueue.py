@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+""" Shared queue of composite jobs with leases, and a pool of workers.
+
+The queue is a SQLite database, so many worker processes (on one node or on
+many nodes that share the file) take the jobs as they get free instead of
+working on a fixed share of the job list. A job is claimed inside a write
+transaction and held with a lease that the worker renews while it runs. If
+the worker dies, the lease expires and another worker takes the job again,
+up to `max_attempts` times.
+
+The jobs are the JSON objects of the `worker` module (Bap spec, year, site,
+export) and run in Earth Engine, or jobs for the local engine::
+
+    {
+        "engine": "local",
+        "layers": "layers.npz",  # score name -> array (images, rows, cols)
+        "images": "images.npz",  # band name -> array (images, rows, cols)
+        "output": "composite.npz",
+        "weights": {"score-sat": 2},  # optional, see local.recomposite
+        "ranges": {}, "new_ranges": {}  # optional
+    }
+
+The result, the worker, the number of attempts and the elapsed time of each
+job are stored in the queue.
+
+Note that SQLite locking over network file systems is only as good as the
+file system's: prefer a local disk or a file system with working locks.
+
+Usage::
+
+    python -m geebap.jobqueue queue.db --workers 4
+"""
+from __future__ import print_function
+import argparse
+import json
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+from .worker import _execute, worker_id
+
+PENDING = 'PENDING'
+RUNNING = 'RUNNING'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job TEXT NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    elapsed REAL,
+    started REAL,
+    finished REAL
+)
+"""
+
+
+class JobQueue(object):
+    """ Queue of jobs in a SQLite database
+
+    :param path: path of the database (created if it does not exist)
+    :type path: str
+    :param max_attempts: times a job is run (failed or with its lease
+        expired) before it is marked as FAILED
+    :type max_attempts: int
+    :param timeout: seconds to wait for the database lock
+    :type timeout: float
+    """
+    def __init__(self, path, max_attempts=3, timeout=60):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout,
+                               isolation_level=None)
+        return _Transaction(conn)
+
+    def add(self, job_id, job):
+        """ Add a job. Jobs already in the queue are not added again
+
+        :param job_id: unique id of the job
+        :type job_id: str
+        :param job: JSON serializable job
+        :type job: dict
+        :return: whether the job was added
+        :rtype: bool
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO jobs (id, job, state) VALUES (?, ?, ?)',
+                (job_id, json.dumps(job), PENDING))
+            return cursor.rowcount == 1
+
+    def claim(self, worker=None, lease=600):
+        """ Take the next job: a pending one or one with its lease expired
+
+        :param worker: id of the worker. Defaults to host-pid
+        :type worker: str
+        :param lease: seconds the job is held without renewing the lease
+        :type lease: float
+        :return: (job id, job) or None if there are no jobs to run
+        :rtype: tuple
+        """
+        worker = worker or worker_id()
+        now = time.time()
+        with self._connect() as conn:
+            self._expire(conn, now)
+            row = conn.execute(
+                'SELECT id, job FROM jobs WHERE state = ? OR '
+                '(state = ? AND lease < ?) ORDER BY rowid LIMIT 1',
+                (PENDING, RUNNING, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE jobs SET state = ?, worker = ?, lease = ?, '
+                'attempts = attempts + 1, started = ? WHERE id = ?',
+                (RUNNING, worker, now + lease, now, row[0]))
+        return row[0], json.loads(row[1])
+
+    def _expire(self, conn, now):
+        """ Mark as failed the expired jobs that ran too many times """
+        conn.execute(
+            'UPDATE jobs SET state = ?, result = ? WHERE state = ? AND '
+            'lease < ? AND attempts >= ?',
+            (FAILED, json.dumps({'error': 'lease expired'}), RUNNING, now,
+             self.max_attempts))
+
+    def renew(self, job_id, worker=None, lease=600):
+        """ Extend the lease of a job
+
+        :return: whether the job is still held by the worker
+        :rtype: bool
+        """
+        worker = worker or worker_id()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET lease = ? WHERE id = ? AND worker = ? AND '
+                'state = ?', (time.time() + lease, job_id, worker, RUNNING))
+            return cursor.rowcount == 1
+
+    def finish(self, job_id, result, failed=False, worker=None):
+        """ Record the result of a job. A failed job goes back to the queue
+        until it runs `max_attempts` times
+
+        :param result: JSON serializable result (with 'elapsed')
+        :type result: dict
+        :return: whether the job was still held by the worker (if not, the
+            result is not recorded)
+        :rtype: bool
+        """
+        worker = worker or worker_id()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND '
+                'state = ?', (job_id, worker, RUNNING)).fetchone()
+            if row is None:
+                return False
+            if not failed:
+                state = COMPLETED
+            elif row[0] < self.max_attempts:
+                state = PENDING
+            else:
+                state = FAILED
+            conn.execute(
+                'UPDATE jobs SET state = ?, result = ?, elapsed = ?, '
+                'finished = ?, lease = NULL WHERE id = ?',
+                (state, json.dumps(result), result.get('elapsed'),
+                 time.time(), job_id))
+        return True
+
+    def count(self, state):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM jobs WHERE state = ?',
+                                (state,)).fetchone()[0]
+
+    @property
+    def done(self):
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)',
+                (PENDING, RUNNING)).fetchone()[0] == 0
+
+    def results(self):
+        """ Results of the jobs
+
+        :return: dict of job id -> dict with the state, worker, attempts,
+            elapsed time and the result
+        :rtype: dict
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id, state, worker, attempts, elapsed, result '
+                'FROM jobs ORDER BY rowid').fetchall()
+        results = {}
+        for job_id, state, worker, attempts, elapsed, result in rows:
+            results[job_id] = dict(
+                state=state, worker=worker, attempts=attempts,
+                elapsed=elapsed, result=json.loads(result) if result else None)
+        return results
+
+
+class _Transaction(object):
+    """ Connection that runs the block in a write transaction and closes """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.conn.close()
+
+
+def run_local(job):
+    """ Run a job in the local engine: recomposite the score layers and make
+    the best pixel composite (see module docs)
+
+    :return: the result: 'output' and the number of composited 'pixels'
+    :rtype: dict
+    """
+    import numpy as np
+    from . import local
+
+    with np.load(job['layers']) as data:
+        layers = dict((name, data[name]) for name in data.files)
+    score = local.recomposite(layers, job.get('weights'), job.get('ranges'),
+                              job.get('new_ranges'))
+    index = local.best_index(score)
+    with np.load(job['images']) as data:
+        composite = dict((band, local.pick(data[band], index))
+                         for band in data.files)
+    np.savez(job['output'], **composite)
+    return {'output': job['output'], 'pixels': int((index >= 0).sum())}
+
+
+def run_ee(job):
+    """ Run a job in Earth Engine (see `worker.run_job`) """
+    from . import worker
+    return worker.run_job(job)
+
+
+ENGINES = {'ee': run_ee, 'local': run_local}
+
+
+def run_job(job):
+    """ Run a job in the engine given by its 'engine' key (default 'ee') """
+    return ENGINES[job.get('engine', 'ee')](job)
+
+
+def work(queue, run=run_job, lease=600, once=True, poll=10,
+         sleep=time.sleep, worker=None):
+    """ Take jobs from the queue and run them. The lease of the running job
+    is renewed every `lease / 3` seconds from another thread
+
+    :type queue: JobQueue
+    :param run: function that runs a job and returns a dict
+    :type run: function
+    :param lease: seconds of the lease
+    :type lease: float
+    :param once: stop when there are no jobs to run, else wait for new ones
+    :type once: bool
+    :param poll: seconds to wait for new jobs
+    :type poll: float
+    :return: number of jobs run
+    :rtype: int
+    """
+    worker = worker or worker_id()
+    count = 0
+    while True:
+        claimed = queue.claim(worker, lease)
+        if claimed is None:
+            if once:
+                return count
+            sleep(poll)
+            continue
+
+        job_id, job = claimed
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(lease / 3.0):
+                queue.renew(job_id, worker, lease)
+
+        thread = threading.Thread(target=heartbeat)
+        thread.daemon = True
+        thread.start()
+        try:
+            state, result = _execute(job, run)
+        finally:
+            stop.set()
+            thread.join()
+        queue.finish(job_id, result, state == 'failed', worker)
+        count += 1
+
+
+def _initialize_ee():
+    import ee
+    ee.Initialize()
+
+
+def _work(path, lease, once, poll, initialize):
+    if initialize:
+        initialize()
+    work(JobQueue(path), lease=lease, once=once, poll=poll)
+
+
+def pool(path, workers=None, lease=600, once=True, poll=10,
+         initialize=_initialize_ee):
+    """ Run a pool of worker processes on the queue and wait for them
+
+    :param path: path of the queue database
+    :type path: str
+    :param workers: number of processes. Defaults to the number of CPUs
+    :type workers: int
+    :param initialize: function run once in each process before taking
+        jobs (by default, `ee.Initialize`)
+    :type initialize: function
+    """
+    workers = workers or multiprocessing.cpu_count()
+    processes = [multiprocessing.Process(
+        target=_work, args=(path, lease, once, poll, initialize))
+        for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('path', help='queue database')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--lease', type=float, default=600)
+    parser.add_argument('--wait', action='store_true',
+                        help='wait for new jobs when the queue is empty')
+    parser.add_argument('--poll', type=float, default=10)
+    parser.add_argument('--add', metavar='FILE',
+                        help='add the jobs of a file (one JSON job per line,'
+                             ' with an "id") and exit')
+    args = parser.parse_args()
+
+    queue = JobQueue(args.path)
+    if args.add:
+        with open(args.add) as f:
+            jobs = [json.loads(line) for line in f if line.strip()]
+        added = sum(queue.add(job.pop('id'), job) for job in jobs)
+        print('{} jobs added'.format(added))
+        return
+
+    pool(args.path, args.workers, args.lease, not args.wait, args.poll)
+    print('{} completed, {} failed'.format(queue.count(COMPLETED),
+                                           queue.count(FAILED)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,718 @@
+# -*- coding: utf-8 -*-
+""" Local (NumPy) engine for the Bap scores.
+
+The local engine processes images that were already downloaded, for example
+tiles exported from Earth Engine. An image is a dict in which the keys are
+the band names and the values are 2D arrays (rows, cols). Masked pixels must
+be NaN.
+
+Scores that need statistics over the whole time series (for example
+`scores.Outliers`) use streaming accumulators, so the stack of images does not
+need to fit in memory: a first pass updates the statistics image by image and
+a second pass computes the score of each image.
+"""
+import warnings
+
+import numpy as np
+
+
+def _iterate(images):
+    """ Get a fresh iterator of images. `images` can be a callable that
+    returns an iterable (for example a generator function that reads from
+    disk) or a sequence """
+    if callable(images):
+        return iter(images())
+    return iter(images)
+
+
+def self_mask(array):
+    """ Convert pixels with value zero to NaN (same as ee.Image.selfMask)
+
+    :rtype: numpy.ndarray
+    """
+    array = np.array(array, dtype=np.float64)
+    array[array == 0] = np.nan
+    return array
+
+
+class Welford(object):
+    """ Per-pixel streaming mean and variance using Welford's algorithm.
+    NaN pixels are not taken account of.
+
+    :param shape: shape of the images
+    :type shape: tuple
+    """
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.count = np.zeros(self.shape, dtype=np.int64)
+        self._mean = np.zeros(self.shape, dtype=np.float64)
+        self._m2 = np.zeros(self.shape, dtype=np.float64)
+        self._delta = np.empty(self.shape, dtype=np.float64)
+
+    def update(self, array):
+        """ Update the statistics with a new image (in place)
+
+        :param array: 2D array with the same shape of the accumulator
+        :type array: numpy.ndarray
+        """
+        array = np.asarray(array, dtype=np.float64)
+        valid = ~np.isnan(array)
+        self.count += valid
+
+        delta = self._delta
+        np.subtract(array, self._mean, out=delta)
+        delta[~valid] = 0
+
+        # mean += delta / count (only where count > 0)
+        np.divide(delta, self.count, out=delta, where=valid)
+        self._mean += delta
+
+        # m2 += delta * (x - new_mean) where delta = x - old_mean
+        delta *= self.count
+        second = np.subtract(array, self._mean)
+        second[~valid] = 0
+        delta *= second
+        self._m2 += delta
+
+    @property
+    def mean(self):
+        """ Per-pixel mean. NaN where there were no valid values """
+        mean = self._mean.copy()
+        mean[self.count == 0] = np.nan
+        return mean
+
+    def variance(self, ddof=0):
+        """ Per-pixel variance
+
+        :param ddof: delta degrees of freedom (0 for the population variance)
+        :type ddof: int
+        """
+        denominator = (self.count - ddof).astype(np.float64)
+        denominator[denominator <= 0] = np.nan
+        return self._m2 / denominator
+
+    def std(self, ddof=0):
+        """ Per-pixel standard deviation """
+        return np.sqrt(self.variance(ddof))
+
+
+class PSquare(object):
+    """ Per-pixel streaming quantile estimator using the P-square algorithm
+    (Jain & Chlamtac, 1985). It keeps 5 markers per pixel, so the memory does
+    not depend on the number of images. NaN pixels are not taken account of.
+
+    :param shape: shape of the images
+    :type shape: tuple
+    :param quantile: the quantile to estimate (between 0 and 1)
+    :type quantile: float
+    """
+    def __init__(self, shape, quantile):
+        if not 0 <= quantile <= 1:
+            raise ValueError('quantile must be between 0 and 1')
+        self.shape = tuple(shape)
+        self.quantile = quantile
+        size = int(np.prod(self.shape))
+        p = quantile
+
+        self.count = np.zeros(size, dtype=np.int64)
+        self._heights = np.zeros((5, size), dtype=np.float64)
+        self._positions = np.zeros((5, size), dtype=np.float64)
+        self._desired = np.zeros((5, size), dtype=np.float64)
+        self._increments = np.array([0, p/2, p, (1+p)/2, 1])[:, np.newaxis]
+        self._initial = np.array([1, 1+2*p, 1+4*p, 3+2*p, 5])[:, np.newaxis]
+
+    def _init_markers(self, values, count):
+        """ Store the first 5 values of each pixel and start the markers of
+        the pixels that got their fifth value """
+        heights = self._heights
+        idx = np.nonzero(count < 5)[0]
+        heights[count[idx], idx] = values[idx]
+        self.count[idx] += 1
+
+        ready = idx[self.count[idx] == 5]
+        if ready.size:
+            heights[:, ready] = np.sort(heights[:, ready], axis=0)
+            self._positions[:, ready] = np.arange(1, 6)[:, np.newaxis]
+            self._desired[:, ready] = self._initial
+
+    def _update_markers(self, idx, x):
+        """ P-square step for the pixels in `idx` """
+        q = self._heights[:, idx]
+        n = self._positions[:, idx]
+
+        # extreme values
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+
+        # cell where x falls
+        k = (x >= q[1]).astype(np.int64) + (x >= q[2]) + (x >= q[3])
+        for i in range(1, 5):
+            n[i] += (k < i)
+
+        desired = self._desired[:, idx] + self._increments
+
+        # adjust the heights of the three middle markers
+        for i in range(1, 4):
+            d = desired[i] - n[i]
+            up = (d >= 1) & (n[i+1] - n[i] > 1)
+            down = (d <= -1) & (n[i-1] - n[i] < -1)
+            move = up | down
+            if not move.any():
+                continue
+            d = np.where(up, 1.0, -1.0)[move]
+            qi, qp, qm = q[i, move], q[i+1, move], q[i-1, move]
+            ni, np_, nm = n[i, move], n[i+1, move], n[i-1, move]
+
+            parabolic = qi + d / (np_ - nm) * (
+                (ni - nm + d) * (qp - qi) / (np_ - ni) +
+                (np_ - ni - d) * (qi - qm) / (ni - nm))
+
+            neighbour_q = np.where(d > 0, qp, qm)
+            neighbour_n = np.where(d > 0, np_, nm)
+            linear = qi + d * (neighbour_q - qi) / (neighbour_n - ni)
+
+            inside = (qm < parabolic) & (parabolic < qp)
+            q[i, move] = np.where(inside, parabolic, linear)
+            n[i, move] = ni + d
+
+        self._heights[:, idx] = q
+        self._positions[:, idx] = n
+        self._desired[:, idx] = desired
+        self.count[idx] += 1
+
+    def update(self, array):
+        """ Update the estimation with a new image (in place)
+
+        :param array: 2D array with the same shape of the estimator
+        :type array: numpy.ndarray
+        """
+        values = np.asarray(array, dtype=np.float64).reshape(-1)
+        valid = ~np.isnan(values)
+
+        starting = valid & (self.count < 5)
+        if starting.any():
+            values_start = np.where(starting, values, 0)
+            count = np.where(starting, self.count, 5)
+            self._init_markers(values_start, count)
+            # pixels that were just started must not be updated twice
+            valid = valid & ~starting
+
+        running = np.nonzero(valid)[0]
+        if running.size:
+            self._update_markers(running, values[running])
+
+    @property
+    def result(self):
+        """ Per-pixel estimation of the quantile. Pixels with less than 5
+        values get the exact quantile of the stored values, and pixels with
+        no values get NaN """
+        result = self._heights[2].copy()
+        for c in range(5):
+            sel = self.count == c
+            if not sel.any():
+                continue
+            if c == 0:
+                result[sel] = np.nan
+            else:
+                result[sel] = np.percentile(self._heights[:c, sel],
+                                            self.quantile*100, axis=0)
+        return result.reshape(self.shape)
+
+
+class OutliersStatistics(object):
+    """ Streaming statistics for the outliers score (`scores.Outliers`).
+    Pixels with value zero are not taken account of.
+
+    :param bands: the bands to use for determination
+    :type bands: list
+    :param reducer: the reducer to use. Can be 'mean' (Welford) or 'median'
+        (P-square)
+    :type reducer: str
+    :param amount: how many stdDev (mean) or percentage (median) to
+        determine the upper and lower limit
+    :type amount: float
+    """
+    def __init__(self, bands, reducer='mean', amount=None):
+        if reducer not in ('mean', 'median'):
+            raise ValueError("reducer must be 'mean' or 'median'")
+        if amount is None:
+            amount = 0.7 if reducer == 'mean' else 0.5
+
+        self.bands = list(bands)
+        self.reducer = reducer
+        self.amount = amount
+        self._accumulators = {}
+
+    def _make(self, shape):
+        if self.reducer == 'mean':
+            return Welford(shape)
+        else:
+            low = PSquare(shape, (50 - 50*self.amount) / 100.0)
+            high = PSquare(shape, (50 + 50*self.amount) / 100.0)
+            return low, high
+
+    def update(self, image):
+        """ Update the statistics with an image
+
+        :param image: dict of band name -> 2D array
+        :type image: dict
+        """
+        for band in self.bands:
+            array = self_mask(image[band])
+            acc = self._accumulators.get(band)
+            if acc is None:
+                acc = self._accumulators[band] = self._make(array.shape)
+            if self.reducer == 'mean':
+                acc.update(array)
+            else:
+                acc[0].update(array)
+                acc[1].update(array)
+
+    def limits(self, band):
+        """ Lower and upper limits for the given band
+
+        :rtype: tuple
+        """
+        acc = self._accumulators[band]
+        if self.reducer == 'mean':
+            mean = acc.mean
+            distance = acc.std() * self.amount
+            return mean - distance, mean + distance
+        else:
+            return acc[0].result, acc[1].result
+
+    def score(self, image):
+        """ Compute the outliers score of an image: the proportion of bands
+        in which the pixel is not an outlier. Masked pixels are NaN
+
+        :param image: dict of band name -> 2D array
+        :type image: dict
+        :rtype: numpy.ndarray
+        """
+        total = None
+        for band in self.bands:
+            array = np.asarray(image[band], dtype=np.float64)
+            low, high = self.limits(band)
+            with np.errstate(invalid='ignore'):
+                inside = (array >= low) & (array <= high)
+            inside = inside.astype(np.float64)
+            inside[np.isnan(array) | np.isnan(low)] = np.nan
+            total = inside if total is None else total + inside
+
+        return total / len(self.bands)
+
+
+def outliers(images, bands, reducer='mean', amount=None):
+    """ Compute the outliers score over a series of images in two passes. It
+    only holds one image at a time and the statistics in memory.
+
+    :param images: a callable that returns an iterable of images (it is
+        called once for each pass) or a sequence of images
+    :param bands: the bands to use for determination
+    :type bands: list
+    :param reducer: 'mean' or 'median'
+    :type reducer: str
+    :param amount: see `OutliersStatistics`
+    :type amount: float
+    :return: a generator of score arrays in the same order of the images
+    """
+    stats = OutliersStatistics(bands, reducer, amount)
+    for image in _iterate(images):
+        stats.update(image)
+
+    for image in _iterate(images):
+        yield stats.score(image)
+
+
+def _window(stack, bands, rows, cols):
+    """ Read a spatial window of a stack as a float32 array with shape
+    (images, bands, rows, cols). The bands are selected per window, so a
+    memmap is never copied whole """
+    if isinstance(stack, np.ndarray):
+        if bands is None:
+            window = stack[:, :, rows, cols]
+        else:
+            window = stack[:, list(bands), rows, cols]
+        return np.array(window, dtype=np.float32)
+
+    first = stack[0][bands[0]][rows, cols]
+    window = np.empty((len(stack), len(bands)) + first.shape,
+                      dtype=np.float32)
+    for i, image in enumerate(stack):
+        for j, band in enumerate(bands):
+            window[i, j] = image[band][rows, cols]
+    return window
+
+
+def _median(window):
+    """ Per-pixel median over the first axis. Uses a partial sort
+    (np.partition) when there are no masked pixels """
+    if np.isnan(window).any():
+        return np.nanmedian(window, axis=0)
+
+    n = window.shape[0]
+    half = n // 2
+    if n % 2:
+        return np.partition(window, half, axis=0)[half]
+
+    part = np.partition(window, [half - 1, half], axis=0)
+    median = part[half - 1]
+    median += part[half]
+    median *= 0.5
+    return median
+
+
+def tile_shape(shape, bytes_per_pixel, max_memory):
+    """ Get the shape of the spatial tiles so each tile does not use more
+    than `max_memory` bytes
+
+    :param shape: (rows, cols) of the images
+    :type shape: tuple
+    :param bytes_per_pixel: memory needed for each pixel of the tile
+    :type bytes_per_pixel: int
+    :param max_memory: peak memory allowed (bytes)
+    :type max_memory: int
+    :rtype: tuple
+    """
+    rows, cols = shape
+    pixels = max(1, int(max_memory // bytes_per_pixel))
+    if pixels >= cols:
+        return min(rows, pixels // cols), cols
+    return 1, pixels
+
+
+def medoid(stack, bands=None, discard_zeros=True, normalize=True,
+           max_memory=256*1024**2, out=None):
+    """ Medoid score computed in spatial tiles. The distance of each image is
+    the sum of the squared differences with the per-pixel median over the
+    selected bands (the same definition of `scores.Medoid.apply_reference`).
+
+    :param stack: an array (or numpy.memmap) with shape
+        (images, bands, rows, cols), or a sequence of images (dicts of band
+        name -> 2D array)
+    :param bands: the bands to use. Must be given if the stack is a sequence
+        of images. If the stack is an array they must be indexes
+    :type bands: list
+    :param discard_zeros: do not take account of pixels with value zero
+    :type discard_zeros: bool
+    :param normalize: if True the score goes from 0 (furthest image) to 1
+        (the median), else it is the negative distance
+    :type normalize: bool
+    :param max_memory: peak memory (bytes) used by the tile buffers
+    :type max_memory: int
+    :param out: array with shape (images, rows, cols) to write the result
+    :type out: numpy.ndarray
+    :return: the score for each image, float32 with shape
+        (images, rows, cols). Masked pixels are NaN
+    :rtype: numpy.ndarray
+    """
+    if isinstance(stack, np.ndarray):
+        nimages, nbands, rows, cols = stack.shape
+        if bands is not None:
+            nbands = len(bands)
+    else:
+        if not bands:
+            raise ValueError('bands must be given for a sequence of images')
+        nimages, nbands = len(stack), len(bands)
+        rows, cols = stack[0][bands[0]].shape
+
+    if out is None:
+        out = np.empty((nimages, rows, cols), dtype=np.float32)
+
+    # window + partition copy + distance + temporal buffer + median
+    bytes_per_pixel = 4 * (2 * nimages * nbands + 2 * nimages + nbands)
+    trows, tcols = tile_shape((rows, cols), bytes_per_pixel, max_memory)
+
+    for r0 in range(0, rows, trows):
+        for c0 in range(0, cols, tcols):
+            rsl = slice(r0, min(r0 + trows, rows))
+            csl = slice(c0, min(c0 + tcols, cols))
+            window = _window(stack, bands, rsl, csl)
+            if discard_zeros:
+                window[window == 0] = np.nan
+
+            median = _median(window)
+
+            dist = np.zeros((nimages,) + window.shape[2:], dtype=np.float32)
+            temp = np.empty_like(dist)
+            for b in range(nbands):
+                np.subtract(window[:, b], median[b], out=temp)
+                np.square(temp, out=temp)
+                dist += temp
+            del window, median, temp
+
+            if normalize:
+                masked = np.isnan(dist)
+                with warnings.catch_warnings():
+                    # pixels masked in every image
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    maxdist = np.nanmax(dist, axis=0)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    dist /= maxdist
+                np.subtract(1, dist, out=dist)
+                # all images equal to the median (0/0)
+                dist[np.isnan(dist) & ~masked] = 1
+            else:
+                np.negative(dist, out=dist)
+
+            out[:, rsl, csl] = dist
+
+    return out
+
+
+def rescale(array, range_in, range_out):
+    """ Linear conversion of an array from one range to another (the same
+    conversion that `scores.Score.adjust` makes) """
+    if tuple(range_in) == tuple(range_out):
+        return array
+    imin, imax = range_in
+    omin, omax = range_out
+    factor = (omax - omin) / float(imax - imin)
+    return (array - imin) * factor + omin
+
+
+def recomposite(layers, weights=None, ranges=None, new_ranges=None):
+    """ Compute the final score from cached individual score layers, with new
+    weights and new output ranges, without computing the scores again.
+
+    :param layers: dict of score name -> array with shape (images, rows,
+        cols) with the score of each image
+    :type layers: dict
+    :param weights: dict of score name -> weight. Missing scores weight 1
+    :type weights: dict
+    :param ranges: dict of score name -> range_out used to compute the layer.
+        Missing scores are (0, 1)
+    :type ranges: dict
+    :param new_ranges: dict of score name -> new range_out
+    :type new_ranges: dict
+    :return: the final score of each image (images, rows, cols)
+    :rtype: numpy.ndarray
+    """
+    weights = weights or {}
+    ranges = ranges or {}
+    new_ranges = new_ranges or {}
+
+    total = None
+    for name, layer in layers.items():
+        range_in = ranges.get(name, (0, 1))
+        range_out = new_ranges.get(name, range_in)
+        value = rescale(np.asarray(layer, dtype=np.float32), range_in,
+                        range_out)
+        weight = weights.get(name, 1)
+        if weight != 1:
+            value = value * weight
+        total = value if total is None else total + value
+    return total
+
+
+def best_index(score):
+    """ Index of the image with the highest score for each pixel (like
+    ee.ImageCollection.qualityMosaic). Pixels masked in all images get -1
+
+    :param score: array with shape (images, rows, cols). Masked pixels are
+        NaN, or negative if the array is integer (see `fixed_point_sum`)
+    :rtype: numpy.ndarray
+    """
+    if np.issubdtype(score.dtype, np.integer):
+        masked = score < 0
+        filled = np.where(masked, -1, score)
+        index = np.argmax(filled, axis=0)
+        index[masked.all(axis=0)] = -1
+        return index
+
+    masked = np.isnan(score)
+    filled = np.where(masked, -np.inf, score)
+    index = np.argmax(filled, axis=0)
+    index[masked.all(axis=0)] = -1
+    return index
+
+
+def pick(stack, index):
+    """ Make the composite taking, for each pixel, the value of the image
+    given by `index` (see `best_index`)
+
+    :param stack: array with shape (images, ..., rows, cols) or a sequence of
+        images (dicts of band name -> 2D array)
+    :param index: array (rows, cols) of indexes
+    :return: an array (..., rows, cols) or an image (dict)
+    """
+    valid = index >= 0
+    safe = np.where(valid, index, 0)
+    if isinstance(stack, np.ndarray):
+        safe = safe.reshape((1,) * (stack.ndim - 2) + safe.shape)
+        picked = np.take_along_axis(stack, safe, axis=0)[0]
+        return np.where(valid, picked, np.nan)
+
+    composite = {}
+    for band in stack[0]:
+        values = np.stack([image[band] for image in stack])
+        picked = np.take_along_axis(values, safe[None], axis=0)[0]
+        composite[band] = np.where(valid, picked, np.nan)
+    return composite
+
+
+def weight_sweep(layers, weights, names=None, ranges=None,
+                 max_memory=256*1024**2):
+    """ Winning image of each pixel for many weightings of the scores at
+    once. The weighted sums of all the weightings are computed in one tensor
+    contraction (per spatial tile) followed by an argmax.
+
+    :param layers: dict of score name -> array with shape (images, rows,
+        cols) (see `recomposite`)
+    :type layers: dict
+    :param weights: the weightings, an array with shape (weightings, scores)
+        in the order of `names`, or a list of dicts of score name -> weight
+        (missing scores weight 0)
+    :param names: the order of the scores in `weights`. Defaults to the
+        sorted names of the layers
+    :type names: list
+    :param ranges: dict of score name -> (layer range, new range) to rescale
+        the layers before weighting
+    :type ranges: dict
+    :param max_memory: peak memory (bytes) used by the tile buffers
+    :type max_memory: int
+    :return: the index of the winning image for each weighting, int array
+        with shape (weightings, rows, cols). Pixels masked in all images
+        get -1
+    :rtype: numpy.ndarray
+    """
+    names = list(names or sorted(layers))
+    if isinstance(weights, (list, tuple)) and weights and \
+            isinstance(weights[0], dict):
+        weights = [[w.get(name, 0) for name in names] for w in weights]
+    weights = np.asarray(weights, dtype=np.float32)
+    ranges = ranges or {}
+
+    nweights = weights.shape[0]
+    nimages, rows, cols = np.shape(layers[names[0]])
+    out = np.empty((nweights, rows, cols), dtype=np.int64)
+
+    # layer stack + totals
+    bytes_per_pixel = 4 * nimages * (len(names) + nweights + 1)
+    trows, tcols = tile_shape((rows, cols), bytes_per_pixel, max_memory)
+
+    for r in range(0, rows, trows):
+        for c in range(0, cols, tcols):
+            window = (slice(None), slice(r, r + trows), slice(c, c + tcols))
+            stack = []
+            for name in names:
+                layer = np.asarray(layers[name][window], dtype=np.float32)
+                if name in ranges:
+                    layer = rescale(layer, *ranges[name])
+                stack.append(layer)
+            stack = np.stack(stack)
+
+            masked = np.isnan(stack).any(axis=0)
+            stack[:, masked] = 0
+
+            totals = np.einsum('ks,snij->knij', weights, stack)
+            totals[:, masked] = -np.inf
+
+            index = np.argmax(totals, axis=1)
+            index[:, masked.all(axis=0)] = -1
+            out[(slice(None),) + window[1:]] = index
+
+    return out
+
+
+def agreement(indexes):
+    """ Fraction of pixels in which each pair of weightings selects the same
+    image (see `weight_sweep`). Pixels masked in all images are not counted
+
+    :param indexes: int array (weightings, rows, cols)
+    :return: symmetric matrix (weightings, weightings)
+    :rtype: numpy.ndarray
+    """
+    nweights = indexes.shape[0]
+    valid = indexes[0] >= 0
+    total = max(int(valid.sum()), 1)
+    matrix = np.eye(nweights)
+    for i in range(nweights):
+        for j in range(i + 1, nweights):
+            same = (indexes[i] == indexes[j]) & valid
+            matrix[i, j] = matrix[j, i] = same.sum() / float(total)
+    return matrix
+
+
+def consensus(indexes):
+    """ For each pixel, the image selected by most weightings and the
+    fraction of weightings that select it
+
+    :param indexes: int array (weightings, rows, cols)
+    :return: the most selected image (-1 for masked pixels) and the
+        fraction
+    :rtype: tuple
+    """
+    nimages = int(indexes.max()) + 1
+    best = np.full(indexes.shape[1:], -1, dtype=np.int64)
+    best_count = np.zeros(indexes.shape[1:], dtype=np.int64)
+    for i in range(nimages):
+        count = (indexes == i).sum(axis=0)
+        better = count > best_count
+        best[better] = i
+        best_count[better] = count[better]
+    return best, best_count / float(indexes.shape[0])
+
+
+# Fixed point scores: number of levels of each type. The maximum value of the
+# type is reserved for masked pixels
+FIXED_POINT_LEVELS = {'uint8': 2**8 - 2, 'uint16': 2**16 - 2}
+
+
+def fixed_point_resolution(max_value, dtype='uint8'):
+    """ Size of a step of a fixed point score
+
+    :param max_value: the maximum value of the scores
+    :type max_value: float
+    :param dtype: 'uint8' or 'uint16'
+    :type dtype: str
+    :rtype: float
+    """
+    if dtype not in FIXED_POINT_LEVELS:
+        raise ValueError("dtype must be one of {}".format(
+            sorted(FIXED_POINT_LEVELS)))
+    return float(max_value) / FIXED_POINT_LEVELS[dtype]
+
+
+def quantize(array, resolution, dtype='uint8'):
+    """ Convert a score to fixed point: round(score / resolution). Masked
+    pixels (NaN) get the maximum value of the type
+
+    :param resolution: see `fixed_point_resolution`
+    :type resolution: float
+    :rtype: numpy.ndarray
+    """
+    levels = FIXED_POINT_LEVELS[dtype]
+    array = np.asarray(array, dtype=np.float32)
+    masked = np.isnan(array)
+    result = np.rint(np.where(masked, 0, array) / resolution)
+    np.clip(result, 0, levels, out=result)
+    result = result.astype(dtype)
+    result[masked] = levels + 1
+    return result
+
+
+def dequantize(array, resolution):
+    """ Convert a fixed point score back to float (masked pixels to NaN) """
+    nodata = np.iinfo(array.dtype).max
+    result = array.astype(np.float32) * resolution
+    result[array == nodata] = np.nan
+    return result
+
+
+def fixed_point_sum(layers):
+    """ Sum fixed point scores with integer arithmetic
+
+    :param layers: list of fixed point arrays (see `quantize`) with the same
+        shape
+    :type layers: list
+    :return: int64 array, -1 where any score is masked
+    :rtype: numpy.ndarray
+    """
+    total = np.zeros(np.shape(layers[0]), dtype=np.int64)
+    masked = np.zeros(total.shape, dtype=bool)
+    for layer in layers:
+        masked |= layer == np.iinfo(layer.dtype).max
+        total += layer
+    total[masked] = -1
+    return total
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 """ Common masks to use in BAP process """
 from geetools import cloud_mask
+from .regdec import *
+
+__all__ = []
+factory = {}
 
 def _get_function(col, band, option, renamed=False):
     """ Get mask function for given band and option """
@@ -14,6 +18,8 @@ def _get_function(col, band, option, renamed=False):
     return f
 
 
+@register(factory)
+@register_all(__all__)
 class Mask(object):
     """ Compute common masks regarding the given collection. Looks for
     pixel_qa, BQA, sr_cloud_qa and QA60 bands in that order """
@@ -43,6 +49,8 @@ class Mask(object):
         return collection
 
 
+@register(factory)
+@register_all(__all__)
 class Hollstein(object):
     """ Compute Hollstein mask for Sentinel 2 """
     def __init__(self, options=('cloud', 'shadow', 'snow')):
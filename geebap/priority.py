@@ -3,6 +3,7 @@ import ee
 from datetime import date
 from geetools import collection
 from geetools.collection.group import CollectionGroup
+from .utils import lazy_class_attribute, memoize
 
 # IDS
 ID1 = 'LANDSAT/LM01/C01/T1'
@@ -19,6 +20,47 @@ ID8SR = 'LANDSAT/LC08/C01/T1_SR'
 S2 = 'COPERNICUS/S2'
 S2SR = 'COPERNICUS/S2_SR'
 
+# Maximum number of cached collections, groups and lists of common bands
+CACHE_SIZE = 128
+
+
+@memoize(CACHE_SIZE)
+def get_collection(id):
+    """ Collection object for the given id (cached)
+
+    :rtype: geetools.collection.Collection
+    """
+    return collection.fromId(id)
+
+
+@memoize(CACHE_SIZE)
+def get_colgroup(ids):
+    """ Collection group for the given ids (cached)
+
+    :param ids: collection ids
+    :type ids: tuple
+    :rtype: CollectionGroup
+    """
+    return CollectionGroup(*[get_collection(id) for id in ids])
+
+
+@memoize(CACHE_SIZE)
+def get_common_bands(ids):
+    """ Bands (names) common to all the given collections (cached)
+
+    :param ids: collection ids
+    :type ids: tuple
+    :rtype: list
+    """
+    cols = [get_collection(id) for id in ids]
+    return collection.getCommonBands(*cols, match='name')
+
+
+def clear_cache():
+    """ Clear the caches of collections, groups and common bands """
+    for function in (get_collection, get_colgroup, get_common_bands):
+        function.cache_clear()
+
 
 class SeasonPriority(object):
     """ Satellite priorities for seasons.
@@ -52,7 +94,9 @@ class SeasonPriority(object):
     relation = dict(
         [(p, sat) for per, sat in zip(periods, satlist) for p in per])
 
-    ee_relation = ee.Dictionary(relation)
+    @lazy_class_attribute
+    def ee_relation(cls):
+        return ee.Dictionary(cls.relation)
 
     l7_slc_off = range(2003, date.today().year+1)
 
@@ -74,11 +118,11 @@ class SeasonPriority(object):
         :rtype: list
         '''
         sat = self.satellites
-        return [collection.fromId(id) for id in sat]
+        return [get_collection(id) for id in sat]
 
     @property
     def colgroup(self):
         '''
         :rtype: CollectionGroup
         '''
-        return CollectionGroup(*self.collections)
+        return get_colgroup(tuple(self.satellites))
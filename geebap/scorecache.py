@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+""" Cache of the individual score layers of each image.
+
+Each layer is identified by the id of the image plus the class and the
+parameters of the score (see `score_key`). The layers are stored after the
+output range (`range_out`) is applied, so it is part of the key. The final
+score can be recomposed from the cached layers with new weights and new
+output ranges (see `recomposite` and `local.recomposite`) without computing
+masks, rescale or the scores again.
+
+In Earth Engine, the cache is an ImageCollection (for example an asset made
+with `bap.Bap.score_layers`) in which each image has the individual score
+bands and the properties BAP_IMAGE_ID and BAP_SCORE_KEYS. For the local
+engine, `LayerCache` stores the layers as NumPy files.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from . import utils
+
+
+def _default(obj):
+    return getattr(obj, '__name__', obj.__class__.__name__)
+
+
+def score_key(score):
+    """ Key of a score: its class and the hash of its parameters (from
+    `utils.serialize`, including `range_out`) leaving out the name
+
+    :rtype: str
+    """
+    serialized = utils.serialize(score)
+    params = list(serialized.values())[0]
+    params = dict((k, v) for k, v in params.items()
+                  if k.split(' ')[0] not in ('name', 'sleep'))
+    text = json.dumps(params, sort_keys=True, default=_default)
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+    return '{}-{}'.format(score.__class__.__name__, digest)
+
+
+def score_keys(scores):
+    """ Keys of many scores as a JSON string (dict of score name -> key) """
+    keys = dict((score.name, score_key(score)) for score in scores or [])
+    return json.dumps(keys, sort_keys=True)
+
+
+def ranges(scores):
+    """ dict of score name -> range_out """
+    return dict((score.name, tuple(score.range_out)) for score in scores or [])
+
+
+def recomposite(collection, weights=None, ranges=None, new_ranges=None,
+                score_name='score'):
+    """ Compute the final score of each image of an ImageCollection from its
+    individual score bands, with new weights and new output ranges, and make
+    the best pixel composite
+
+    :param collection: images with the individual score bands
+    :type collection: ee.ImageCollection
+    :param weights: dict of score name -> weight. Missing scores weight 1
+    :type weights: dict
+    :param ranges: dict of score name -> range_out used to compute the
+        layers. Missing scores are (0, 1)
+    :type ranges: dict
+    :param new_ranges: dict of score name -> new range_out
+    :type new_ranges: dict
+    :param score_name: name of the final score band
+    :type score_name: str
+    :rtype: ee.Image
+    """
+    import ee
+    weights = weights or {}
+    ranges = ranges or {}
+    new_ranges = new_ranges or {}
+    names = sorted(set(ranges) | set(weights) | set(new_ranges))
+
+    def compute(img):
+        total = ee.Image.constant(0)
+        for name in names:
+            imin, imax = ranges.get(name, (0, 1))
+            omin, omax = new_ranges.get(name, (imin, imax))
+            factor = (omax - omin) / float(imax - imin)
+            factor = factor * weights.get(name, 1)
+            layer = img.select(name).subtract(imin).multiply(factor) \
+                .add(omin * weights.get(name, 1))
+            total = total.add(layer)
+        score = total.rename(score_name).toFloat()
+        return img.addBands(score, overwrite=True)
+
+    return collection.map(compute).qualityMosaic(score_name)
+
+
+class LayerCache(object):
+    """ Cache of score layers (arrays) on disk for the local engine
+
+    :param path: the directory that holds the cache
+    :type path: str
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def _filename(self, image_id, score):
+        name = image_id.replace('/', '__')
+        return os.path.join(self.path, score_key(score), name + '.npy')
+
+    def get(self, image_id, score):
+        """ Get the layer or None if it is not in the cache """
+        filename = self._filename(image_id, score)
+        if not os.path.exists(filename):
+            return None
+        return np.load(filename)
+
+    def set(self, image_id, score, array):
+        """ Store a layer """
+        filename = self._filename(image_id, score)
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        temp = filename + '.tmp.npy'
+        np.save(temp, array)
+        os.replace(temp, filename)
+
+    def __call__(self, image_id, score, compute):
+        """ Get a layer or compute it (and store it)
+
+        :param compute: function that returns the layer
+        :type compute: function
+        """
+        layer = self.get(image_id, score)
+        if layer is None:
+            layer = compute()
+            self.set(image_id, score, layer)
+        return layer
+
+    def layers(self, image_ids, scores):
+        """ Stack the cached layers of many images
+
+        :return: dict of score name -> array (images, rows, cols)
+        :rtype: dict
+        """
+        result = {}
+        for score in scores:
+            result[score.name] = np.stack(
+                [self.get(image_id, score) for image_id in image_ids])
+        return result
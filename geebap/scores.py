@@ -30,7 +30,7 @@ ImageCollections as first argument and can use the following keyword arguments
 """
 import ee
 
-from . import priority
+from . import priority, local, instrument
 from . import season as season_module
 from geetools import tools, composite
 
@@ -39,14 +39,16 @@ from abc import ABCMeta, abstractmethod
 from .regdec import *
 
 from uuid import uuid4
+import copy
 
 __all__ = []
 factory = {}
 
+# ee.Kernel methods are not available until ee.Initialize()
 KERNELS = {
-    "euclidean": ee.Kernel.euclidean,
-    "manhattan": ee.Kernel.manhattan,
-    "chebyshev": ee.Kernel.chebyshev
+    "euclidean": lambda **kwargs: ee.Kernel.euclidean(**kwargs),
+    "manhattan": lambda **kwargs: ee.Kernel.manhattan(**kwargs),
+    "chebyshev": lambda **kwargs: ee.Kernel.chebyshev(**kwargs)
 }
 
 
@@ -54,6 +56,14 @@ class Score(object):
     ''' Abstract Base class for scores '''
     __metaclass__ = ABCMeta
 
+    # the score depends on the target year of the composite, not only on the
+    # year of the image (see `for_year`)
+    year_dependent = False
+
+    # the score of an image depends on the other images of the collection,
+    # so adding images changes the scores of the images already used
+    collection_score = False
+
     def __init__(self, name="score", range_in=None, range_out=(0, 1), sleep=0,
                  **kwargs):
         """ Abstract Base Class for scores
@@ -68,12 +78,14 @@ class Score(object):
         :type formula: Expression
         :param range_out: Adjust the output to this range
         :type range_out: tuple
+        :param normalize: normalize the score
+        :type normalize: bool
         """
         self.name = name
         self.range_in = range_in
         self.range_out = range_out
         self.sleep = sleep
-        self._normalize = True
+        self._normalize = kwargs.get('normalize', True)
 
     @property
     def normalize(self):
@@ -122,6 +134,32 @@ class Score(object):
         i = ee.Image.constant(0).select([0], [self.name]).toFloat()
         return img.addBands(i)
 
+    def for_year(self, year):
+        """ Get the score for the composite of the given year. Scores that
+        are not `year_dependent` return themselves """
+        return self
+
+    def inputs(self, col):
+        """ Bands (renamed) that the score needs. None means all the bands.
+        The bands that no score needs are dropped early (see
+        `bap.Bap.required_bands`)
+
+        :param col: the collection
+        :type col: geetools.collection.Collection
+        :rtype: list
+        """
+        return []
+
+    def halo(self, scale):
+        """ Distance (in meters) around each pixel that the score uses to
+        compute its value. Tiles must be padded with it (see `tiling`)
+
+        :param scale: meters per pixel of the collection
+        :type scale: float
+        """
+        return 0
+
+    @instrument.stage('score')
     def _map(self, collection, **kwargs):
         """ Internal map function for applying adjust """
         newcollection = self.map(collection, **kwargs)
@@ -287,6 +325,28 @@ class CloudDist(Score):
     def apply(collection, **kwargs):
         return collection.map(lambda img: CloudDist.compute(img, **kwargs))
 
+    def get_dmax(self, scale):
+        """ Maximum distance for the given scale (meters per pixel), in
+        the units of the score """
+        maxdist = (scale/2)*510
+        if self.units == 'pixels':
+            maxdist = maxdist / scale
+
+        # Truncate dmax if goes over the 512 pixels limit
+        if self.dmax is None or self.dmax > maxdist:
+            dmax = maxdist
+        else:
+            dmax = self.dmax
+
+        return dmax
+
+    def halo(self, scale):
+        dmax = self.get_dmax(scale)
+        return dmax if self.units == 'meters' else dmax * scale
+
+    def inputs(self, col):
+        return [col.bands[0].name]
+
     def map(self, collection, **kwargs):
         """ Map function to use in BAP
 
@@ -297,15 +357,7 @@ class CloudDist(Score):
         first_band = col.bands[0]
         scale = min([band.scale for band in col.bands])
 
-        maxdist = (scale/2)*510
-
-        # Truncate dmax if goes over the 512 pixels limit
-        if self.dmax is None:
-            dmax = maxdist
-        elif self.dmax > maxdist and self.unit == 'meters':
-            dmax = maxdist
-        else:
-            dmax = self.dmax
+        dmax = self.get_dmax(scale)
 
         params = dict(
             bandmask = first_band.name,
@@ -337,6 +389,8 @@ class Doy(Score):
     :param name: name for the resulting band
     :type name: str
     """
+    collection_score = True
+
     def __init__(self, best_doy, season, name="score-best_doy",
                  function='linear', stretch=1, **kwargs):
         super(Doy, self).__init__(**kwargs)
@@ -450,6 +504,9 @@ class AtmosOpacity(Score):
         expresion = self.formula(rango=self.range_in)
         return expresion
 
+    def inputs(self, col):
+        return ['atmos_opacity']
+
     def map(self, collection, **kwargs):
         """ Map the score over a collection
 
@@ -493,6 +550,8 @@ class MaskPercent(Score):
         :type geometry: ee.Geometry or ee.Feature
         :param scale: the scale of the mask
         :type scale: int
+        :param tile_scale: tileScale of the reductions
+        :type tile_scale: float
         :param band_name: the name of the resulting band
         :type band_name: str
         :return: An image with one band that holds the percentage of pixels
@@ -506,6 +565,7 @@ class MaskPercent(Score):
         band_name = kwargs.get('band_name', 'score-maskper')
         max_pixels = kwargs.get('max_pixels', 1e13)
         count_zeros = kwargs.get('count_zeros', False)
+        tile_scale = kwargs.get('tile_scale', 1)
 
         # get band name
         band = ee.String(image.bandNames().get(0))
@@ -525,7 +585,8 @@ class MaskPercent(Score):
             reducer= ee.Reducer.count(),
             geometry= geometry,
             scale= scale,
-            maxPixels= max_pixels).get(band)
+            maxPixels= max_pixels,
+            tileScale= tile_scale).get(band)
         ones = ee.Number(ones)
 
         # select first band, unmask and get the inverse
@@ -543,7 +604,8 @@ class MaskPercent(Score):
             reducer= ee.Reducer.count(),
             geometry= geometry,
             scale= scale,
-            maxPixels= max_pixels).get(band)
+            maxPixels= max_pixels,
+            tileScale= tile_scale).get(band)
         zeros_in_mask = ee.Number(zeros_in_mask)
 
         percentage = tools.number.trimDecimals(zeros_in_mask.divide(ones), 4)
@@ -566,6 +628,9 @@ class MaskPercent(Score):
         self.count_zeros = count_zeros
         self.sleep = kwargs.get("sleep", 30)
 
+    def inputs(self, col):
+        return [self.band] if self.band else []
+
     def map(self, collection, **kwargs):
         """ Map the score over a collection
 
@@ -577,15 +642,19 @@ class MaskPercent(Score):
         col = kwargs.get('col')
         geom = kwargs.get('geom')
         minscale = min([band.scale for band in col.bands])
+        tile_scale = kwargs.get('tile_scale', 1)
         def wrap(img):
             score = self.compute(img, geometry=geom, scale=minscale,
-                                 count_zeros=self.count_zeros)
+                                 count_zeros=self.count_zeros,
+                                 tile_scale=tile_scale)
             prop = score.get(self.name)
             return img.addBands(score).set(self.name, prop)
 
         return collection.map(wrap)
 
 
+@register(factory)
+@register_all(__all__)
 class MaskPercentKernel(Score):
     """ Mask percent score using a kernel """
     def __init__(self, kernel=None, distance=255, units='pixels',
@@ -642,6 +711,10 @@ class MaskPercentKernel(Score):
 
         return count.divide(distance).rename(name)
 
+    def halo(self, scale):
+        return self.distance * scale if self.units == 'pixels' \
+            else self.distance
+
     def map(self, collection, **kwargs):
         def wrap(img):
             score = self.compute(
@@ -743,10 +816,15 @@ class Outliers(Score):
         etc
 
     :type dist: int
+    :param global_stats: compute the statistics once over the merged and
+        harmonized collection of all (collection, year) slices instead of
+        computing them for each slice
+    :type global_stats: bool
     """
+    collection_score = True
 
     def __init__(self, bands, process="median", dist=0.7, name="score-outlier",
-                 **kwargs):
+                 global_stats=False, **kwargs):
         super(Outliers, self).__init__(**kwargs)
 
         # TODO: param bands is related to the collection used
@@ -758,6 +836,7 @@ class Outliers(Score):
         self.dist = dist
         self.range_in = (0, 1)
         self.name = name
+        self.global_stats = global_stats
         self.sleep = kwargs.get("sleep", 10)
 
         # TODO: create `min` and `max` properties depending on the chosen process
@@ -770,6 +849,11 @@ class Outliers(Score):
     def increment(self):
         return float(1 / self.bandslength)
 
+    def local_statistics(self):
+        """ Streaming statistics to compute this score with the local engine.
+        See `local.OutliersStatistics` """
+        return local.OutliersStatistics(self.bands, self.process, self.dist)
+
     @staticmethod
     def apply(collection, **kwargs):
         """ Determine if pixels are outliers given a collection and parameters
@@ -781,10 +865,14 @@ class Outliers(Score):
         :param amount: how many stdDev (mean) or percentage (median) to
             determine the upper and lower limit
         :type amount: float
+        :param reference: collection to compute the statistics from. Defaults
+            to the given collection
+        :type reference: ee.ImageCollection
         """
         bands = kwargs.get('bands')
         reducer = kwargs.get('reducer')
         amount = kwargs.get('amount')
+        reference = kwargs.get('reference')
 
         if reducer is None:
             reducer = 'mean'
@@ -795,8 +883,11 @@ class Outliers(Score):
             elif reducer == 'median':
                 amount = 0.5
 
+        if reference is None:
+            reference = collection
+
         # MASK PIXELS = 0 OUT OF EACH IMAGE OF THE COLLECTION
-        col = collection.map(lambda img: img.selfMask())
+        col = reference.map(lambda img: img.selfMask())
 
         if bands is None:
             bands = ee.Image(col.first()).bandNames()
@@ -842,6 +933,9 @@ class Outliers(Score):
         return collection.map(wrap)
 
 
+    def inputs(self, col):
+        return list(self.bands)
+
     def map(self, collection, **kwargs):
         """
         :return:
@@ -851,9 +945,10 @@ class Outliers(Score):
         increment = self.increment
         reducer = self.process
         amount = self.dist
+        reference = kwargs.get('reference') if self.global_stats else None
 
         outliers = self.apply(collection, bands=self.bands, reducer=reducer,
-                              amount=amount)
+                              amount=amount, reference=reference)
 
         pattern = self.bands_ee.map(
             lambda name: ee.String(name).cat('_outlier'))
@@ -943,6 +1038,9 @@ class Index(Score):
 
         return result.rename(name)
 
+    def inputs(self, col):
+        return [self.index]
+
     def map(self, collection, **kwargs):
         def wrap(img):
             result = self.compute(img, index=self.index,
@@ -977,6 +1075,8 @@ class MultiYear(Score):
         be 0.95 for 2001, 1 for 2002 and 0.95 for 2003
     :type ration: float
     """
+    year_dependent = True
+    collection_score = True
 
     def __init__(self, main_year, season, ratio=0.05, function='linear',
                  stretch=1, name="score-multi", **kwargs):
@@ -993,6 +1093,12 @@ class MultiYear(Score):
         """ redefine adjust method for NOT adjusting """
         return lambda img: img
 
+    def for_year(self, year):
+        """ Copy of this score centered in the given year """
+        score = copy.copy(self)
+        score.main_year = year
+        return score
+
     @staticmethod
     def apply(collection, **kwargs):
         """ Apply multi year score to every image in a collection.
@@ -1147,6 +1253,9 @@ class Threshold(Score):
 
         return final_score.select(name)
 
+    def inputs(self, col):
+        return list(self.bands) if self.bands else None
+
     def map(self, collection, **kwargs):
         """ map the score over a collection
 
@@ -1160,23 +1269,109 @@ class Threshold(Score):
 @register(factory)
 @register_all(__all__)
 class Medoid(Score):
+    """ Medoid score
+
+    :param bands: the bands to use for the distance. Defaults to all bands
+    :type bands: list
+    :param discard_zeros: do not take account of pixels with value zero
+    :type discard_zeros: bool
+    :param global_stats: compute the median once over the merged and
+        harmonized collection of all (collection, year) slices instead of
+        computing the medoid for each slice
+    :type global_stats: bool
+    """
+    collection_score = True
+
     def __init__(self, bands=None, discard_zeros=True, name='score-medoid',
-                 **kwargs):
+                 global_stats=False, **kwargs):
         super(Medoid, self).__init__(**kwargs)
         self.name = name
         self.bands = bands
         self.discard_zeros = discard_zeros
+        self.global_stats = global_stats
 
     @staticmethod
     def apply(collection, **kwargs):
+        """ Compute the medoid score. If a `reference` collection is given,
+        the score is the distance of each image to the per-pixel median of
+        the reference (see `apply_reference`), otherwise it uses
+        `geetools.composite.medoidScore`
+        """
+        if kwargs.get('reference') is not None:
+            return Medoid.apply_reference(collection, **kwargs)
         return composite.medoidScore(collection, **kwargs)
 
+    @staticmethod
+    def apply_reference(collection, **kwargs):
+        """ Medoid score using the statistics of a reference collection. The
+        distance is the sum of the squared differences between each image and
+        the per-pixel median of the reference over the selected bands.
+
+        :param reference: the collection to compute the median from
+        :type reference: ee.ImageCollection
+        :param bands: the bands to use. Defaults to all bands of the first
+            image of the reference
+        :type bands: list
+        :param discard_zeros: mask pixels with zero value in the reference
+        :type discard_zeros: bool
+        :param bandname: the name of the resulting band
+        :type bandname: str
+        :param normalize: if True the score goes from 0 (furthest image of the
+            reference) to 1 (the median), else it is the negative distance
+        :type normalize: bool
+        :rtype: ee.ImageCollection
+        """
+        reference = kwargs.get('reference')
+        bands = kwargs.get('bands')
+        discard_zeros = kwargs.get('discard_zeros', False)
+        bandname = kwargs.get('bandname', 'sumdist')
+        normalize = kwargs.get('normalize', True)
+
+        if not bands:
+            bands = ee.Image(reference.first()).bandNames()
+
+        selected = reference.select(bands)
+        if discard_zeros:
+            selected = selected.map(lambda img: img.selfMask())
+
+        median = selected.median()
+
+        def distance(img):
+            return img.select(bands).subtract(median).pow(2).reduce('sum')
+
+        if normalize:
+            maxdist = selected.map(distance).max()
+
+        def wrap(img):
+            dist = distance(img)
+            if normalize:
+                score = ee.Image(1).subtract(dist.divide(maxdist))
+            else:
+                score = dist.multiply(-1)
+            return img.addBands(score.rename(bandname).toFloat())
+
+        return collection.map(wrap)
+
+    def local_score(self, stack, **kwargs):
+        """ Compute this score with the local engine. See `local.medoid`
+        for the parameters """
+        kwargs.setdefault('bands', self.bands)
+        kwargs.setdefault('discard_zeros', self.discard_zeros)
+        kwargs.setdefault('normalize', self.normalize)
+        return local.medoid(stack, **kwargs)
+
+    def inputs(self, col):
+        return list(self.bands) if self.bands else None
+
     def map(self, collection, **kwargs):
+        params = dict(bands=self.bands,
+                      discard_zeros=self.discard_zeros,
+                      bandname=self.name,
+                      normalize=self.normalize)
+        if self.global_stats:
+            params['reference'] = kwargs.get('reference')
 
-        return self.apply(collection, bands=self.bands,
-                          discard_zeros=self.discard_zeros,
-                          bandname=self.name,
-                          normalize=self.normalize)
+        return self.apply(collection, **params)
 
 
 @register(factory)
@@ -1285,6 +1480,9 @@ class Brightness(Score):
 
         return result
 
+    def inputs(self, col):
+        return list(self.bands)
+
     def map(self, collection, **kwargs):
         """ Map score over a collection.
 
@@ -3,6 +3,7 @@
 import ee
 import csv
 import requests
+from . import evaluation
 
 
 class Site(object):
@@ -50,10 +51,11 @@ class Site(object):
             place = place.set("origin", self.name, "id", id)
 
             try:
-                region = place.geometry().bounds().getInfo()['coordinates'][0]
+                bounds = place.geometry().bounds()
+                region = evaluation.evaluate(bounds)['coordinates'][0]
             except AttributeError as ae:
                 print(ae)
-                region = place.getInfo()['coordinates'][0]
+                region = evaluation.evaluate(place)['coordinates'][0]
             except Exception as e:
                 print(e)
                 return None, None
@@ -113,3 +115,103 @@ def from_gsheet(url, sheet, name=None, id_ft=None, id_fld=None, name_fld=None):
         sites.append(site)
 
     return dict(sites)
+
+
+def get_bounds(sites):
+    """ Get the bounds of many sites (client side) in one batch of requests
+
+    :param sites: a FeatureCollection or a list of geometries or features
+    :type sites: ee.FeatureCollection or list
+    :return: the list of bounds as (xmin, ymin, xmax, ymax)
+    :rtype: list
+    """
+    sites = to_list(sites)
+    coords = evaluation.evaluate_many(
+        [ee.Geometry(site.bounds()).coordinates() for site in sites])
+
+    bounds = []
+    for ring in coords:
+        xs = [point[0] for point in ring[0]]
+        ys = [point[1] for point in ring[0]]
+        bounds.append((min(xs), min(ys), max(xs), max(ys)))
+    return bounds
+
+
+def to_list(sites):
+    """ Convert a FeatureCollection or a list of features to a list of
+    geometries
+
+    :rtype: list
+    """
+    if isinstance(sites, ee.FeatureCollection):
+        size = evaluation.evaluate(sites.size())
+        features = sites.toList(size)
+        sites = [ee.Feature(features.get(i)) for i in range(size)]
+
+    return [site.geometry() if isinstance(site, ee.Feature) else site
+            for site in sites]
+
+
+def union_bounds(bounds):
+    """ Bounds that contain all the given bounds
+
+    :param bounds: list of (xmin, ymin, xmax, ymax)
+    :type bounds: list
+    :rtype: tuple
+    """
+    return (min(b[0] for b in bounds), min(b[1] for b in bounds),
+            max(b[2] for b in bounds), max(b[3] for b in bounds))
+
+
+def group_by_proximity(bounds, distance=0, max_extent=None):
+    """ Group sites by the proximity of their bounds. Two sites are in the
+    same group if their bounds are closer than `distance` (directly or
+    through other sites of the group), so the sites that share the same
+    scenes can share the work.
+
+    :param bounds: list of (xmin, ymin, xmax, ymax)
+    :type bounds: list
+    :param distance: maximum distance between bounds, in the units of the
+        bounds
+    :type distance: float
+    :param max_extent: maximum width and height of the bounds of a group. If
+        joining two groups exceeds it, they are not joined
+    :type max_extent: float
+    :return: list of groups, each one a list of indexes of `bounds`
+    :rtype: list
+    """
+    parent = list(range(len(bounds)))
+    extent = dict(enumerate(bounds))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def near(a, b):
+        return a[0] <= b[2] + distance and b[0] <= a[2] + distance and \
+               a[1] <= b[3] + distance and b[1] <= a[3] + distance
+
+    # sweep along x
+    order = sorted(range(len(bounds)), key=lambda i: bounds[i][0])
+    for n, i in enumerate(order):
+        for j in order[n+1:]:
+            if bounds[j][0] > bounds[i][2] + distance:
+                break
+            if not near(bounds[i], bounds[j]):
+                continue
+            root_i, root_j = find(i), find(j)
+            if root_i == root_j:
+                continue
+            joined = union_bounds([extent[root_i], extent[root_j]])
+            if max_extent is not None and \
+                    max(joined[2] - joined[0], joined[3] - joined[1]) > max_extent:
+                continue
+            parent[root_j] = root_i
+            extent[root_i] = joined
+
+    groups = {}
+    for i in range(len(bounds)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values())
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+""" JSON specs to rebuild Bap objects.
+
+`utils.serialize` makes a one way description of the parameters. A spec can
+be converted back to the object, so a `bap.Bap` configuration (with its
+season, scores, masks and filters) can be sent to other nodes as JSON.
+
+A spec is a dict with the name of the class and the arguments to create it::
+
+    {"class": "Satellite", "params": {"ratio": 0.05, "name": "score-sat"}}
+
+Classes are looked up in `scores.factory`, `filters.factory`,
+`masks.factory` and in `CLASSES` (Bap and seasons). Collections are stored by
+id and JSON arrays are converted to tuples.
+
+:Usage:
+
+.. code:: python
+
+    from geebap import spec
+
+    text = spec.dumps(bap)
+    same_bap = spec.loads(text)
+"""
+import inspect
+import json
+
+import ee
+
+from . import bap, expressions, filters, masks, priority, scores, season
+
+CLASSES = {'Bap': bap.Bap,
+           'Season': season.Season,
+           'SeasonDate': season.SeasonDate}
+
+# arguments passed by kwargs and stored with the same name
+KWARGS = {
+    'Score': ('range_in', 'range_out', 'sleep', 'normalize'),
+    'CloudDist': ('kernel', 'units'),
+    'MultiYear': ('year_property',),
+    'Bap': ('score_name', 'bandname_col_id', 'bandname_date',
+            'bandname_provenance', 'provenance', 'fixed_point', 'bands'),
+}
+
+
+def registry():
+    """ All the classes that can be used in a spec
+
+    :rtype: dict
+    """
+    classes = dict(CLASSES)
+    for factory in (scores.factory, filters.factory, masks.factory):
+        classes.update(factory)
+    return classes
+
+
+def _arguments(cls):
+    """ Names of the arguments of the class constructor and the kwargs it
+    stores """
+    try:
+        args = inspect.getfullargspec(cls.__init__).args
+    except AttributeError:  # python 2
+        args = inspect.getargspec(cls.__init__).args
+    args = [arg for arg in args if arg != 'self']
+    for klass in inspect.getmro(cls):
+        args.extend(KWARGS.get(klass.__name__, ()))
+    return args
+
+
+def encode(value):
+    """ Convert a value to its JSON representation """
+    if isinstance(value, (list, tuple)):
+        return [encode(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, encode(v)) for k, v in value.items())
+    if value.__class__.__name__ in registry():
+        return to_spec(value)
+    if isinstance(value, type) and issubclass(value, expressions.Expression):
+        return {'expression': value.__name__}
+    name = getattr(value, '__name__', None)
+    # formulas: classmethods of Expression (Expression.Exponential)
+    if inspect.ismethod(value) and \
+            getattr(expressions.Expression, name, None) == value:
+        return {'expression': name}
+    if name and getattr(ee.Kernel, name, None) is value:
+        return {'kernel': name}
+    # geetools collection groups and collections
+    if hasattr(value, 'collections'):
+        return {'colgroup': [col.id for col in value.collections]}
+    if hasattr(value, 'id') and hasattr(value, 'bands'):
+        return {'collection': value.id}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    try:
+        if isinstance(value, unicode):  # python 2
+            return value
+    except NameError:
+        pass
+    raise TypeError('cannot make a spec of {}'.format(value))
+
+
+def decode(value):
+    """ Convert a JSON representation back to the value """
+    if isinstance(value, list):
+        return tuple(decode(v) for v in value)
+    if isinstance(value, dict):
+        if 'class' in value:
+            return from_spec(value)
+        if 'colgroup' in value:
+            return priority.get_colgroup(tuple(value['colgroup']))
+        if 'collection' in value:
+            return priority.get_collection(value['collection'])
+        if 'expression' in value:
+            name = value['expression']
+            if hasattr(expressions.Expression, name):
+                return getattr(expressions.Expression, name)
+            return getattr(expressions, name)
+        if 'kernel' in value:
+            return getattr(ee.Kernel, value['kernel'])
+        return dict((k, decode(v)) for k, v in value.items())
+    return value
+
+
+def to_spec(obj):
+    """ Make the spec of an object
+
+    :rtype: dict
+    """
+    params = {}
+    for arg in _arguments(obj.__class__):
+        if hasattr(obj, arg):
+            params[arg] = encode(getattr(obj, arg))
+    return {'class': obj.__class__.__name__, 'params': params}
+
+
+def from_spec(spec):
+    """ Make an object from its spec """
+    classes = registry()
+    name = spec['class']
+    if name not in classes:
+        raise ValueError('unknown class {}'.format(name))
+    params = dict((k, decode(v)) for k, v in spec.get('params', {}).items())
+    return classes[name](**params)
+
+
+def dumps(obj, **kwargs):
+    """ JSON spec of an object """
+    return json.dumps(to_spec(obj), sort_keys=True, **kwargs)
+
+
+def loads(text):
+    """ Make an object from a JSON spec """
+    return from_spec(json.loads(text))
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+""" Composite graphs compiled once and reused for many geometries.
+
+A template runs the Python builder of a `bap.Bap` once per year with a
+placeholder geometry and wraps the resulting graph in an Earth Engine
+function. Each job calls the function with its own geometry, so the graph is
+not built again for each tile or site.
+
+The year (and so the season dates) can not be a placeholder: it decides the
+collections, the SLC-off handling and the seasons on the client side. There
+is one compiled function per year.
+
+:Usage:
+
+.. code:: python
+
+    from geebap import template
+
+    tmpl = template.Template(bap, indices=['ndvi'])
+    for tile in plan:
+        composite = tmpl(tile.geometry(crs), 2018)
+"""
+import ee
+
+
+class Template(object):
+    """ Composite template
+
+    :param bap: the Bap configuration
+    :type bap: bap.Bap
+    :param indices: indices to add to the composites
+    :type indices: list
+    :param method: 'best' (see `bap.Bap.build_composite_best`) or 'reduced'
+        (see `bap.Bap.build_composite_reduced`)
+    :type method: str
+    :param kwargs: other arguments for the build method (like `buffer`)
+    """
+    METHODS = ('best', 'reduced')
+
+    def __init__(self, bap, indices=None, method='best', **kwargs):
+        if method not in self.METHODS:
+            raise ValueError('method must be one of {}'.format(self.METHODS))
+        self.bap = bap
+        self.indices = indices
+        self.method = method
+        self.kwargs = kwargs
+        self._functions = {}
+
+    def build(self, year, site):
+        """ Run the Python builder """
+        build = getattr(self.bap, 'build_composite_{}'.format(self.method))
+        return build(year, site, self.indices, **self.kwargs)
+
+    def function(self, year):
+        """ Compiled function for the given year. It takes a geometry and
+        returns the composite
+
+        :rtype: ee.CustomFunction
+        """
+        if year not in self._functions:
+            self._functions[year] = ee.CustomFunction.create(
+                lambda site: self.build(year, site), 'Image', ['Geometry'])
+        return self._functions[year]
+
+    def __call__(self, site, year):
+        """ Make the composite of the given site and year
+
+        :type site: ee.Geometry or ee.Feature
+        :type year: int
+        :rtype: ee.Image
+        """
+        if isinstance(site, ee.Feature): site = site.geometry()
+        return ee.Image(self.function(year).call(site))
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+""" Split a site into tiles for exports and for the local engine.
+
+Tiles are sized so that the estimated cost (pixels times images) of each one
+fits a budget, and are padded with a halo as big as the largest neighbourhood
+used by the scores (`CloudDist` dmax, `MaskPercentKernel` distance), so the
+result has no edge effects at the borders of the tiles. The same plan gives
+the regions for Earth Engine exports and the array windows for the local
+engine, and balances the tiles across workers.
+
+Coordinates are in the units of a projected coordinate system (meters), with
+the y axis pointing up. Rows of the arrays go from the top (ymax) down.
+
+:Usage:
+
+.. code:: python
+
+    from geebap import tiling
+
+    halo = tiling.get_halo(bap.scores, scale=30)
+    plan = tiling.plan((xmin, ymin, xmax, ymax), scale=30, images=40,
+                       halo=halo)
+    for job in plan.jobs(workers=4):
+        region = job['tile'].geometry('EPSG:32719')
+"""
+import math
+
+
+def get_halo(scores, scale):
+    """ Halo (in meters) needed by the given scores
+
+    :param scores: list of scores
+    :type scores: list
+    :param scale: meters per pixel
+    :type scale: float
+    :rtype: float
+    """
+    halos = [score.halo(scale) for score in scores or []
+             if hasattr(score, 'halo')]
+    return max(halos) if halos else 0
+
+
+class Tile(object):
+    """ A window of the grid of a plan, in pixels
+
+    :param row: first row of the tile (without halo)
+    :type row: int
+    :param col: first column of the tile (without halo)
+    :type col: int
+    :param height: number of rows (without halo)
+    :type height: int
+    :param width: number of columns (without halo)
+    :type width: int
+    :param halo: width of the halo in pixels
+    :type halo: int
+    :param origin: coordinates of the top left corner of the grid (xmin, ymax)
+    :type origin: tuple
+    :param scale: size of the pixels
+    :type scale: float
+    :param shape: shape (rows, columns) of the grid
+    :type shape: tuple
+    :param images: estimated number of images over the tile
+    :type images: float
+    """
+    def __init__(self, row, col, height, width, halo=0, origin=(0, 0),
+                 scale=1, shape=None, images=1):
+        self.row = row
+        self.col = col
+        self.height = height
+        self.width = width
+        self.halo = halo
+        self.origin = origin
+        self.scale = scale
+        self.shape = shape or (row + height, col + width)
+        self.images = images
+
+    def __repr__(self):
+        return 'Tile({}, rows={}, cols={}, cost={})'.format(
+            self.id, self.height, self.width, self.cost)
+
+    def to_dict(self):
+        """ The tile as a JSON serializable dict (see `from_dict`) """
+        return dict(row=self.row, col=self.col, height=self.height,
+                    width=self.width, halo=self.halo,
+                    origin=list(self.origin), scale=self.scale,
+                    shape=list(self.shape), images=self.images)
+
+    @classmethod
+    def from_dict(cls, params):
+        params = dict(params)
+        params['origin'] = tuple(params['origin'])
+        params['shape'] = tuple(params['shape'])
+        return cls(**params)
+
+    @property
+    def id(self):
+        return '{}-{}'.format(self.row, self.col)
+
+    @property
+    def window(self):
+        """ Rows and columns of the tile with its halo, clipped to the grid
+
+        :rtype: tuple
+        """
+        row0 = max(self.row - self.halo, 0)
+        col0 = max(self.col - self.halo, 0)
+        row1 = min(self.row + self.height + self.halo, self.shape[0])
+        col1 = min(self.col + self.width + self.halo, self.shape[1])
+        return slice(row0, row1), slice(col0, col1)
+
+    @property
+    def inner(self):
+        """ Rows and columns of the tile inside the window
+
+        :rtype: tuple
+        """
+        rows, cols = self.window
+        row0 = self.row - rows.start
+        col0 = self.col - cols.start
+        return (slice(row0, row0 + self.height),
+                slice(col0, col0 + self.width))
+
+    @property
+    def pixels(self):
+        """ Number of pixels of the tile with its halo """
+        rows, cols = self.window
+        return (rows.stop - rows.start) * (cols.stop - cols.start)
+
+    @property
+    def cost(self):
+        """ Estimated cost: pixels times images """
+        return self.pixels * self.images
+
+    def _bounds(self, rows, cols):
+        x0, y0 = self.origin
+        return (x0 + cols.start * self.scale,
+                y0 - rows.stop * self.scale,
+                x0 + cols.stop * self.scale,
+                y0 - rows.start * self.scale)
+
+    @property
+    def bounds(self):
+        """ Bounds of the tile (xmin, ymin, xmax, ymax) without the halo """
+        return self._bounds(slice(self.row, self.row + self.height),
+                            slice(self.col, self.col + self.width))
+
+    @property
+    def halo_bounds(self):
+        """ Bounds of the tile (xmin, ymin, xmax, ymax) with the halo """
+        return self._bounds(*self.window)
+
+    def geometry(self, crs=None, halo=True):
+        """ The tile as an Earth Engine rectangle. Compute with the halo
+        and clip the result with `halo=False`
+
+        :param crs: the coordinate system of the plan
+        :type crs: str
+        :rtype: ee.Geometry
+        """
+        import ee
+        bounds = self.halo_bounds if halo else self.bounds
+        return ee.Geometry.Rectangle(list(bounds), crs, False)
+
+    def read(self, image):
+        """ Read the window (with halo) from an array or from an image of the
+        local engine (dict of arrays) """
+        rows, cols = self.window
+        if isinstance(image, dict):
+            return dict((k, v[..., rows, cols]) for k, v in image.items())
+        return image[..., rows, cols]
+
+    def crop(self, image):
+        """ Remove the halo from an array or from an image of the local
+        engine read with `read` """
+        rows, cols = self.inner
+        if isinstance(image, dict):
+            return dict((k, v[..., rows, cols]) for k, v in image.items())
+        return image[..., rows, cols]
+
+    def split(self):
+        """ Split the tile in four """
+        h1, w1 = self.height // 2, self.width // 2
+        tiles = []
+        for row, height in ((self.row, h1), (self.row + h1, self.height - h1)):
+            for col, width in ((self.col, w1), (self.col + w1, self.width - w1)):
+                if height and width:
+                    tiles.append(Tile(row, col, height, width, self.halo,
+                                      self.origin, self.scale, self.shape,
+                                      self.images))
+        return tiles
+
+
+class Plan(object):
+    """ List of tiles that cover a site """
+    def __init__(self, tiles, shape, origin, scale, halo=0):
+        self.tiles = tiles
+        self.shape = shape
+        self.origin = origin
+        self.scale = scale
+        self.halo = halo
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def __iter__(self):
+        return iter(self.tiles)
+
+    @property
+    def cost(self):
+        return sum(tile.cost for tile in self.tiles)
+
+    def assign(self, workers):
+        """ Distribute the tiles across workers balancing the cost (largest
+        tiles first, each one to the least loaded worker)
+
+        :param workers: number of workers
+        :type workers: int
+        :return: a list of tiles for each worker
+        :rtype: list
+        """
+        loads = [0] * workers
+        assigned = [[] for _ in range(workers)]
+        for tile in sorted(self.tiles, key=lambda t: t.cost, reverse=True):
+            worker = loads.index(min(loads))
+            assigned[worker].append(tile)
+            loads[worker] += tile.cost
+        return assigned
+
+    def jobs(self, workers=1):
+        """ Job list. Each job is a dict with the keys 'id', 'tile', 'cost'
+        and 'worker'
+
+        :rtype: list
+        """
+        jobs = []
+        for worker, tiles in enumerate(self.assign(workers)):
+            for tile in tiles:
+                jobs.append(dict(id=tile.id, tile=tile, cost=tile.cost,
+                                 worker=worker))
+        return sorted(jobs, key=lambda job: (job['worker'], -job['cost']))
+
+    def mosaic(self, results, fill=float('nan')):
+        """ Put together the results of the local engine
+
+        :param results: dict of tile id -> cropped array (see `Tile.crop`)
+        :type results: dict
+        :rtype: numpy.ndarray
+        """
+        import numpy as np
+        first = next(iter(results.values()))
+        out = np.full(first.shape[:-2] + tuple(self.shape), fill,
+                      dtype=np.result_type(first.dtype, type(fill)))
+        for tile in self.tiles:
+            if tile.id in results:
+                out[..., tile.row:tile.row + tile.height,
+                    tile.col:tile.col + tile.width] = results[tile.id]
+        return out
+
+
+def plan(bounds, scale, images=1, halo=0, max_cost=1e10, max_pixels=1e8,
+         min_size=16):
+    """ Split a site in tiles
+
+    :param bounds: bounds of the site (xmin, ymin, xmax, ymax)
+    :type bounds: tuple
+    :param scale: size of the pixels
+    :type scale: float
+    :param images: estimated number of images. Can be a function that takes
+        the bounds of a tile (with halo) and returns the number of images
+        over it, then tiles over more images are split further
+    :type images: float or function
+    :param halo: halo in the units of the bounds (see `get_halo`)
+    :type halo: float
+    :param max_cost: maximum cost (pixels times images) of a tile
+    :type max_cost: float
+    :param max_pixels: maximum pixels of a tile (with halo)
+    :type max_pixels: float
+    :param min_size: tiles with less rows or columns are not split
+    :type min_size: int
+    :rtype: Plan
+    """
+    xmin, ymin, xmax, ymax = bounds
+    shape = (int(math.ceil((ymax - ymin) / scale)),
+             int(math.ceil((xmax - xmin) / scale)))
+    origin = (xmin, ymax)
+    halo = int(math.ceil(halo / scale))
+
+    count = images(bounds) if callable(images) else images
+    budget = min(max_pixels, max_cost / max(count, 1))
+    side = int(math.sqrt(budget)) - 2 * halo
+    if side < 1:
+        raise ValueError('the halo ({} pixels) does not fit in the budget of '
+                         'the tiles'.format(halo))
+
+    pending = []
+    for row in range(0, shape[0], side):
+        for col in range(0, shape[1], side):
+            pending.append(Tile(row, col, min(side, shape[0] - row),
+                                min(side, shape[1] - col), halo, origin,
+                                scale, shape, count))
+
+    tiles = []
+    while pending:
+        tile = pending.pop()
+        if callable(images):
+            tile.images = images(tile.halo_bounds)
+        if tile.cost > max_cost and min(tile.height, tile.width) >= min_size:
+            pending.extend(tile.split())
+        else:
+            tiles.append(tile)
+
+    tiles.sort(key=lambda t: (t.row, t.col))
+    return Plan(tiles, shape, origin, scale, halo)
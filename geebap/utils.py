@@ -1,5 +1,83 @@
 # -*- coding: utf-8 -*-
 """ Util functions """
+import functools
+import threading
+from collections import OrderedDict
+
+
+class lazy_class_attribute(object):
+    """ Decorator for class attributes that are computed on first access and
+    then stored in the class. Used for Earth Engine objects, that can not be
+    created before `ee.Initialize()`
+
+    :Usage:
+
+    .. code:: python
+
+        class Holder(object):
+            @lazy_class_attribute
+            def ee_list(cls):
+                return ee.List([1, 2, 3])
+    """
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __get__(self, obj, cls):
+        value = self.function(cls)
+        setattr(cls, self.name, value)
+        return value
+
+
+def memoize(maxsize=128):
+    """ Decorator to cache the results of a function with hashable
+    arguments. The cache keeps the `maxsize` most recently used results.
+    The decorated function has a `cache_clear` method and a `cache_info`
+    method that returns a dict with hits, misses and size
+
+    :Usage:
+
+    .. code:: python
+
+        @memoize(maxsize=64)
+        def get_collection(id):
+            return collection.fromId(id)
+    """
+    def decorator(function):
+        cache = OrderedDict()
+        info = {'hits': 0, 'misses': 0}
+        lock = threading.Lock()
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            with lock:
+                if key in cache:
+                    info['hits'] += 1
+                    value = cache.pop(key)
+                    cache[key] = value
+                    return value
+            value = function(*args, **kwargs)
+            with lock:
+                info['misses'] += 1
+                cache[key] = value
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return value
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                info['hits'] = info['misses'] = 0
+
+        def cache_info():
+            return dict(info, size=len(cache), maxsize=maxsize)
+
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_info = cache_info
+        return wrapper
+    return decorator
 
 
 def serialize(obj, name=None, result=None):
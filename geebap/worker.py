@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+""" Worker that builds and exports the composites described in JSON jobs.
+
+A job is a JSON object::
+
+    {
+        "bap": {"class": "Bap", "params": {...}},  # see spec module
+        "year": 2018,
+        "site": {"type": "Polygon", "coordinates": [...]},  # GeoJSON
+        "indices": ["ndvi"],  # optional
+        "method": "best",  # optional, 'best' or 'reduced'
+        "kwargs": {"buffer": 100},  # optional, for the build method
+        "export": {"to": "asset", "assetId": "users/me/bap_2018",
+                   "scale": 30}  # optional
+    }
+
+`export` holds the arguments of `ee.batch.Export.image.to<Asset|Drive|
+CloudStorage>` (`to` is 'asset', 'drive' or 'cloud'; the region defaults to
+the site). Without `export` the worker only checks that the graph is valid
+(it gets the band names of the composite).
+
+The jobs are read from a directory (one `.json` file per job, claimed by
+renaming it, so many workers can share the directory) or from a file with
+one job per line.
+
+Usage::
+
+    python -m geebap.worker jobs/ [--once] [--poll 10]
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import socket
+import time
+import traceback
+
+from . import evaluation, instrument
+
+EXPORTS = {'asset': 'toAsset', 'drive': 'toDrive', 'cloud': 'toCloudStorage'}
+
+
+def build(job):
+    """ Build the composite of a job
+
+    :param job: the job (see module docs)
+    :type job: dict
+    :rtype: ee.Image
+    """
+    import ee
+    from . import spec
+    objbap = spec.from_spec(job['bap'])
+    site = ee.Geometry(job['site'])
+    method = job.get('method', 'best')
+    builder = getattr(objbap, 'build_composite_{}'.format(method))
+    return builder(job['year'], site, job.get('indices'),
+                   **job.get('kwargs', {}))
+
+
+def run_job(job):
+    """ Build the composite of a job and start its export
+
+    :return: the result: 'task' (the id of the export task) or 'bands'
+    :rtype: dict
+    """
+    import ee
+    composite = build(job)
+    export = job.get('export')
+    if not export:
+        return {'bands': evaluation.evaluate(composite.bandNames())}
+
+    params = dict(export)
+    to = params.pop('to', 'asset')
+    params.setdefault('region', ee.Geometry(job['site']))
+    function = getattr(ee.batch.Export.image, EXPORTS[to])
+    task = function(composite, **params)
+    instrument.call('exports', task.start)
+    return {'task': task.id}
+
+
+def _execute(job, run=None):
+    """ Run a job recording the elapsed time and the error (if any)
+
+    :param run: function that runs the job. Defaults to `run_job`
+    :type run: function
+    :return: the state ('done' or 'failed') and the result
+    :rtype: tuple
+    """
+    run = run or run_job
+    start = time.time()
+    try:
+        result = run(job)
+        state = 'done'
+    except Exception:
+        result = {'error': traceback.format_exc()}
+        state = 'failed'
+    result['elapsed'] = time.time() - start
+    return state, result
+
+
+def worker_id():
+    return '{}-{}'.format(socket.gethostname(), os.getpid())
+
+
+def claim(path):
+    """ Claim a job of the directory renaming its file
+
+    :return: the name of the claimed file or None if there are no jobs
+    :rtype: str
+    """
+    suffix = '.{}.running'.format(worker_id())
+    for name in sorted(os.listdir(path)):
+        if not name.endswith('.json'):
+            continue
+        filename = os.path.join(path, name)
+        try:
+            os.rename(filename, filename + suffix)
+        except OSError:
+            continue  # claimed by another worker
+        return filename + suffix
+    return None
+
+
+def run_directory(path, once=False, poll=10, sleep=time.sleep):
+    """ Run the jobs of a directory. The result of `job.json` is written to
+    `job.json.done` or `job.json.failed`
+
+    :param once: stop when there are no more jobs, else wait for new ones
+    :type once: bool
+    :param poll: seconds to wait for new jobs
+    :type poll: float
+    :return: number of jobs run
+    :rtype: int
+    """
+    count = 0
+    while True:
+        running = claim(path)
+        if running is None:
+            if once:
+                return count
+            sleep(poll)
+            continue
+
+        with open(running) as f:
+            job = json.load(f)
+        state, result = _execute(job)
+        original = running[:running.rindex('.json') + len('.json')]
+        with open('{}.{}'.format(original, state), 'w') as f:
+            json.dump(dict(job=job, result=result), f)
+        os.remove(running)
+        count += 1
+
+
+def run_file(filename):
+    """ Run the jobs of a file (one JSON job per line). Results are appended
+    to `filename.results` (one per line) and the jobs already there are not
+    run again
+
+    :return: number of jobs run
+    :rtype: int
+    """
+    results = filename + '.results'
+    done = set()
+    if os.path.exists(results):
+        with open(results) as f:
+            for line in f:
+                if line.strip():
+                    done.add(json.loads(line)['line'])
+
+    count = 0
+    with open(filename) as f:
+        lines = f.readlines()
+    for n, line in enumerate(lines):
+        if n in done or not line.strip():
+            continue
+        state, result = _execute(json.loads(line))
+        with open(results, 'a') as f:
+            f.write(json.dumps(dict(line=n, state=state, result=result)))
+            f.write('\n')
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('path', help='directory of jobs or file of jobs')
+    parser.add_argument('--once', action='store_true',
+                        help='stop when there are no more jobs')
+    parser.add_argument('--poll', type=float, default=10)
+    args = parser.parse_args()
+
+    import ee
+    ee.Initialize()
+    if os.path.isdir(args.path):
+        count = run_directory(args.path, args.once, args.poll)
+    else:
+        count = run_file(args.path)
+    print('{} jobs run'.format(count))
+
+
+if __name__ == '__main__':
+    main()
@@ -44,3 +44,173 @@ def test_bap2016_0():
     composite = objbap.build_composite_best(2016, site, indices=("ndvi",))
 
     assert isinstance(composite, ee.Image) == True
+
+
+def test_footprint():
+    objbap = bap.Bap(season=seas, scores=(pmascpor, psat), masks=(clouds,),
+                     filters=(filter,))
+    composite = objbap.build_composite_best(2016, site)
+
+    # the footprint is the site, not the footprints of the images
+    footprint = ee.Geometry(composite.get('system:footprint'))
+    outside = footprint.difference(site, 1).area(1).getInfo()
+    assert outside < 1
+
+
+def test_build_series():
+    pmulti = scores.MultiYear(2016, seas)
+    objbap = bap.Bap(season=seas, range=(1, 1),
+                     scores=(pindice, pmascpor, psat, pdoy, pmulti),
+                     masks=(clouds,),
+                     filters=(filter,),
+                     )
+
+    series = objbap.build_series([2015, 2016], site, indices=("ndvi",))
+
+    assert list(series.keys()) == [2015, 2016]
+    assert isinstance(series[2016], ee.Image) == True
+
+    used = series[2016].get('BAP_USED_IMAGES')
+    assert isinstance(used, ee.ComputedObject) == True
+
+
+def test_update_composite():
+    objbap = bap.Bap(season=seas,
+                     scores=(pindice, pmascpor, psat, pop),
+                     masks=(clouds,),
+                     filters=(filter,),
+                     )
+    composite = objbap.build_composite_best(2016, site, indices=("ndvi",))
+    updated = objbap.update_composite(composite, 2016, site,
+                                      indices=("ndvi",))
+
+    assert isinstance(updated, ee.Image) == True
+
+    # extra images to leave out
+    updated = objbap.update_composite(composite, 2016, site,
+                                      indices=("ndvi",), exclude=[])
+    assert isinstance(updated, ee.Image) == True
+
+    # collection scores need a full rebuild
+    objbap = bap.Bap(season=seas, scores=(pindice, pdoy))
+    try:
+        objbap.update_composite(composite, 2016, site)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_score_layers_cached():
+    objbap = bap.Bap(season=seas, scores=(pmascpor, psat), masks=(clouds,),
+                     filters=(filter,))
+    layers = objbap.score_layers(2016, site)
+    again = objbap.score_layers(2016, site, cached=layers)
+    assert isinstance(again, ee.ImageCollection) == True
+
+    # collection scores need all the layers again
+    objbap = bap.Bap(season=seas, scores=(psat, pdoy))
+    try:
+        objbap.score_layers(2016, site, cached=layers)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_output_bands():
+    objbap = bap.Bap(season=seas,
+                     scores=(pindice, pmascpor, psat, pout),
+                     masks=(clouds,),
+                     filters=(filter,),
+                     bands=['red', 'nir'],
+                     harmonize=False)
+
+    composite = objbap.build_composite_best(2016, site, indices=("ndvi",))
+    bands = composite.bandNames().getInfo()
+
+    assert bands == ['red', 'nir', 'col_id', 'date', 'ndvi', 'score']
+
+
+def test_instrument():
+    from geebap import instrument
+    objbap = bap.Bap(season=seas, scores=(psat, pmascpor), masks=(clouds,),
+                     filters=(filter,))
+
+    with instrument.record(graph=True) as events:
+        composite = objbap.build_composite_best(2016, site)
+
+    stages = [event.stage for event in events]
+    assert stages[-1] == 'build_composite_best'
+    assert 'compute_scores' in stages and 'score' in stages
+    assert set(e.name for e in events if e.stage == 'score') == \
+        set([psat.name, pmascpor.name])
+    assert events[-1].graph_bytes > 0
+    # the graph of the site is not added by the stage
+    assert events[-1].graph_bytes < instrument.graph_bytes(composite)
+
+
+def test_global_stats_medoid_not_first():
+    medoid = scores.Medoid(global_stats=True)
+    objbap = bap.Bap(season=seas, scores=(psat, pmascpor, medoid),
+                     masks=(clouds,), filters=(filter,))
+
+    composite = objbap.build_composite_best(2016, site, indices=("ndvi",))
+    bands = composite.bandNames().getInfo()
+
+    assert 'score' in bands
+
+    series = objbap.build_series([2016], site)
+    assert 'score' in series[2016].bandNames().getInfo()
+
+
+def test_global_stats_other_scores():
+    # a score with global stats does not change the inputs of the others
+    bright = scores.Brightness()
+    outliers = scores.Outliers(('ndvi',), global_stats=True)
+
+    def brightness(score_list):
+        objbap = bap.Bap(season=seas, scores=score_list, masks=(clouds,),
+                         filters=(filter,))
+        col = objbap.compute_scores(2016, site, indices=("ndvi",),
+                                    add_individual_scores=True)
+        image = ee.Image(col.first()).select(bright.name)
+        return image.reduceRegion(ee.Reducer.mean(), site, 30).getInfo()
+
+    assert brightness((bright,)) == brightness((bright, outliers))
+
+
+def test_build_series_fixed_point():
+    pmulti = scores.MultiYear(2016, seas)
+    objbap = bap.Bap(season=seas, range=(1, 1), scores=(psat, pmulti),
+                     masks=(clouds,), filters=(filter,), fixed_point='uint8',
+                     bands=['red', 'nir'])
+
+    series = objbap.build_series([2016], site, add_individual_scores=True)
+    composite = series[2016]
+    point = composite.reduceRegion(ee.Reducer.first(), centroid, 30) \
+        .getInfo()
+
+    # the year dependent score is quantized like the others and is part of
+    # the integer sum
+    assert point[pmulti.name] == int(point[pmulti.name])
+    assert point['score'] == point[psat.name] + point[pmulti.name]
+
+
+def test_output_bands_harmonize():
+    from geebap import priority
+    objbap = bap.Bap(season=seas,
+                     scores=(pmascpor, psat),
+                     masks=(clouds,),
+                     filters=(filter,),
+                     bands=['red', 'nir'])
+    assert objbap.harmonize
+
+    col = priority.get_collection('LANDSAT/LE07/C01/T1_SR')
+    required = objbap.required_bands(col, ['red', 'nir'])
+    names = [band.name for band in col.bands]
+    # the QA bands and the other optical bands are dropped
+    assert set(required) == set(['red', 'nir', names[0]])
+
+    composite = objbap.build_composite_best(2016, site, indices=("ndvi",))
+    bands = composite.bandNames().getInfo()
+
+    assert bands == ['red', 'nir', 'col_id', 'date', 'ndvi', 'score']
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from benchmarks import bench_graph, bench_local, run
+
+
+def test_compare():
+    baseline = {'a_time': 1.0, 'b_per_sec': 100, 'c_bytes': 10, 'gone': 1}
+    result = {'a_time': 1.1, 'b_per_sec': 40, 'c_bytes': 20, 'new': 1}
+
+    regressions = run.compare(result, baseline, tolerance=0.25)
+
+    assert sorted(regressions) == ['b_per_sec', 'c_bytes']
+    assert regressions['c_bytes'] == (10, 20, 1.0)
+
+    result['a_time'] = 1.4
+    regressions = run.compare(result, baseline, tolerance=0.25,
+                              time_tolerance=0.5)
+    assert sorted(regressions) == ['b_per_sec', 'c_bytes']
+
+
+def test_normalize():
+    result = {'a_time': 2.0, 'b_per_sec': 100, 'setup_time_cold': 4.0,
+              'c_bytes': 10}
+
+    assert run.normalize(result, 0.5) == {
+        'a_time': 4.0, 'b_per_sec': 50, 'setup_time_cold': 8.0,
+        'c_bytes': 10}
+
+
+def test_bench_local():
+    result = bench_local.run(images=3, size=16, repeat=1,
+                             cases=['best', 'outliers'])
+
+    assert sorted(result) == ['local_best_images_per_sec',
+                              'local_best_peak_bytes',
+                              'local_outliers_images_per_sec',
+                              'local_outliers_peak_bytes']
+    assert all(value > 0 for value in result.values())
+
+
+def test_bench_graph():
+    result = bench_graph.run(repeat=1, combos=['pixel'], year_ranges=(0,))
+
+    assert sorted(result) == ['graph_pixel_range0_build_time',
+                              'graph_pixel_range0_bytes']
+    assert result['graph_pixel_range0_bytes'] > 0
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import tempfile
+import time
+from geebap import cache, evaluation
+
+
+class Graph(object):
+    """ Stands for a computed object: identical graphs serialize equal """
+    def __init__(self, graph):
+        self.graph = graph
+
+    def serialize(self):
+        return self.graph
+
+
+def test_identical_graphs_resolve_from_disk():
+    calls = []
+
+    def backend(obj):
+        calls.append(obj.graph)
+        return {'size': len(obj.graph)}
+
+    path = tempfile.mkdtemp()
+    evaluator = evaluation.Evaluator(backend=backend,
+                                     cache=cache.DiskCache(path))
+    first = evaluator.evaluate_many([Graph('a'), Graph('bb'), Graph('a')])
+    assert first == [{'size': 1}, {'size': 2}, {'size': 1}]
+
+    # a new cache over the same directory (a new run)
+    evaluator.cache = cache.DiskCache(path)
+    assert evaluator.evaluate(Graph('bb')) == {'size': 2}
+    assert sorted(calls) in (['a', 'bb'], ['a', 'a', 'bb'])
+
+
+def test_lru_eviction():
+    disk = cache.DiskCache(tempfile.mkdtemp())
+    keys = [disk.key(i) for i in range(6)]
+    for i, key in enumerate(keys):
+        disk.set(key, 'x' * 40)
+        # distinct access times
+        os.utime(disk._filename(key), (i, i))
+    # room for one more result
+    disk.max_size = disk.size + 10
+    # use the oldest one, so it becomes the most recent
+    disk.get(keys[0])
+    disk.set(disk.key('new'), 'x' * 40)
+
+    assert disk.size <= disk.max_size
+    assert disk.get(keys[0])[0]
+    assert not disk.get(keys[1])[0]
+
+
+def _write(path, key, value):
+    disk = cache.DiskCache(path)
+    for _ in range(200):
+        disk.set(key, value)
+
+
+def test_processes_share_directory():
+    path = tempfile.mkdtemp()
+    key = cache.DiskCache(path).key('shared')
+    values = ['x' * 5000, 'y' * 5000]
+    processes = [multiprocessing.Process(target=_write, args=(path, key, v))
+                 for v in values]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0, 0]
+    assert cache.DiskCache(path).get(key)[1] in values
+    names = os.listdir(os.path.dirname(cache.DiskCache(path)._filename(key)))
+    assert names == [key + '.json']
+
+
+def test_ttl():
+    disk = cache.DiskCache(tempfile.mkdtemp(), ttl=0.05)
+    key = disk.key([1, 2])
+    disk.set(key, 3)
+    assert disk.get(key) == (True, 3)
+    time.sleep(0.1)
+    assert disk.get(key) == (False, None)
+    assert disk.size == 0
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+import ee
+ee.Initialize()
+from geebap import scores
+
+
+def test_halo_units():
+    meters = scores.CloudDist(units='meters')
+    pixels = scores.CloudDist(units='pixels')
+
+    # the default distance is the same in both units
+    assert meters.get_dmax(30) == 30 * 255
+    assert pixels.get_dmax(30) == 255
+    assert meters.halo(30) == pixels.halo(30) == 30 * 255
+
+
+def test_halo_dmax_pixels():
+    score = scores.CloudDist(dmax=10, units='pixels')
+    assert score.halo(30) == 300
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from geebap import evaluation
+
+
+class FakeBackend(object):
+    """ Local backend that rejects the first requests of each object with
+    a rate limit error and records the maximum concurrency """
+    def __init__(self, failures=2, message='Too many concurrent aggregations.'):
+        self.failures = failures
+        self.message = message
+        self.calls = {}
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, obj):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            calls = self.calls[obj] = self.calls.get(obj, 0) + 1
+        try:
+            time.sleep(0.01)
+            if calls <= self.failures:
+                raise Exception(self.message)
+            return obj * 2
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_evaluate_many():
+    backend = FakeBackend()
+    evaluator = evaluation.Evaluator(workers=8, max_in_flight=3,
+                                     backend=backend, sleep=lambda s: None)
+    result = evaluator.evaluate_many(list(range(20)))
+
+    assert result == [i * 2 for i in range(20)]
+    assert all(calls == 3 for calls in backend.calls.values())
+    assert backend.max_running <= 3
+
+
+def test_global_limit():
+    backend = FakeBackend(0)
+    evaluation.set_in_flight_limit(2)
+    try:
+        evaluator = evaluation.Evaluator(workers=8, max_in_flight=5,
+                                         backend=backend)
+        evaluator.evaluate_many(list(range(20)))
+    finally:
+        evaluation.set_in_flight_limit(10)
+
+    # the evaluator limit does not replace the global one
+    assert backend.max_running <= 2
+
+
+def test_evaluate_dict():
+    evaluator = evaluation.Evaluator(backend=FakeBackend(0))
+    assert evaluator.evaluate_many({'a': 1, 'b': 2}) == {'a': 2, 'b': 4}
+
+
+def test_retries_exhausted():
+    delays = []
+    evaluator = evaluation.Evaluator(retries=3, base_delay=1, max_delay=4,
+                                     backend=FakeBackend(10),
+                                     sleep=delays.append)
+    try:
+        evaluator.evaluate(1)
+    except Exception as e:
+        assert evaluation.is_rate_limit(e)
+    else:
+        raise AssertionError('should raise')
+
+    assert len(delays) == 3
+    assert all(0 <= d <= cap for d, cap in zip(delays, [1, 2, 4]))
+
+
+def test_other_errors_not_retried():
+    backend = FakeBackend(1, 'Image.select: Pattern did not match')
+    evaluator = evaluation.Evaluator(backend=backend, sleep=lambda s: None)
+    try:
+        evaluator.evaluate(1)
+    except Exception:
+        pass
+    assert backend.calls[1] == 1
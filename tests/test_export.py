@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import json
+from geebap import export, tiling
+
+
+class FakeTaskService(object):
+    """ Local task service. Each task runs for `duration` polls and fails if
+    its tile is bigger than `max_pixels` and its tileScale is lower than
+    `min_tile_scale` """
+    def __init__(self, duration=2, max_pixels=None, min_tile_scale=1):
+        self.duration = duration
+        self.max_pixels = max_pixels
+        self.min_tile_scale = min_tile_scale
+        self.tasks = {}
+        self.started = []
+        self.max_running = 0
+
+    def start(self, job_id, params):
+        task_id = 'task{}'.format(len(self.started))
+        self.started.append(job_id)
+        self.tasks[task_id] = dict(params=params, polls=0)
+        running = sum(1 for t in self.tasks.values()
+                      if t['polls'] < self.duration)
+        self.max_running = max(self.max_running, running)
+        return task_id
+
+    def status(self, task_id):
+        task = self.tasks[task_id]
+        task['polls'] += 1
+        if task['polls'] < self.duration:
+            return export.RUNNING, None
+        params = task['params']
+        tile = tiling.Tile.from_dict(params['tile'])
+        if self.max_pixels and tile.pixels > self.max_pixels and \
+                params['tileScale'] < self.min_tile_scale:
+            return export.FAILED, 'User memory limit exceeded.'
+        return export.COMPLETED, None
+
+
+def make_plan():
+    return tiling.plan((0, 0, 100, 100), scale=1, max_pixels=50*50)
+
+
+def test_max_running():
+    service = FakeTaskService()
+    manager = export.ExportManager(service, max_running=3,
+                                   sleep=lambda s: None)
+    manager.add_plan(make_plan(), years=[2018, 2019])
+
+    failed = manager.run()
+
+    assert failed == []
+    assert len(service.started) == 8
+    assert service.max_running == 3
+    assert manager.count(export.COMPLETED) == 8
+
+
+def test_retry_tile_scale():
+    service = FakeTaskService(max_pixels=100, min_tile_scale=4)
+    manager = export.ExportManager(service, sleep=lambda s: None)
+    manager.add_plan(make_plan())
+
+    assert manager.run() == []
+    for job in manager.jobs.values():
+        assert job['params']['tileScale'] == 4
+
+
+def test_split_tiles():
+    # tileScale never helps: tiles are split until they fit
+    service = FakeTaskService(max_pixels=30*30, min_tile_scale=100)
+    manager = export.ExportManager(service, retries=1, sleep=lambda s: None)
+    manager.add_plan(make_plan())
+
+    assert manager.run() == []
+    assert manager.count(export.SPLIT) == 4
+    assert manager.count(export.COMPLETED) == 16
+
+
+def test_resume(tmpdir):
+    path = str(tmpdir.join('state.json'))
+    service = FakeTaskService(duration=1)
+    manager = export.ExportManager(service, path, max_running=2,
+                                   sleep=lambda s: None)
+    manager.add_plan(make_plan())
+    manager.update()
+    manager.update()  # the first two are completed, the last two running
+
+    with open(path) as f:
+        state = json.load(f)
+    assert sum(1 for job in state.values()
+               if job['state'] == export.COMPLETED) == 2
+
+    # a new run with the same state file polls the running tasks and does
+    # not repeat the completed ones
+    service2 = FakeTaskService(duration=1)
+    service2.tasks = service.tasks
+    manager2 = export.ExportManager(service2, path, sleep=lambda s: None)
+    manager2.add_plan(make_plan())
+    assert manager2.run() == []
+    assert service2.started == []
+    assert manager2.count(export.COMPLETED) == 4
+
+
+def test_save_each_start(tmpdir):
+    path = str(tmpdir.join('state.json'))
+    service = FakeTaskService()
+    start = service.start
+
+    def crash(job_id, params):
+        if len(service.started) == 2:
+            raise RuntimeError('crash')
+        return start(job_id, params)
+
+    service.start = crash
+    manager = export.ExportManager(service, path, sleep=lambda s: None)
+    manager.add_plan(make_plan())
+    try:
+        manager.update()
+    except RuntimeError:
+        pass
+
+    # the tasks started before the crash are in the state file
+    with open(path) as f:
+        state = json.load(f)
+    running = [job_id for job_id, job in state.items()
+               if job['state'] == export.RUNNING]
+    assert running == service.started
+    assert all(state[job_id]['task'] for job_id in running)
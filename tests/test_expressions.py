@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from geebap import expgen, functions
+from geebap.expressions import Expression
+
+
+def test_compiled_ee():
+    expr = "1.0-(1.0/(exp(((min(var, 100)-50.0)*(1/100*-10)))+1.0))"
+    compiled = expgen.CompiledExpression(expr)
+    old = expgen.ExpGen.parse(expr.replace('var', "'var'"))
+
+    assert compiled.ee == old
+
+
+def test_compiled_not_allowed():
+    for expr in ["__import__('os')", "var.real", "[var]", "abs(var)"]:
+        try:
+            expgen.CompiledExpression(expr)
+        except ValueError:
+            continue
+        raise AssertionError('{} should not compile'.format(expr))
+
+
+def test_vectorized_eval():
+    for expr in (Expression.Exponential(range=(0, 100)),
+                 Expression.Normal(range=(0, 300))):
+        values = np.linspace(expr.min, expr.max, 50)
+        vectorized = expr.eval(values)
+        single = [expr.eval(float(v)) for v in values]
+
+        assert np.allclose(vectorized, single)
+        assert expr.max_result == max(single + [expr.max_result])
+
+
+def test_range_statistics():
+    for rango in [(0, 100), (100, 300), (0.5, 7), (-3, 3)]:
+        expr = Expression(range=rango)
+        grid = functions.drange(rango[0], rango[1] + 1, places=1)
+
+        assert np.isclose(expr.mean, np.mean(grid))
+        assert np.isclose(expr.std, np.std(grid))
+
+
+def test_max_result_analytical():
+    for expr in (Expression.Exponential(range=(0, 100)),
+                 Expression.Exponential(a=10, range=(100, 300)),
+                 Expression.Normal(range=(0, 300)),
+                 Expression.Normal(range=(0.5, 7))):
+        grid = np.array(functions.drange(expr.range[0], expr.range[1] + 1,
+                                         places=1))
+        assert np.isclose(expr.max_result, np.max(expr.eval(grid)))
+
+
+def test_cache_invalidation():
+    expr = Expression.Exponential(range=(0, 100))
+    first = expr.max_result
+    assert expr.mean == 50
+
+    expr.range = (0, 200)
+    assert expr.mean == 100
+    expr.params['a'] = -5
+    assert expr.max_result != first
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+import pytest
+from geebap import functions
+
+
+def test_provenance():
+    value = functions.encode_provenance(12, 17532)  # 2018-01-01
+    assert value < 2**32
+    assert functions.decode_provenance(value) == (12, 17532)
+    assert functions.decode_provenance(float(value)) == (12, 17532)
+
+    with pytest.raises(ValueError):
+        functions.encode_provenance(256, 0)
+    with pytest.raises(ValueError):
+        functions.encode_provenance(1, 2**24)
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+
+
+def test_lazy_import():
+    code = ("import sys, geebap; "
+            "assert not [m for m in sys.modules if m.startswith('geebap.') "
+            "and m != 'geebap._version'], sys.modules.keys(); "
+            "assert geebap.local.Welford")
+    subprocess.check_call([sys.executable, '-c', code])
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from geebap import evaluation, instrument
+
+
+class Builder(object):
+    name = 'builder'
+
+    def __init__(self, evaluator):
+        self.evaluator = evaluator
+
+    @instrument.stage()
+    def build(self):
+        return self.inner() + 1
+
+    @instrument.stage('inner-stage')
+    def inner(self):
+        return self.evaluator.evaluate(1) + self.evaluator.evaluate(2)
+
+
+def make_builder():
+    return Builder(evaluation.Evaluator(backend=lambda obj: obj * 10))
+
+
+def test_disabled():
+    builder = make_builder()
+    assert not instrument.enabled()
+    assert builder.build() == 31
+
+
+def test_record():
+    builder = make_builder()
+    with instrument.record() as events:
+        assert builder.build() == 31
+    assert not instrument.enabled()
+
+    assert [e.stage for e in events] == ['inner-stage', 'build']
+    assert [e.getinfo for e in events] == [2, 2]
+    assert events[0].name == 'builder'
+    assert events[0].exports == 0
+    assert events[0].graph_bytes is None
+    assert events[1].elapsed >= events[0].elapsed
+
+
+def test_hook():
+    calls = []
+
+    def hook(event):
+        calls.append(event.stage)
+
+    instrument.add_hook(hook)
+    try:
+        instrument.call('exports', lambda: None)
+        make_builder().build()
+    finally:
+        instrument.remove_hook(hook)
+
+    assert calls == ['inner-stage', 'build']
+    assert not instrument.enabled()
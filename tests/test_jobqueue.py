@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import time
+
+import numpy as np
+from geebap import jobqueue
+
+
+def make_queue(tmpdir, jobs=4, **kwargs):
+    queue = jobqueue.JobQueue(str(tmpdir.join('queue.db')), **kwargs)
+    for year in range(2015, 2015 + jobs):
+        queue.add('site-{}'.format(year), {'site': 'site', 'year': year})
+    return queue
+
+
+def run(job):
+    if job.get('fail'):
+        raise ValueError('bad job')
+    return {'year': job['year']}
+
+
+def test_claim_once(tmpdir):
+    queue = make_queue(tmpdir, jobs=2)
+    assert not queue.add('site-2015', {'year': 0})
+
+    first = queue.claim('a')
+    second = queue.claim('b')
+    assert first[0] != second[0]
+    assert queue.claim('c') is None
+    assert queue.count(jobqueue.RUNNING) == 2
+
+
+def test_work(tmpdir):
+    queue = make_queue(tmpdir)
+
+    assert jobqueue.work(queue, run, worker='a') == 4
+    assert queue.done
+    results = queue.results()
+    assert results['site-2017']['result']['year'] == 2017
+    assert results['site-2017']['worker'] == 'a'
+    assert results['site-2017']['elapsed'] is not None
+
+
+def test_retry_failed(tmpdir):
+    queue = make_queue(tmpdir, jobs=0, max_attempts=2)
+    queue.add('bad', {'year': 0, 'fail': True})
+
+    assert jobqueue.work(queue, run) == 2
+    result = queue.results()['bad']
+    assert result['state'] == jobqueue.FAILED
+    assert result['attempts'] == 2
+    assert 'bad job' in result['result']['error']
+
+
+def test_expired_lease(tmpdir):
+    queue = make_queue(tmpdir, jobs=1, max_attempts=2)
+    job_id, job = queue.claim('dead', lease=0.01)
+    time.sleep(0.05)
+
+    # the job of the dead worker is taken again
+    assert queue.claim('alive')[0] == job_id
+    # the dead worker can not record its result
+    assert not queue.finish(job_id, {'elapsed': 1}, worker='dead')
+    assert queue.finish(job_id, {'elapsed': 1}, worker='alive')
+    assert queue.results()[job_id]['attempts'] == 2
+
+
+def test_expired_too_many_times(tmpdir):
+    queue = make_queue(tmpdir, jobs=1, max_attempts=1)
+    queue.claim('dead', lease=0.01)
+    time.sleep(0.05)
+
+    assert queue.claim('alive') is None
+    assert queue.count(jobqueue.FAILED) == 1
+
+
+def _count(path, results):
+    results.put(jobqueue.work(jobqueue.JobQueue(path), run))
+
+
+def test_processes(tmpdir):
+    queue = make_queue(tmpdir, jobs=20)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_count,
+                                         args=(queue.path, results))
+                 for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert sum(results.get() for _ in processes) == 20
+    assert queue.count(jobqueue.COMPLETED) == 20
+
+
+def test_run_local(tmpdir):
+    layers = {'a': np.array([[[0.1, 0.9]], [[0.5, 0.2]]]),
+              'b': np.array([[[0.0, 0.0]], [[0.1, np.nan]]])}
+    images = {'red': np.array([[[1., 2.]], [[3., 4.]]])}
+    job = dict(engine='local', layers=str(tmpdir.join('layers.npz')),
+               images=str(tmpdir.join('images.npz')),
+               output=str(tmpdir.join('out.npz')))
+    np.savez(job['layers'], **layers)
+    np.savez(job['images'], **images)
+
+    result = jobqueue.run_job(job)
+
+    assert result['pixels'] == 2
+    with np.load(job['output']) as out:
+        assert out['red'].tolist() == [[3., 2.]]
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from geebap import local
+
+np.random.seed(0)
+shape = (20, 30)
+stack = np.random.normal(0.3, 0.1, (40,) + shape)
+stack[3, :5, :5] = np.nan
+
+
+def test_welford():
+    acc = local.Welford(shape)
+    for image in stack:
+        acc.update(image)
+
+    assert np.allclose(acc.mean, np.nanmean(stack, axis=0))
+    assert np.allclose(acc.std(), np.nanstd(stack, axis=0))
+    assert np.allclose(acc.std(1), np.nanstd(stack, axis=0, ddof=1))
+
+
+def test_psquare():
+    big = np.random.uniform(0, 1, (2000, 4, 4))
+    acc = local.PSquare((4, 4), 0.75)
+    for image in big:
+        acc.update(image)
+
+    exact = np.percentile(big, 75, axis=0)
+    assert np.abs(acc.result - exact).max() < 0.02
+
+
+def test_psquare_few_values():
+    acc = local.PSquare((2, 2), 0.5)
+    for image in stack[:3, :2, :2]:
+        acc.update(image)
+
+    assert np.allclose(acc.result, np.median(stack[:3, :2, :2], axis=0))
+
+
+def test_outliers_mean():
+    images = [{'B1': image} for image in stack]
+    result = list(local.outliers(images, ['B1'], 'mean', 0.7))
+
+    masked = np.where(stack == 0, np.nan, stack)
+    mean = np.nanmean(masked, axis=0)
+    std = np.nanstd(masked, axis=0)
+    inside = (stack >= mean - 0.7*std) & (stack <= mean + 0.7*std)
+
+    valid = ~np.isnan(stack)
+    assert np.array_equal(np.array(result)[valid], inside[valid])
+    assert np.isnan(np.array(result)[~valid]).all()
+
+
+def naive_medoid(array):
+    median = np.nanmedian(array, axis=0)
+    dist = ((array - median)**2).sum(axis=1)
+    return 1 - dist / np.nanmax(dist, axis=0)
+
+
+def test_medoid_tiles():
+    array = np.random.uniform(0.1, 1, (7, 3) + shape)
+    array[2, 1, 4, 4] = 0
+    expected = naive_medoid(np.where(array == 0, np.nan, array))
+
+    # a small ceiling forces many tiles
+    result = local.medoid(array, max_memory=4*1024)
+    assert result.dtype == np.float32
+    assert np.allclose(result, expected, equal_nan=True, atol=1e-5)
+    assert np.isnan(result[2, 4, 4])
+
+
+def test_medoid_images():
+    array = np.random.uniform(0.1, 1, (6, 2) + shape)
+    images = [{'B1': img[0], 'B2': img[1]} for img in array]
+
+    result = local.medoid(images, bands=['B1', 'B2'], max_memory=2048)
+    assert np.allclose(result, naive_medoid(array), atol=1e-5)
+
+
+def test_medoid_memmap_bands(tmpdir):
+    import tracemalloc
+    array = np.random.uniform(0.1, 1, (8, 5, 100, 100)).astype(np.float32)
+    filename = str(tmpdir.join('stack.dat'))
+    memmap = np.memmap(filename, dtype=np.float32, mode='w+',
+                       shape=array.shape)
+    memmap[:] = array
+    memmap.flush()
+    memmap = np.memmap(filename, dtype=np.float32, mode='r',
+                       shape=array.shape)
+    out = np.empty((8, 100, 100), dtype=np.float32)
+
+    tracemalloc.start()
+    try:
+        local.medoid(memmap, bands=[0, 3], max_memory=64*1024, out=out)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # the selected bands are read per window, not copied whole (640 KB)
+    assert peak < 256*1024
+    assert np.allclose(out, naive_medoid(array[:, [0, 3]]), atol=1e-5)
+
+
+def test_weight_sweep():
+    layers = {'a': np.random.rand(6, 20, 30),
+              'b': np.random.rand(6, 20, 30),
+              'c': np.random.rand(6, 20, 30)}
+    layers['a'][2, 0, 0] = np.nan
+    layers['a'][:, 1, 1] = np.nan
+    weights = np.random.rand(5, 3)
+
+    # small memory to use many tiles
+    indexes = local.weight_sweep(layers, weights, max_memory=4*6*9*40)
+    assert indexes.shape == (5, 20, 30)
+
+    for k in range(5):
+        w = dict(zip(['a', 'b', 'c'], weights[k]))
+        total = local.recomposite(layers, w)
+        np.testing.assert_array_equal(indexes[k], local.best_index(total))
+
+    assert (indexes[:, 0, 0] != 2).all()
+    assert (indexes[:, 1, 1] == -1).all()
+
+    matrix = local.agreement(indexes)
+    assert matrix.shape == (5, 5)
+    assert np.allclose(np.diag(matrix), 1)
+
+    best, fraction = local.consensus(indexes)
+    assert best[1, 1] == -1
+    assert (fraction[best >= 0] >= 1 / 5.).all()
+
+
+def test_weight_sweep_dicts():
+    layers = {'a': np.array([[[1.]], [[0.]]]),
+              'b': np.array([[[0.]], [[1.]]])}
+    indexes = local.weight_sweep(layers, [{'a': 1}, {'b': 1}])
+    assert indexes[:, 0, 0].tolist() == [0, 1]
+    assert local.agreement(indexes)[0, 1] == 0
+
+
+def test_fixed_point():
+    resolution = local.fixed_point_resolution(1, 'uint8')
+    assert resolution == 1 / 254.
+
+    a = np.random.rand(4, 10, 10)
+    b = np.random.rand(4, 10, 10)
+    a[1, 2, 3] = np.nan
+
+    qa = local.quantize(a, resolution)
+    qb = local.quantize(b, resolution)
+    assert qa.dtype == np.uint8
+    assert qa[1, 2, 3] == 255
+
+    back = local.dequantize(qa, resolution)
+    assert np.isnan(back[1, 2, 3])
+    assert np.nanmax(np.abs(back - a)) <= resolution / 2 + 1e-6
+
+    total = local.fixed_point_sum([qa, qb])
+    assert total[1, 2, 3] == -1
+
+    # same winner unless two images are closer than the resolution
+    index = local.best_index(total)
+    expected = local.best_index(a + b)
+    ordered = np.sort(np.nan_to_num(a + b, nan=-1), axis=0)
+    clear = (ordered[-1] - ordered[-2]) > 2 * resolution
+    assert (index[clear] == expected[clear]).all()
@@ -92,4 +92,18 @@ def test_mean():
     compare = [(str(int(round(val[band]*10000))), val[score.name]) for key, val in val_dict.items()]
     compare = dict(compare)
 
-    assert to_compare == compare
\ No newline at end of file
+    assert to_compare == compare
+
+def test_global_stats():
+    # statistics from a reference equal to the collection give the same
+    # result as the default (per collection) statistics
+    score = scores.Outliers((band,), global_stats=True)
+    half = col.limit(5)
+    newcol = score.map(half, reference=col)
+    default = scores.Outliers((band,)).map(col)
+
+    new_values = tools.imagecollection.getValues(newcol, p, 30, side='client')
+    values = tools.imagecollection.getValues(default, p, 30, side='client')
+
+    for key, val in new_values.items():
+        assert val[score.name] == values[key][score.name]
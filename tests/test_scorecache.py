@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from geebap import scorecache, local
+
+
+class FakeScore(object):
+    """ Same attributes as a score """
+    def __init__(self, name='score-fake', range_out=(0, 1), dmax=100):
+        self.name = name
+        self.range_out = range_out
+        self.dmax = dmax
+        self.sleep = 0
+
+
+def test_score_key():
+    key = scorecache.score_key(FakeScore())
+    assert key.startswith('FakeScore-')
+
+    # the name is not part of the key
+    assert scorecache.score_key(FakeScore('other')) == key
+    assert scorecache.score_key(FakeScore(dmax=50)) != key
+    # the layers are stored in their range_out
+    assert scorecache.score_key(FakeScore(range_out=(0, 5))) != key
+
+
+def test_layer_cache(tmpdir):
+    cache = scorecache.LayerCache(str(tmpdir))
+    score = FakeScore()
+    layer = np.random.rand(4, 5).astype(np.float32)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return layer
+
+    first = cache('LANDSAT/LC08/C01/T1_SR/LC08_001', score, compute)
+    second = cache('LANDSAT/LC08/C01/T1_SR/LC08_001', score, compute)
+
+    assert len(calls) == 1
+    np.testing.assert_array_equal(first, second)
+
+    stack = cache.layers(['LANDSAT/LC08/C01/T1_SR/LC08_001'], [score])
+    assert stack['score-fake'].shape == (1, 4, 5)
+
+
+def test_recomposite():
+    a = np.random.rand(3, 4, 5)
+    b = np.random.rand(3, 4, 5) * 2  # computed with range_out (0, 2)
+    b[1, 0, 0] = np.nan
+
+    total = local.recomposite({'a': a, 'b': b}, weights={'a': 2},
+                              ranges={'b': (0, 2)}, new_ranges={'b': (0, 1)})
+    np.testing.assert_allclose(total, 2 * a + b / 2, rtol=1e-6)
+
+    index = local.best_index(total)
+    assert index[0, 0] in (0, 2)
+
+    image = local.pick(a, index)
+    expected = np.nanmax(np.where(np.isnan(total), -np.inf, total), axis=0)
+    np.testing.assert_allclose(local.pick(total, index), expected)
+    assert image.shape == (4, 5)
+
+
+def test_pick_images():
+    images = [{'B1': np.full((2, 2), i, dtype=float)} for i in range(3)]
+    index = np.array([[0, 1], [2, -1]])
+    composite = local.pick(images, index)
+    assert composite['B1'][0, 1] == 1
+    assert composite['B1'][1, 0] == 2
+    assert np.isnan(composite['B1'][1, 1])
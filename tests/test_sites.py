@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from geebap import sites
+
+
+def test_group_by_proximity():
+    bounds = [(0, 0, 1, 1),
+              (1.05, 0, 2, 1),   # near 0
+              (10, 10, 11, 11),  # alone
+              (2.05, 0.5, 3, 1)]  # near 1
+
+    groups = sites.group_by_proximity(bounds, distance=0.1)
+    assert groups == [[0, 1, 3], [2]]
+
+    groups = sites.group_by_proximity(bounds, distance=0)
+    assert groups == [[0], [1], [2], [3]]
+
+
+def test_group_max_extent():
+    bounds = [(0, 0, 1, 1), (1, 0, 2, 1), (2, 0, 3, 1)]
+
+    groups = sites.group_by_proximity(bounds, distance=0, max_extent=2)
+    assert groups == [[0, 1], [2]]
+
+    assert sites.union_bounds(bounds) == (0, 0, 3, 1)
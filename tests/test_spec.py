@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import json
+
+import ee
+from geebap import bap, expressions, filters, masks, scores, season, spec
+
+seas = season.Season('11-15', '02-15')
+
+
+def make_bap():
+    ee.Initialize()
+    score_list = (scores.Satellite(ratio=0.1),
+                  scores.CloudDist(dmax=600, units='meters'),
+                  scores.AtmosOpacity(),
+                  scores.MaskPercentKernel(distance=50),
+                  scores.Outliers(('ndvi',), global_stats=True),
+                  scores.Doy('01-15', seas, range_out=(0, 2)),
+                  scores.MultiYear(2016, seas))
+    return bap.Bap(season=seas, range=(1, 1), scores=score_list,
+                   masks=(masks.Hollstein(),),
+                   filters=(filters.CloudCover(50), filters.MaskCover()),
+                   fixed_point='uint16')
+
+
+def test_round_trip():
+    objbap = make_bap()
+    text = spec.dumps(objbap)
+
+    # it's JSON
+    assert json.loads(text)['class'] == 'Bap'
+
+    other = spec.loads(text)
+    assert spec.dumps(other) == text
+
+    assert other.range == (1, 1)
+    assert other.fixed_point == 'uint16'
+    assert other.season.start.date == '11-15'
+    assert isinstance(other.scores[3], scores.MaskPercentKernel)
+    assert other.scores[3].kernel is ee.Kernel.square
+    assert other.scores[5].range_out == (0, 2)
+    assert other.scores[5].season.end.date == '02-15'
+    assert other.target_collection.id == objbap.target_collection.id
+
+
+def test_formula():
+    # no Earth Engine session needed
+    atm = scores.AtmosOpacity()
+    data = json.loads(json.dumps(spec.to_spec(atm)))
+
+    assert data['params']['formula'] == {'expression': 'Exponential'}
+    other = spec.from_spec(data)
+    assert other.formula == expressions.Expression.Exponential
+    assert other.range_in == (100, 300)
+
+
+def test_unknown_class():
+    try:
+        spec.from_spec({'class': 'Nothing', 'params': {}})
+        assert False
+    except ValueError:
+        pass
+
+
+# non default arguments for every registered class
+SAMPLES = {
+    'CloudScene': lambda: scores.CloudScene(name='cs', range_out=(0, 2),
+                                            sleep=3),
+    'CloudDist': lambda: scores.CloudDist(dmin=10, dmax=500, units='pixels',
+                                          kernel='manhattan', sleep=1),
+    'Doy': lambda: scores.Doy('02-01', seas, function='gauss', stretch=2),
+    'AtmosOpacity': lambda: scores.AtmosOpacity(range_in=(50, 250),
+                                                name='atm'),
+    'MaskPercent': lambda: scores.MaskPercent(band='red', maxPixels=1e9,
+                                              count_zeros=True, sleep=5),
+    'MaskPercentKernel': lambda: scores.MaskPercentKernel(
+        kernel=ee.Kernel.circle, distance=20, units='meters'),
+    'Satellite': lambda: scores.Satellite(ratio=0.2, name='sat'),
+    'Outliers': lambda: scores.Outliers(('red', 'nir'), process='mean',
+                                        dist=1.5, global_stats=True),
+    'Index': lambda: scores.Index('evi', target=0.6, function='gauss',
+                                  stretch=2, range_in=(-1, 1)),
+    'MultiYear': lambda: scores.MultiYear(2017, seas, ratio=0.1,
+                                          function='gauss', stretch=2,
+                                          year_property='YEAR'),
+    'Threshold': lambda: scores.Threshold(bands={'red': {'min': 0.1,
+                                                         'max': 0.5}}),
+    'Medoid': lambda: scores.Medoid(bands=('red', 'nir'),
+                                    discard_zeros=False, global_stats=True,
+                                    normalize=False),
+    'Brightness': lambda: scores.Brightness(target=0.7, bands=('red',),
+                                            function='gauss'),
+    'CloudCover': lambda: filters.CloudCover(30),
+    'MaskCover': lambda: filters.MaskCover(0.3, prop='score-other'),
+}
+
+
+def _attributes(obj):
+    """ Attributes that can be compared by value """
+    names = set(vars(obj)) | set(['normalize'])
+    values = {}
+    for name in names:
+        value = getattr(obj, name, None)
+        if isinstance(value, (bool, int, float, str, tuple, list, dict,
+                              type(None))):
+            values[name.lstrip('_')] = value
+    return values
+
+
+def test_round_trip_classes():
+    ee.Initialize()
+    registered = set(scores.factory) | set(filters.factory)
+    assert registered <= set(SAMPLES)
+
+    for name in sorted(registered):
+        original = SAMPLES[name]()
+        other = spec.from_spec(json.loads(json.dumps(spec.to_spec(original))))
+
+        assert type(other) is type(original)
+        expected = _attributes(original)
+        result = _attributes(other)
+        for key, value in expected.items():
+            # JSON arrays come back as tuples
+            if isinstance(value, list):
+                value = tuple(value)
+            assert result[key] == value, (name, key)
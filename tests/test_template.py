@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import ee
+ee.Initialize()
+from geebap import scores, bap, season, template
+
+seas = season.Season('11-15', '02-15')
+objbap = bap.Bap(season=seas,
+                 scores=(scores.Satellite(), scores.MaskPercent(),
+                         scores.Index()))
+
+site1 = ee.Geometry.Rectangle([-71.78, -42.89, -71.57, -42.79])
+site2 = ee.Geometry.Rectangle([-71.57, -42.89, -71.36, -42.79])
+
+
+def test_template():
+    tmpl = template.Template(objbap, indices=['ndvi'])
+
+    composite1 = tmpl(site1, 2016)
+    composite2 = tmpl(site2, 2016)
+
+    assert isinstance(composite1, ee.Image)
+    # the function is compiled once per year
+    assert len(tmpl._functions) == 1
+
+    bands = composite1.bandNames().getInfo()
+    expected = objbap.build_composite_best(2016, site2, ['ndvi'])
+    assert composite2.bandNames().getInfo() == \
+        expected.bandNames().getInfo() == bands
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from geebap import tiling
+
+
+def moving_sum(arr):
+    """ 3x3 moving sum (needs a halo of 1 pixel) """
+    padded = np.pad(arr, 1, mode='constant')
+    rows, cols = arr.shape
+    return sum(padded[i:i+rows, j:j+cols] for i in range(3) for j in range(3))
+
+
+def test_plan_covers_grid():
+    plan = tiling.plan((0, 0, 300, 200), scale=1, images=4, max_cost=40*40*4,
+                       halo=3)
+    assert plan.shape == (200, 300)
+
+    covered = np.zeros(plan.shape, dtype=int)
+    for tile in plan:
+        covered[tile.row:tile.row+tile.height,
+                tile.col:tile.col+tile.width] += 1
+        assert tile.cost <= 40*40*4
+    assert (covered == 1).all()
+
+
+def test_halo_too_big():
+    with pytest.raises(ValueError):
+        tiling.plan((0, 0, 100, 100), scale=1, max_pixels=100, halo=10)
+
+
+def test_split_by_images():
+    # more images on the left half
+    def images(bounds):
+        return 10 if bounds[0] < 50 else 1
+
+    plan = tiling.plan((0, 0, 100, 100), scale=1, images=images,
+                       max_cost=20000, min_size=8)
+    left = [t for t in plan if t.col < 50]
+    right = [t for t in plan if t.col >= 50]
+    assert len(left) > len(right)
+
+
+def test_tiles_local_engine():
+    arr = np.random.rand(50, 70)
+    plan = tiling.plan((0, 0, 70, 50), scale=1, halo=1, max_pixels=15*15)
+
+    results = {}
+    for tile in plan:
+        results[tile.id] = tile.crop(moving_sum(tile.read(arr)))
+
+    # the borders of the grid have no data around, like in the full array
+    np.testing.assert_allclose(plan.mosaic(results), moving_sum(arr))
+
+
+def test_assign_workers():
+    plan = tiling.plan((0, 0, 100, 100), scale=1, max_pixels=30*30)
+    assigned = plan.assign(3)
+    loads = [sum(t.cost for t in tiles) for tiles in assigned]
+    assert sum(loads) == plan.cost
+    assert max(loads) - min(loads) <= max(t.cost for t in plan)
+
+    jobs = plan.jobs(3)
+    assert len(jobs) == len(plan)
+    assert set(job['worker'] for job in jobs) == {0, 1, 2}
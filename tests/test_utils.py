@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from geebap import utils
+
+
+def test_memoize():
+    calls = []
+
+    @utils.memoize(maxsize=2)
+    def double(x):
+        calls.append(x)
+        return x * 2
+
+    assert double(1) == 2
+    assert double(1) == 2
+    assert calls == [1]
+
+    double(2)
+    double(1)  # 1 is now the most recently used
+    double(3)  # evicts 2
+    double(1)
+    assert calls == [1, 2, 3]
+    double(2)
+    assert calls == [1, 2, 3, 2]
+
+    info = double.cache_info()
+    assert info['size'] == 2
+    assert info['hits'] == 3
+
+    double.cache_clear()
+    double(1)
+    assert calls == [1, 2, 3, 2, 1]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+from geebap import worker
+
+
+def fake_run_job(job):
+    if job.get('fail'):
+        raise ValueError('bad job')
+    return {'task': 'task-{}'.format(job['year'])}
+
+
+def test_run_directory(tmpdir, monkeypatch):
+    monkeypatch.setattr(worker, 'run_job', fake_run_job)
+    for year in (2017, 2018):
+        tmpdir.join('{}.json'.format(year)).write(json.dumps({'year': year}))
+    tmpdir.join('bad.json').write(json.dumps({'year': 0, 'fail': True}))
+
+    assert worker.run_directory(str(tmpdir), once=True) == 3
+
+    names = sorted(os.listdir(str(tmpdir)))
+    assert names == ['2017.json.done', '2018.json.done', 'bad.json.failed']
+
+    with open(str(tmpdir.join('2018.json.done'))) as f:
+        result = json.load(f)['result']
+    assert result['task'] == 'task-2018'
+    assert 'elapsed' in result
+
+    with open(str(tmpdir.join('bad.json.failed'))) as f:
+        assert 'bad job' in json.load(f)['result']['error']
+
+
+def test_run_file(tmpdir, monkeypatch):
+    monkeypatch.setattr(worker, 'run_job', fake_run_job)
+    filename = str(tmpdir.join('jobs.jsonl'))
+    with open(filename, 'w') as f:
+        for year in (2016, 2017, 2018):
+            f.write(json.dumps({'year': year}) + '\n')
+
+    assert worker.run_file(filename) == 3
+    # resumes: the jobs already run are skipped
+    assert worker.run_file(filename) == 0